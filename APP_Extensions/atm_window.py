@@ -0,0 +1,274 @@
+"""
+ATM window recentering
+Every option chain a session streams is tracked as a window of strikes
+around the ATM strike.  The underlying's ticks are compared against the
+window's precomputed spot bounds (a dict lookup and two comparisons per
+tick); once spot moves past the midpoint to the next strike (plus a
+little hysteresis) a worker thread asks the ladder for the recentred
+rows, records the strikes that entered / left as a numbered change and
+tells on_shift() listeners, which subscribe only the entered symbols.
+
+Clients fetch or stream changes(key, since) - the rows added and the
+strikes removed since the window version they hold - instead of
+reloading the chain.
+"""
+from __future__ import annotations
+import collections, threading, time, typing as T
+
+HYSTERESIS = 0.1                # of a strike step beyond the midpoint
+MAX_CHANGES = 50                # change log kept per window
+MAX_WINDOWS = 256
+
+Row = T.Dict[str, T.Any]
+WindowKey = T.Tuple[T.Any, ...]
+
+
+class Change(T.NamedTuple):
+    version: int
+    atm_strike: float
+    added: list[float]
+    removed: list[float]
+
+
+class AtmWindow:
+    """The strikes one chain request streams, and how they moved."""
+
+    def __init__(self, key: WindowKey, underlying: str, upstream_expiry: str | None):
+        self.key = key
+        self.underlying = underlying
+        self.upstream_expiry = upstream_expiry
+        self.rows: dict[float, Row] = {}
+        self.atm: float | None = None
+        self.lower = self.upper = 0.0
+        self.version = 0
+        self.changed_at = 0.0
+        self.changes: collections.deque[Change] = collections.deque(maxlen=MAX_CHANGES)
+        self.sessions: set[str] = set()
+        self.recentred = 0
+
+    @property
+    def step(self) -> float:
+        strikes = sorted(self.rows)
+        gaps = sorted(b - a for a, b in zip(strikes, strikes[1:]))
+        return gaps[len(gaps) // 2] if gaps else 0.0
+
+    def _bounds(self):
+        step = self.step
+        if self.atm is None or not step:
+            self.lower, self.upper = float("-inf"), float("inf")
+        else:
+            self.lower = self.atm - step * (0.5 + HYSTERESIS)
+            self.upper = self.atm + step * (0.5 + HYSTERESIS)
+
+    def apply(self, rows: T.Iterable[Row], atm: float, as_of: float) -> tuple[Change, list[Row], list[Row]] | None:
+        """Make *rows* the window → (change, entered rows, left rows) if strikes moved."""
+        new = {float(r["strike"]): r for r in rows}
+        added = sorted(k for k in new if k not in self.rows)
+        removed = sorted(k for k in self.rows if k not in new)
+        left = [self.rows[k] for k in removed]
+        first = not self.rows
+        self.rows, self.atm, self.changed_at = new, atm, as_of
+        self._bounds()
+        if first or not (added or removed):
+            self.version = self.version or 1
+            return None
+        self.version += 1
+        change = Change(self.version, atm, added, removed)
+        self.changes.append(change)
+        return change, [new[k] for k in added], left
+
+    def since(self, version: int) -> dict:
+        """Rows added / strikes removed after *version* (all rows when it is too old)"""
+        out = {"version": self.version, "atm_strike": self.atm, "added": [], "removed": []}
+        if version >= self.version:
+            return out
+        log = [c for c in self.changes if c.version > version]
+        if not log or log[0].version != version + 1:
+            out.update(reset=True, added=[self.rows[k] for k in sorted(self.rows)])
+            return out
+        added: set[float] = set()
+        removed: set[float] = set()
+        for change in log:
+            for strike in change.removed:
+                if strike in added:
+                    added.discard(strike)
+                else:
+                    removed.add(strike)
+            for strike in change.added:
+                if strike in removed:
+                    removed.discard(strike)
+                else:
+                    added.add(strike)
+        out["added"] = [self.rows[k] for k in sorted(added) if k in self.rows]
+        out["removed"] = sorted(removed)
+        return out
+
+
+Ladder = T.Callable[[AtmWindow, float], T.Tuple[T.List[Row], T.Optional[float]]]
+ShiftListener = T.Callable[[AtmWindow, T.List[Row], T.List[Row]], None]
+
+
+class AtmWindows:
+    """Windows by key, recentred from the underlying's ticks."""
+
+    def __init__(self):
+        self._windows: dict[WindowKey, AtmWindow] = {}
+        self._by_underlying: dict[str, list[AtmWindow]] = {}
+        self._bound: dict[str, WindowKey] = {}              # session → window it streams
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._pending: dict[WindowKey, float] = {}
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._app = None
+        self.ladder: Ladder | None = None
+        self._listeners: list[ShiftListener] = []
+
+    def on_shift(self, callback: ShiftListener):
+        """callback(window, added rows, removed rows) after a recentre (worker thread)"""
+        self._listeners.append(callback)
+
+    # -----------------------------------------------------------------
+    # Tracking (chain requests)
+    def track(self, key: WindowKey, underlying: str, upstream_expiry: str | None,
+              rows: list[Row], atm: float, as_of: float, session: str | None = None, app=None) -> int:
+        """
+        Register / refresh a window from a chain answer fetched at *as_of*
+        (older answers than the last recentre only bind the session).
+        Returns the window version matching *rows*.
+        """
+        if app is not None and self._app is None:
+            self._app = app
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                if len(self._windows) >= MAX_WINDOWS:
+                    self._forget(min(self._windows.values(), key=lambda w: w.changed_at))
+                window = self._windows[key] = AtmWindow(key, underlying, upstream_expiry)
+                self._by_underlying.setdefault(underlying, []).append(window)
+            if upstream_expiry:
+                window.upstream_expiry = upstream_expiry
+            if session:
+                self.bind(session, key)
+            if as_of < window.changed_at:
+                return window.version
+            moved = window.apply(rows, atm, as_of)
+        if moved:
+            self._published(window, *moved)
+        return window.version
+
+    def bind(self, session: str, key: WindowKey):
+        with self._lock:
+            previous = self._bound.get(session)
+            if previous == key:
+                return
+            if previous in self._windows:
+                self._windows[previous].sessions.discard(session)
+            self._bound[session] = key
+            self._windows[key].sessions.add(session)
+
+    def unbind(self, session: str):
+        with self._lock:
+            key = self._bound.pop(session, None)
+            if key in self._windows:
+                self._windows[key].sessions.discard(session)
+
+    def _forget(self, window: AtmWindow):
+        self._windows.pop(window.key, None)
+        siblings = self._by_underlying.get(window.underlying, [])
+        if window in siblings:
+            siblings.remove(window)
+        for session in window.sessions:
+            self._bound.pop(session, None)
+
+    # -----------------------------------------------------------------
+    # Ticks
+    def on_tick(self, symbol: str, ltp: float):
+        """Called for every tick; cheap unless spot left a window's bounds"""
+        windows = self._by_underlying.get(symbol)
+        if not windows or not ltp:
+            return
+        for window in windows:
+            if window.sessions and not (window.lower <= ltp <= window.upper):
+                self._pending[window.key] = ltp
+                self._wake.set()
+                self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="atm-window", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._pending:
+                key, spot = self._pending.popitem()
+                try:
+                    if self._app is not None:
+                        with self._app.app_context():
+                            self.recentre(key, spot)
+                    else:
+                        self.recentre(key, spot)
+                except Exception as e:
+                    print(f"ATM WINDOW: recentre of {key[0]} failed: {e}")
+
+    def recentre(self, key: WindowKey, spot: float) -> Change | None:
+        """Move *key*'s window to the ladder around *spot* if it left the bounds"""
+        window = self._windows.get(key)
+        if window is None or self.ladder is None or window.lower <= spot <= window.upper:
+            return None
+        rows, atm = self.ladder(window, spot)
+        if not rows or atm is None:
+            return None
+        with self._lock:
+            moved = window.apply(rows, atm, time.time())
+        if not moved:
+            return None
+        window.recentred += 1
+        print(f"ATM WINDOW: {window.underlying} ATM → {atm} "
+              f"(+{len(moved[0].added)} -{len(moved[0].removed)} strikes)")
+        self._published(window, *moved)
+        return moved[0]
+
+    def _published(self, window: AtmWindow, change: Change, added: list[Row], removed: list[Row]):
+        with self._cond:
+            self._cond.notify_all()
+        for callback in self._listeners:
+            try:
+                callback(window, added, removed)
+            except Exception as e:
+                print(f"ATM WINDOW listener error: {e}")
+
+    # -----------------------------------------------------------------
+    # Clients
+    def changes(self, key: WindowKey, since: int, wait: float = 0.0) -> dict | None:
+        """Change since *since*, waiting up to *wait* seconds for one (None = not tracked)"""
+        deadline = time.time() + wait
+        with self._cond:
+            while True:
+                window = self._windows.get(key)
+                if window is None:
+                    return None
+                remaining = deadline - time.time()
+                if window.version != since or remaining <= 0:
+                    return window.since(since)
+                self._cond.wait(remaining)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "windows": len(self._windows),
+                "sessions": len(self._bound),
+                "worker": bool(self._thread and self._thread.is_alive()),
+                "underlyings": {u: [{"atm": w.atm, "strikes": len(w.rows), "version": w.version,
+                                     "recentred": w.recentred, "sessions": len(w.sessions)} for w in ws]
+                                for u, ws in self._by_underlying.items() if ws},
+            }
+
+
+atm_windows = AtmWindows()
@@ -0,0 +1,105 @@
+"""
+Row-level diffs between option chain refreshes
+Every time a chain's data changes its rows are recorded as a snapshot
+named by a digest of their content (the chain_version sent with the full
+chain).  A poll that names the version it holds gets back only the fields
+that changed per strike, the rows that entered and the strikes that left -
+usually a handful of cells instead of the whole chain.
+
+Versions are content digests rather than sequence numbers, so a version
+handed out by one worker process is understood by any other that saw the
+same data; an unknown or expired version gets the whole chain (reset).
+"""
+from __future__ import annotations
+import collections, hashlib, json, threading, typing as T
+
+MAX_SNAPSHOTS = 8               # versions kept per chain (polls a few refreshes behind)
+MAX_CHAINS = 512
+
+Row = T.Dict[str, T.Any]
+ChainKey = T.Tuple[T.Any, ...]
+
+
+def chain_version(rows: T.Sequence[Row]) -> str:
+    """Content digest of a chain's rows"""
+    payload = json.dumps(rows, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def _row_diff(old: Row, new: Row, fields: T.Collection[str] | None) -> Row:
+    names = new.keys() if fields is None else [f for f in fields if f in new]
+    return {name: new[name] for name in names if old.get(name) != new[name]}
+
+
+class ChainDiffs:
+    """Recent snapshots per chain key; thread-safe."""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        # key → version → {strike: row}, oldest first
+        self._chains: collections.OrderedDict[ChainKey, collections.OrderedDict[str, dict[float, Row]]] = \
+            collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.full = self.partial = self.unchanged = 0
+
+    def record(self, key: ChainKey, rows: T.Sequence[Row]) -> str:
+        """Snapshot *rows* as the latest data of *key* → its version"""
+        version = chain_version(rows)
+        snapshot = {float(r["strike"]): dict(r) for r in rows}
+        with self._lock:
+            versions = self._chains.get(key)
+            if versions is None:
+                if len(self._chains) >= MAX_CHAINS:
+                    self._chains.popitem(last=False)
+                versions = self._chains[key] = collections.OrderedDict()
+            self._chains.move_to_end(key)
+            versions.pop(version, None)
+            versions[version] = snapshot
+            while len(versions) > self.max_snapshots:
+                versions.popitem(last=False)
+        return version
+
+    def diff(self, key: ChainKey, since: str, fields: T.Collection[str] | None = None) -> dict | None:
+        """
+        Changes of *key* since version *since*, limited to *fields* (the row's
+        own fields when None): {version, changed, added, removed}, or
+        {version, reset, strikes} when *since* is not known here.
+        None when the chain has no snapshot at all.
+        """
+        with self._lock:
+            versions = self._chains.get(key)
+            if not versions:
+                return None
+            version, current = next(reversed(versions.items()))
+            previous = versions.get(since)
+            if previous is None:
+                self.full += 1
+                return {"version": version, "reset": True,
+                        "strikes": [current[k] for k in sorted(current)]}
+        changed = []
+        for strike in sorted(current):
+            if strike in previous:
+                cells = _row_diff(previous[strike], current[strike], fields)
+                if cells:
+                    changed.append({"strike": current[strike]["strike"], **cells})
+        added = [current[k] for k in sorted(current) if k not in previous]
+        removed = sorted(previous[k]["strike"] for k in previous if k not in current)
+        with self._lock:
+            if changed or added or removed:
+                self.partial += 1
+            else:
+                self.unchanged += 1
+        return {"version": version, "changed": changed, "added": added, "removed": removed}
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "chains": len(self._chains),
+                "snapshots": sum(len(v) for v in self._chains.values()),
+                "full": self.full,
+                "partial": self.partial,
+                "unchanged": self.unchanged,
+            }
+
+
+chain_diffs = ChainDiffs()
@@ -0,0 +1,142 @@
+"""
+Option chain structure straight from the symbol master
+The strike ladder, CE/PE tickers and expiry timestamps for an underlying are
+fixed by the NSE_FO / BSE_FO / MCX_COM files, so none of them need an
+upstream optionchain call; only prices come from quotes or the socket.
+"""
+from __future__ import annotations
+import bisect, datetime, re, typing as T
+
+from APP_Extensions.symbol_master import SymbolMaster, Instrument, IST
+
+# Spot tickers whose FO underlying is not simply the ticker minus its suffix
+UNDERLYING_ALIASES = {
+    "NIFTY50-INDEX": "NIFTY",
+    "NIFTYBANK-INDEX": "BANKNIFTY",
+    "NIFTYMIDCAP-INDEX": "MIDCPNIFTY",
+    "MIDCPNIFTY-INDEX": "MIDCPNIFTY",
+    "NIFTYNXT50-INDEX": "NIFTYNXT50",
+    "FINNIFTY-INDEX": "FINNIFTY",
+    "SENSEX-INDEX": "SENSEX",
+    "BANKEX-INDEX": "BANKEX",
+}
+FO_FILES = {"NSE": "NSE_FO", "BSE": "BSE_FO", "MCX": "MCX_COM"}
+SPOT_SUFFIXES = ("-INDEX", "-EQ", "-A", "-BE")
+_FUTURE = re.compile(r"([A-Z&]+?)\d{2}[A-Z]{3}FUT$")          # CRUDEOIL25AUGFUT
+
+# Columns of one ladder row, shared with the upstream chain path
+ROW_FIELDS = ("ltp", "symbol", "oi", "volume", "oich", "bid", "ask", "bid_qty", "ask_qty")
+
+
+def empty_row(strike: float, is_atm: bool) -> dict:
+    row = {"strike": strike}
+    for side in ("ce", "pe"):
+        for field in ROW_FIELDS:
+            row[f"{side}_{field}"] = "" if field == "symbol" else 0
+    row["is_atm"] = is_atm
+    return row
+
+
+def fo_underlying(symbol: str) -> tuple[str, str] | None:
+    """"NSE:NIFTY50-INDEX" → ("NSE_FO", "NIFTY"); None for unknown exchanges"""
+    exchange, _, ticker = symbol.upper().partition(":")
+    name = FO_FILES.get(exchange)
+    if not name or not ticker:
+        return None
+    if ticker in UNDERLYING_ALIASES:
+        return name, UNDERLYING_ALIASES[ticker]
+    for suffix in SPOT_SUFFIXES:
+        if ticker.endswith(suffix):
+            return name, ticker[: -len(suffix)]
+    future = _FUTURE.match(ticker)
+    return name, future.group(1) if future else ticker
+
+
+class Expiry(T.NamedTuple):
+    day: datetime.date
+    timestamp: int            # upstream expiry timestamp (contract expiry epoch)
+
+    @property
+    def upstream_date(self) -> str:
+        """Format used in the optionchain expiryData: 28-08-2025"""
+        return self.day.strftime("%d-%m-%Y")
+
+
+def option_expiries(master: SymbolMaster, symbol: str) -> list[Expiry]:
+    """Every listed option expiry of *symbol*'s underlying, nearest first."""
+    target = fo_underlying(symbol)
+    if not target:
+        return []
+    name, underlying = target
+    sym_file = master.file(name)
+    out = []
+    for (und, day), strikes in sym_file.chains.items():
+        if und != underlying or not strikes:
+            continue
+        legs = next(iter(strikes.values()))
+        out.append(Expiry(day, sym_file.instruments[next(iter(legs.values()))].expiry_ts))
+    return sorted(out)
+
+
+def resolve_expiry(master: SymbolMaster, symbol: str, expiry: str) -> Expiry | None:
+    """
+    Expiry as sent by the UI - "28-AUG-25", an epoch timestamp, or "" for
+    the nearest - matched against the listed expiries.
+    """
+    listed = option_expiries(master, symbol)
+    if not listed:
+        return None
+    expiry = (expiry or "").strip()
+    if not expiry:
+        today = datetime.datetime.now(IST).date()
+        return next((e for e in listed if e.day >= today), listed[-1])
+    if expiry.isdigit():
+        ts = int(expiry)
+        day = datetime.datetime.fromtimestamp(ts, IST).date()
+        return next((e for e in listed if e.timestamp == ts or e.day == day), None)
+    try:
+        day = datetime.datetime.strptime(expiry, "%d-%b-%y").date()
+    except ValueError:
+        return None
+    return next((e for e in listed if e.day == day), None)
+
+
+class ChainSkeleton(T.NamedTuple):
+    underlying: str
+    expiry: Expiry
+    atm_strike: float
+    legs: dict[float, dict[str, Instrument]]     # strike → {"CE": ..., "PE": ...}
+
+    @property
+    def symbols(self) -> list[str]:
+        return [inst.symbol for legs in self.legs.values() for inst in legs.values()]
+
+    def rows(self) -> list[dict]:
+        """Ladder rows (same fields as the upstream chain) with prices zeroed"""
+        out = []
+        for strike, legs in self.legs.items():
+            row = empty_row(strike, strike == self.atm_strike)
+            for side, inst in legs.items():
+                row[f"{side.lower()}_symbol"] = inst.symbol
+            out.append(row)
+        return out
+
+
+def build_skeleton(master: SymbolMaster, symbol: str, expiry: Expiry,
+                   strike_count: int, spot_price: float) -> ChainSkeleton | None:
+    """*strike_count* strikes either side of the one nearest *spot_price*."""
+    name, underlying = fo_underlying(symbol) or (None, None)
+    if not name:
+        return None
+    chain = master.file(name).chain(underlying, expiry.day)
+    if not chain:
+        return None
+    strikes = list(chain)
+    if spot_price:
+        i = bisect.bisect_left(strikes, spot_price)
+        if i == len(strikes) or (i > 0 and spot_price - strikes[i - 1] <= strikes[i] - spot_price):
+            i -= 1
+    else:
+        i = len(strikes) // 2
+    lo, hi = max(0, i - strike_count), min(len(strikes), i + strike_count + 1)
+    return ChainSkeleton(underlying, expiry, strikes[i], {k: chain[k] for k in strikes[lo:hi]})
@@ -0,0 +1,158 @@
+"""
+Compact in-memory time series of option chain snapshots
+Each sample is one float64 matrix (strikes x FIELDS) indexed by epoch time
+"""
+from __future__ import annotations
+import bisect, threading, typing as T
+
+import numpy as np
+
+# Column layout of every snapshot matrix
+SIDES = ("ce", "pe")
+METRICS = ("ltp", "oi", "oich", "volume", "bid", "ask", "iv")
+FIELDS = tuple(f"{side}_{m}" for side in SIDES for m in METRICS)
+_COL = {name: i for i, name in enumerate(FIELDS)}
+
+
+def frame_from_options(options_list: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fyers ``optionsChain`` rows → (sorted strikes, float64 matrix).
+    Missing values (e.g. IV when upstream does not send it) are NaN.
+    """
+    rows: dict[float, np.ndarray] = {}
+    for option in options_list:
+        side = str(option.get("option_type", "")).lower()
+        strike = option.get("strike_price") or 0
+        if side not in SIDES or strike <= 0:
+            continue
+        row = rows.get(strike)
+        if row is None:
+            row = rows[strike] = np.full(len(FIELDS), np.nan, dtype=np.float64)
+        for metric in METRICS:
+            value = option.get(metric)
+            if value is not None:
+                row[_COL[f"{side}_{metric}"]] = value
+    strikes = np.array(sorted(rows), dtype=np.float64)
+    values = (np.vstack([rows[s] for s in strikes]) if len(strikes)
+              else np.empty((0, len(FIELDS)), dtype=np.float64))
+    return strikes, values
+
+
+class ChainSeries:
+    """All samples for one (underlying, expiry)."""
+
+    def __init__(self, max_samples: int):
+        self.max_samples = max_samples
+        self.times: list[int] = []
+        self.frames: list[tuple[np.ndarray, np.ndarray, float]] = []   # strikes, values, spot
+
+    def append(self, ts: int, strikes: np.ndarray, values: np.ndarray, spot: float):
+        if self.times and ts <= self.times[-1]:
+            return
+        self.times.append(ts)
+        self.frames.append((strikes, values, spot))
+        if len(self.times) > self.max_samples:
+            del self.times[0], self.frames[0]
+
+    def index_as_of(self, ts: int) -> int:
+        """Index of the last sample taken at or before *ts* (-1 if none)."""
+        return bisect.bisect_right(self.times, ts) - 1
+
+    def window(self, start: int | None, end: int | None) -> range:
+        lo = 0 if start is None else bisect.bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect.bisect_right(self.times, end)
+        return range(lo, hi)
+
+
+class ChainSnapshotStore:
+    """Thread-safe collection of ChainSeries keyed by (underlying, expiry)."""
+
+    def __init__(self, max_samples: int = 2000):
+        self.max_samples = max_samples
+        self._series: dict[tuple[str, str], ChainSeries] = {}
+        self._lock = threading.Lock()
+
+    def record(self, underlying: str, expiry: str, ts: int,
+               options_list: list[dict], spot: float = 0.0) -> int:
+        """Store one snapshot; returns the number of strikes recorded."""
+        strikes, values = frame_from_options(options_list)
+        with self._lock:
+            series = self._series.get((underlying, expiry))
+            if series is None:
+                series = self._series[(underlying, expiry)] = ChainSeries(self.max_samples)
+            series.append(int(ts), strikes, values, float(spot or 0))
+        return len(strikes)
+
+    def keys(self) -> list[dict]:
+        with self._lock:
+            return [{"underlying": u, "expiry": e, "samples": len(s.times),
+                     "first": s.times[0] if s.times else None,
+                     "last": s.times[-1] if s.times else None}
+                    for (u, e), s in self._series.items()]
+
+    def clear(self, before: int | None = None):
+        """Drop everything, or only samples older than *before*."""
+        with self._lock:
+            if before is None:
+                self._series.clear()
+                return
+            for series in self._series.values():
+                cut = bisect.bisect_left(series.times, before)
+                del series.times[:cut], series.frames[:cut]
+
+    def as_of(self, underlying: str, expiry: str, ts: int) -> dict | None:
+        """Full chain as it was at *ts* (last sample at or before it)."""
+        with self._lock:
+            series = self._series.get((underlying, expiry))
+            if series is None:
+                return None
+            i = series.index_as_of(ts)
+            if i < 0:
+                return None
+            sample_ts = series.times[i]
+            strikes, values, spot = series.frames[i]
+        return {
+            "underlying": underlying,
+            "expiry": expiry,
+            "sample_time": sample_ts,
+            "spot_price": spot,
+            "fields": list(FIELDS),
+            "strikes": [_row(strike, row) for strike, row in zip(strikes.tolist(), values)],
+        }
+
+    def strike_series(self, underlying: str, expiry: str, strike: float,
+                      start: int | None = None, end: int | None = None) -> dict | None:
+        """Every field of one strike across the samples in [start, end]."""
+        with self._lock:
+            series = self._series.get((underlying, expiry))
+            if series is None:
+                return None
+            picked = [(series.times[i], series.frames[i]) for i in series.window(start, end)]
+        times, spots, rows = [], [], []
+        for ts, (strikes, values, spot) in picked:
+            j = int(np.searchsorted(strikes, strike))
+            if j < len(strikes) and strikes[j] == strike:
+                times.append(ts)
+                spots.append(spot)
+                rows.append(values[j])
+        matrix = (np.vstack(rows) if rows
+                  else np.empty((0, len(FIELDS)), dtype=np.float64))
+        return {
+            "underlying": underlying,
+            "expiry": expiry,
+            "strike": strike,
+            "times": times,
+            "spot_price": spots,
+            "series": {name: _clean(matrix[:, i]) for i, name in enumerate(FIELDS)},
+        }
+
+
+def _clean(column: np.ndarray) -> list:
+    """float64 column → JSON list (NaN becomes null)."""
+    return [None if v != v else v for v in column.tolist()]
+
+
+def _row(strike: float, values: np.ndarray) -> dict:
+    out: dict[str, T.Any] = {"strike": strike}
+    out.update(zip(FIELDS, _clean(values)))
+    return out
@@ -0,0 +1,112 @@
+"""
+Expiry calendar for every F&O underlying in the symbol master
+Rebuilt from each derivatives file whenever the master reloads it, so a
+screen can ask for the next expiries of all underlyings in one request.
+"""
+from __future__ import annotations
+import datetime, threading, typing as T
+
+from APP_Extensions import http_cache
+from APP_Extensions.symbol_master import SymbolFile, IST, expiry_label, _expiry_from_desc
+
+CALENDAR_SEQ = "expiry_calendar"
+
+# Derivatives files covered, keyed by the exchange name used in the UI
+CALENDAR_FILES = {
+    "NSE": "NSE_FO",
+    "BSE": "BSE_FO",
+    "MCX": "MCX_COM",
+    "Crypto": "NSE_CD",
+    "NSE Commodity": "NSE_COM",
+}
+
+
+class ExpiryDate(T.NamedTuple):
+    day: datetime.date
+    timestamp: int
+    options: bool
+    futures: bool
+
+    def to_json(self, today: datetime.date) -> dict:
+        kinds = [k for k, has in (("option", self.options), ("future", self.futures)) if has]
+        return {"expiry": expiry_label(self.day), "date": self.day.isoformat(),
+                "timestamp": self.timestamp, "days_to_expiry": (self.day - today).days,
+                "kinds": kinds}
+
+
+def build_file_calendar(sym_file: SymbolFile) -> dict[str, list[ExpiryDate]]:
+    """{underlying: expiries sorted by date} for one derivatives file"""
+    found: dict[str, dict[datetime.date, list]] = {}
+    for inst in sym_file.instruments:
+        if not inst.expiry_ts or not inst.underlying:
+            continue
+        is_option = inst.option_type in ("CE", "PE")
+        # The dated description wins (as the expiry carousel always read it)
+        day = (_expiry_from_desc(inst.description)
+               or datetime.datetime.fromtimestamp(inst.expiry_ts, IST).date())
+        slot = found.setdefault(inst.underlying, {}).setdefault(day, [inst.expiry_ts, False, False])
+        slot[1 if is_option else 2] = True
+    return {underlying: [ExpiryDate(day, ts, opt, fut) for day, (ts, opt, fut) in sorted(days.items())]
+            for underlying, days in found.items()}
+
+
+class ExpiryCalendar:
+    """Per-file calendars, swapped wholesale on every master reload."""
+
+    def __init__(self):
+        self._files: dict[str, dict[str, list[ExpiryDate]]] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, sym_file: SymbolFile):
+        """symbol_master reload hook; ignores files that carry no expiries."""
+        if sym_file.name not in CALENDAR_FILES.values():
+            return
+        calendar = build_file_calendar(sym_file)
+        with self._lock:
+            self._files[sym_file.name] = calendar
+        http_cache.bump(CALENDAR_SEQ)
+
+    def loaded(self, name: str) -> bool:
+        return name in self._files
+
+    def expiries(self, name: str, underlying: str, kind: str | None = None) -> list[ExpiryDate]:
+        dates = self._files.get(name, {}).get(underlying, [])
+        if kind == "option":
+            return [d for d in dates if d.options]
+        if kind == "future":
+            return [d for d in dates if d.futures]
+        return list(dates)
+
+    def labels(self, name: str, underlying: str, kind: str | None = None) -> list[str]:
+        """
+        Expiries as the expiry carousel shows them (28-AUG-25): options and
+        futures alike by default, as underlyings with futures only (MCX,
+        NSE_CD, NSE_COM contracts) need their future expiries listed
+        """
+        return [expiry_label(d.day) for d in self.expiries(name, underlying, kind)]
+
+    def query(self, names: T.Iterable[str], underlyings: T.Collection[str] = (),
+              upcoming: int | None = None, kind: str | None = None,
+              today: datetime.date | None = None) -> dict:
+        """
+        {file: {underlying: [expiry, ...]}} for *underlyings* (all when
+        empty), dropping past dates and keeping the first *upcoming*
+        """
+        today = today or datetime.datetime.now(IST).date()
+        out = {}
+        for name in names:
+            calendar = self._files.get(name, {})
+            keys = [u for u in underlyings if u in calendar] if underlyings else sorted(calendar)
+            section = {}
+            for underlying in keys:
+                dates = [d for d in calendar[underlying]
+                         if d.day >= today and (kind is None or (d.options if kind == "option" else d.futures))]
+                if upcoming:
+                    dates = dates[:upcoming]
+                if dates:
+                    section[underlying] = [d.to_json(today) for d in dates]
+            out[name] = section
+        return out
+
+
+expiry_calendar = ExpiryCalendar()
@@ -0,0 +1,104 @@
+"""
+Command channel between web workers and the feed process
+Workers send (command, args) over a local multiprocessing connection
+(unix socket, authenticated with MARKET_FEED_AUTHKEY / SESSION_SECRET)
+and get back whatever the feed's handler returned.  Quotes never travel
+over it - those are read from the shared quote table.
+"""
+from __future__ import annotations
+import os, tempfile, threading, typing as T
+from multiprocessing.connection import Listener, Client
+
+FEED_ADDRESS = os.environ.get("MARKET_FEED_ADDRESS",
+                              os.path.join(tempfile.gettempdir(), "market_feed.sock"))
+FEED_AUTHKEY = os.environ.get("MARKET_FEED_AUTHKEY",
+                              os.environ.get("SESSION_SECRET", "dev-key-change-in-production")).encode()
+REPLY_TIMEOUT_SECONDS = 10
+
+Handler = T.Callable[..., T.Any]
+
+
+class FeedUnavailable(RuntimeError):
+    pass
+
+
+class FeedServer:
+    """Feed process side: one thread per worker connection."""
+
+    def __init__(self, handlers: dict[str, Handler], address: str = FEED_ADDRESS, app=None):
+        self.handlers = handlers
+        self.address = address
+        self.app = app                         # handlers run inside its app context
+        self._listener: Listener | None = None
+
+    def start(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)            # left behind by a previous feed
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=FEED_AUTHKEY)
+        threading.Thread(target=self._accept, name="feed-channel", daemon=True).start()
+        print(f"FEED CHANNEL: listening on {self.address}")
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                print(f"FEED CHANNEL: rejected connection: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    command, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                handler = self.handlers.get(command)
+                try:
+                    if handler is None:
+                        raise KeyError(f"unknown feed command '{command}'")
+                    if self.app is None:
+                        conn.send((True, handler(*args)))
+                    else:
+                        with self.app.app_context():
+                            conn.send((True, handler(*args)))
+                except Exception as e:
+                    conn.send((False, str(e)))
+
+
+class FeedClient:
+    """Worker side: one lazily (re)opened connection, calls serialized."""
+
+    def __init__(self, address: str = FEED_ADDRESS):
+        self.address = address
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        try:
+            self._conn = Client(self.address, family="AF_UNIX", authkey=FEED_AUTHKEY)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise FeedUnavailable(f"market feed process not running ({self.address})") from e
+
+    def call(self, command: str, *args):
+        """Run *command* in the feed process; re-raises its error as RuntimeError."""
+        with self._lock:
+            for attempt in (1, 2):
+                if self._conn is None:
+                    self._connect()
+                try:
+                    self._conn.send((command, args))
+                    if not self._conn.poll(REPLY_TIMEOUT_SECONDS):
+                        raise TimeoutError(f"feed did not answer '{command}'")
+                    ok, result = self._conn.recv()
+                    break
+                except (EOFError, OSError, TimeoutError):
+                    # Feed restarted (or hung): reconnect once
+                    self._conn.close()
+                    self._conn = None
+                    if attempt == 2:
+                        raise FeedUnavailable(f"market feed process not answering '{command}'")
+        if not ok:
+            raise RuntimeError(result)
+        return result
@@ -0,0 +1,363 @@
+"""
+Process-wide registry of authenticated FYERS clients
+One FyersModel per broker account is built on first use and reused by every
+request; broker_settings invalidates an account whenever its token changes,
+so the request path neither queries BrokerSettings nor constructs clients.
+
+Market-data calls made through get_fyers_client() are spread over every
+account holding a live token, weighted by what is left of each account's
+rate budget, and moved to another account when a token is rejected.
+"""
+from __future__ import annotations
+import collections, random, threading, time, typing as T
+from datetime import datetime
+
+from requests.adapters import HTTPAdapter
+
+from APP_Extensions.startup import lazy_import
+
+# Optional import: only needed when the fyers SDK is installed; loaded on
+# first use, as it is the slowest import of the whole app
+fyers_model = lazy_import("fyers_apiv3.fyersModel")
+
+# Accounts are re-read at most this often even without an invalidation,
+# so tokens written by another worker process are picked up
+ACCOUNT_RECHECK_SECONDS = 60
+POOL_MAXSIZE = 16
+
+# FYERS API v3 limits per app/account
+RATE_LIMITS = ((1.0, 10), (60.0, 200))          # (window seconds, calls)
+# Response codes meaning the token is no longer accepted / the limit was hit
+AUTH_ERROR_CODES = {-8, -15, -16, -17}
+RATE_LIMIT_CODES = {429, -429}
+
+
+class Account(T.NamedTuple):
+    """Snapshot of the BrokerSettings columns a client needs."""
+    id: int
+    brokername: str
+    broker_user_id: str
+    clientid: str | None
+    access_token: str | None
+    refresh_token: str | None
+    access_token_created_at: datetime | None
+    refresh_token_created_at: datetime | None = None
+
+    @classmethod
+    def from_row(cls, row) -> "Account":
+        return cls(row.id, row.brokername, row.broker_user_id, row.clientid,
+                   row.access_token, getattr(row, "refresh_token", None),
+                   getattr(row, "access_token_created_at", None),
+                   getattr(row, "refresh_token_created_at", None))
+
+
+def token_expiry(account: Account) -> float | None:
+    """Epoch at which the access token stops working (None = not tracked)"""
+    from models import access_token_expiry
+    expires = access_token_expiry(account.access_token_created_at)
+    return expires.timestamp() if expires else None
+
+
+class RateBudget:
+    """Sliding-window call log for one account."""
+
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = sorted(limits)
+        self._horizon = self.limits[-1][0]
+        self._calls: collections.deque[float] = collections.deque()
+        self._blocked_until = 0.0
+
+    def _used(self, now: float) -> list[int]:
+        """Calls inside each window (log trimmed to the longest one)"""
+        calls = self._calls
+        while calls and calls[0] <= now - self._horizon:
+            calls.popleft()
+        used = []
+        for window, _ in self.limits[:-1]:
+            n = 0
+            for t in reversed(calls):
+                if t <= now - window:
+                    break
+                n += 1
+            used.append(n)
+        return used + [len(calls)]
+
+    def remaining(self, now: float) -> float:
+        """Fraction (0..1) of the tightest window still unused"""
+        if now < self._blocked_until:
+            return 0.0
+        return min(max(0, limit - n) / limit
+                   for (_, limit), n in zip(self.limits, self._used(now)))
+
+    def record(self, now: float):
+        self._calls.append(now)
+
+    def exhaust(self, now: float, seconds: float = 1.0):
+        """Upstream said the limit was hit: leave this account alone for a while"""
+        self._blocked_until = now + seconds
+
+    def backlog(self, now: float) -> int:
+        """Calls inside the longest window"""
+        return self._used(now)[-1]
+
+    def used(self, now: float) -> dict:
+        return {f"{int(window)}s": n for (window, _), n in zip(self.limits, self._used(now))}
+
+
+def _build_client(account: Account):
+    fyersModel = fyers_model()
+    if fyersModel is None:
+        raise RuntimeError("fyers-apiv3 SDK not installed")
+    client = fyersModel.FyersModel(client_id=account.clientid, token=account.access_token,
+                                   is_async=False, log_path="")
+    # The SDK opens a plain Session; give it a pool sized for concurrent requests
+    session = getattr(getattr(client, "service", None), "session", None)
+    if session is not None:
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE))
+    return client
+
+
+def _load_accounts() -> list[Account]:
+    from models import BrokerSettings
+    rows = BrokerSettings.query.filter_by(brokername='fyers').order_by(BrokerSettings.id).all()
+    return [Account.from_row(r) for r in rows]
+
+
+class ClientRegistry:
+    """Cached accounts and clients; every method is thread-safe."""
+
+    def __init__(self, loader: T.Callable[[], list[Account]] = _load_accounts,
+                 factory: T.Callable[[Account], T.Any] = _build_client):
+        self._loader = loader
+        self._factory = factory
+        self._lock = threading.RLock()
+        self._accounts: dict[int, Account] | None = None
+        self._loaded_at = 0.0
+        self._clients: dict[int, T.Any] = {}
+        self._listeners: list[T.Callable[[Account], None]] = []
+        self._down_listeners: list[T.Callable[[Account], None]] = []
+        self._budgets: dict[int, RateBudget] = {}
+        self._rejected: dict[int, str] = {}      # account id → token upstream refused
+        self._expiry: dict[tuple, float | None] = {}   # (id, token) → expiry epoch
+
+    # -----------------------------------------------------------------
+    def on_token_change(self, callback: T.Callable[[Account], None]):
+        """Register a callback run when an account's access token changes."""
+        self._listeners.append(callback)
+
+    def _ensure_accounts(self) -> dict[int, Account]:
+        accounts = self._accounts
+        if accounts is not None and time.time() - self._loaded_at < ACCOUNT_RECHECK_SECONDS:
+            return accounts
+        with self._lock:
+            if self._accounts is not None and time.time() - self._loaded_at < ACCOUNT_RECHECK_SECONDS:
+                return self._accounts
+            fresh = {a.id: a for a in self._loader()}
+            old = self._accounts or {}
+            changed = [a for a in fresh.values()
+                       if a.id in old and old[a.id].access_token != a.access_token]
+            for account_id in set(self._clients):
+                prev, now = old.get(account_id), fresh.get(account_id)
+                if now is None or prev is None or prev.clientid != now.clientid:
+                    self._clients.pop(account_id, None)
+                elif prev.access_token != now.access_token:
+                    self._retoken(self._clients[account_id], now)
+            self._accounts, self._loaded_at = fresh, time.time()
+        for account in changed:
+            self._notify(account)
+        return fresh
+
+    def on_account_down(self, callback: T.Callable[[Account], None]):
+        """Register a callback run when upstream rejects an account's token."""
+        self._down_listeners.append(callback)
+
+    def _notify(self, account: Account, listeners=None):
+        for callback in self._listeners if listeners is None else listeners:
+            try:
+                callback(account)
+            except Exception as e:
+                print(f"FYERS CLIENTS listener error: {e}")
+
+    @staticmethod
+    def _retoken(client, account: Account):
+        """Point an existing client (and its warm connections) at a new token"""
+        client.token = account.access_token
+        client.header = f"{account.clientid}:{account.access_token}"
+
+    # -----------------------------------------------------------------
+    def accounts(self) -> list[Account]:
+        return list(self._ensure_accounts().values())
+
+    def account(self, account_id: int | None = None) -> Account | None:
+        """The given account, or the first one holding an access token"""
+        accounts = self._ensure_accounts()
+        if account_id is not None:
+            return accounts.get(account_id)
+        return next((a for a in accounts.values() if a.access_token), None)
+
+    def usable(self, now: float | None = None) -> list[Account]:
+        """Accounts whose token is unexpired and has not been refused upstream"""
+        now = now or time.time()
+        out = []
+        for a in self._ensure_accounts().values():
+            if not a.access_token or self._rejected.get(a.id) == a.access_token:
+                continue
+            key = (a.id, a.access_token)
+            if key not in self._expiry:
+                self._expiry[key] = token_expiry(a)
+            expires = self._expiry[key]
+            if expires is None or expires > now:
+                out.append(a)
+        return out
+
+    def client(self, account: Account):
+        client = self._clients.get(account.id)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(account.id)
+                if client is None:
+                    client = self._clients[account.id] = self._factory(account)
+        return client
+
+    def get(self, account_id: int | None = None) -> tuple[T.Any, str | None]:
+        """(client, None) or (None, error) - same contract as get_fyers_client"""
+        try:
+            account = self.account(account_id)
+            if not account or not account.access_token:
+                return None, "No FYERS access token found"
+            return self.client(account), None
+        except Exception as e:
+            return None, str(e)
+
+    # -----------------------------------------------------------------
+    # Load balancing
+    def budget(self, account_id: int) -> RateBudget:
+        budget = self._budgets.get(account_id)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.setdefault(account_id, RateBudget())
+        return budget
+
+    def pick(self, exclude: T.Collection[int] = ()) -> Account | None:
+        """
+        A usable account chosen with probability proportional to its
+        remaining budget; the least-loaded one when all are exhausted.
+        The call is charged to the account's budget.
+        """
+        now = time.time()
+        candidates = [a for a in self.usable(now) if a.id not in exclude]
+        if not candidates:
+            return None
+        with self._lock:
+            weights = [self.budget(a.id).remaining(now) for a in candidates]
+            if any(weights):
+                account = random.choices(candidates, weights)[0]
+            else:
+                # Everyone is over budget: queue on the one that used least
+                account = min(candidates, key=lambda a: self.budget(a.id).backlog(now))
+            self.budget(account.id).record(now)
+        return account
+
+    def reject(self, account: Account, reason: str = ""):
+        """Upstream refused *account*'s token: route around it until it changes"""
+        with self._lock:
+            if self._rejected.get(account.id) == account.access_token:
+                return
+            self._rejected[account.id] = account.access_token
+        print(f"FYERS CLIENTS: {account.brokername} ({account.broker_user_id}) "
+              f"token rejected{': ' + reason if reason else ''}, failing over")
+        self._notify(account, self._down_listeners)
+
+    def throttled(self, account: Account, seconds: float = 1.0):
+        self.budget(account.id).exhaust(time.time(), seconds)
+
+    def balanced(self) -> tuple[T.Any, str | None]:
+        """(BalancedClient, None) while any account is usable, else (None, error)"""
+        if not self.usable():
+            return None, "No valid FYERS access token found"
+        return BalancedClient(self), None
+
+    def load(self) -> list[dict]:
+        """Per-account view of validity and budget use (for status endpoints)"""
+        now = time.time()
+        usable = {a.id for a in self.usable(now)}
+        return [{"broker_id": a.id, "broker_user_id": a.broker_user_id,
+                 "usable": a.id in usable, "calls": self.budget(a.id).used(now),
+                 "remaining": round(self.budget(a.id).remaining(now), 3)}
+                for a in self.accounts()]
+
+    def invalidate(self):
+        """
+        Re-read accounts on next use.  Clients survive a token change (their
+        header is swapped in place); deleted accounts lose theirs.
+        """
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def set_token(self, account_id: int, access_token: str,
+                  created_at: datetime | None = None, refresh_token: str | None = None):
+        """Install a token that was just written to the DB, without re-reading it"""
+        with self._lock:
+            accounts = dict(self._ensure_accounts())
+            account = accounts.get(account_id)
+            if account is None:
+                self._loaded_at = 0.0
+                return
+            account = account._replace(
+                access_token=access_token,
+                access_token_created_at=created_at or account.access_token_created_at,
+                refresh_token=refresh_token or account.refresh_token,
+                refresh_token_created_at=(created_at if refresh_token
+                                          else account.refresh_token_created_at))
+            accounts[account_id] = account
+            self._accounts = accounts
+            if account_id in self._clients:
+                self._retoken(self._clients[account_id], account)
+        self._notify(account)
+
+
+class BalancedClient:
+    """
+    Stand-in for a FyersModel: every API call goes to the account picked by
+    the registry, and is retried on another account when the chosen one's
+    token is refused or its rate limit is hit.
+    """
+
+    def __init__(self, registry: ClientRegistry):
+        self._registry = registry
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            tried: list[int] = []
+            response = {"s": "error", "message": "No valid FYERS access token found"}
+            while True:
+                account = self._registry.pick(exclude=tried)
+                if account is None:
+                    return response
+                tried.append(account.id)
+                response = getattr(self._registry.client(account), name)(*args, **kwargs)
+                code = response.get("code") if isinstance(response, dict) else None
+                if code in AUTH_ERROR_CODES:
+                    self._registry.reject(account, response.get("message", ""))
+                elif code in RATE_LIMIT_CODES:
+                    self._registry.throttled(account)
+                else:
+                    return response
+
+        return call
+
+
+fyers_clients = ClientRegistry()
+
+
+def get_fyers_client(account_id: int | None = None):
+    """
+    Get FYERS client with access token.  Without *account_id* the client is
+    load-balanced over every account with a live token.
+    """
+    if account_id is None:
+        return fyers_clients.balanced()
+    return fyers_clients.get(account_id)
@@ -0,0 +1,231 @@
+# ---------------------------------------------------------------------
+# Conditional GET helpers for polled JSON endpoints.
+#
+# Versions are sequence numbers that move only when the underlying data
+# changes, so an ``If-None-Match`` hit is answered with a bare 304 and
+# the payload is never rebuilt or re-serialized.
+#
+# A sequence counts writes in this process unless its name is declared
+# with ``shared()``: those are kept in the database (see ``share_through``)
+# so a write in one worker is seen by every other worker within
+# SHARED_RECHECK_SECONDS, instead of when its cached copy next expires.
+# Tags built from them with ``shared_etag()`` carry no process nonce, so
+# a poll answered by another worker (or after a restart) can still be 304.
+# ---------------------------------------------------------------------
+from __future__ import annotations
+import os, threading, time, typing as T
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context, jsonify, request
+
+# Sequence numbers restart with the process, so every tag carries a
+# per-process nonce – a stale tag from a previous worker never matches.
+_NONCE = f"{os.getpid():x}{int(time.time()):x}"
+
+SHARED_RECHECK_SECONDS = 2.0
+
+_lock = threading.Lock()
+_sequences: dict[str, list] = {}        # name -> [seq, modified_epoch]
+_listeners: dict[str, list] = {}        # name -> callbacks(seq)
+_started = time.time()
+
+_shared: dict[str, float] = {}          # shared name -> last sync (epoch)
+_global: set[str] = set()               # shared names whose seq came from the store
+_store: dict[str, T.Callable] = {}      # "load" / "advance" (share_through)
+
+
+def shared(name: str) -> str:
+    """Declare *name* a database-backed sequence; returns *name*."""
+    _shared.setdefault(name, 0.0)
+    return name
+
+
+def share_through(load: T.Callable[[str], tuple[int, float] | None],
+                  advance: T.Callable[[str, float], tuple[int, float]]):
+    """
+    Keep the shared sequences with *load(name)* → (seq, modified) or None
+    and *advance(name, now)* → the new (seq, modified).  Both run inside
+    an app context; without one the sequence stays process-local.
+    """
+    _store.update(load=load, advance=advance)
+
+
+def bump(name: str) -> int:
+    """Advance the data sequence for *name* (call on every write)."""
+    now = time.time()
+    synced = None
+    if name in _shared and _store and has_app_context():
+        try:
+            synced = _store["advance"](name, now)
+        except Exception as e:
+            print(f"HTTP CACHE: could not advance shared sequence {name}: {e}")
+    with _lock:
+        entry = _sequences.setdefault(name, [0, _started])
+        entry[:] = synced or (entry[0] + 1, now)
+        if synced:
+            _shared[name] = now
+            _global.add(name)
+        else:
+            _global.discard(name)
+        seq = entry[0]
+    for callback in _listeners.get(name, ()):
+        callback(seq)
+    return seq
+
+
+def on_bump(name: str, callback: T.Callable[[int], None]):
+    """Call *callback(seq)* after every bump of *name* in this process."""
+    with _lock:
+        _listeners.setdefault(name, []).append(callback)
+
+
+def sequence(name: str) -> tuple[int, float]:
+    """Current (seq, modified_epoch) for *name*."""
+    if name in _shared and _store and time.time() - _shared[name] >= SHARED_RECHECK_SECONDS \
+            and has_app_context():
+        _sync(name)
+    with _lock:
+        seq, modified = _sequences.get(name, (0, _started))
+        return seq, modified
+
+
+def _sync(name: str):
+    """Adopt the database copy of a shared sequence"""
+    try:
+        synced, failed = _store["load"](name), False
+    except Exception as e:
+        print(f"HTTP CACHE: could not read shared sequence {name}: {e}")
+        synced, failed = None, True
+    with _lock:
+        _shared[name] = time.time()
+        if synced:
+            _sequences[name] = list(synced)
+            _global.add(name)
+        elif not failed and not _sequences.get(name, (0,))[0]:
+            _global.add(name)           # never written anywhere: 0 everywhere
+
+
+def etag_for(*parts) -> str:
+    """Build an (unquoted) entity tag from version components."""
+    return "-".join([_NONCE, *(str(p) for p in parts)])
+
+
+def shared_etag(names: T.Iterable[str], *parts) -> str:
+    """
+    Tag from the sequences *names* and other *parts* that every process
+    derives alike (labels, minutes, content digests).  It has no nonce
+    when each sequence is shared and was read from the store; otherwise
+    it falls back to etag_for.
+    """
+    names = list(names)
+    seqs = [sequence(name)[0] for name in names]
+    with _lock:
+        portable = all(name in _global for name in names)
+    if not portable:
+        return etag_for(*seqs, *parts)
+    return "-".join(["db", *(str(p) for p in (*seqs, *parts))])
+
+
+def _http_date(epoch: float) -> datetime:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+
+
+def _not_modified(tag: str, last_modified: float | None) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(tag)
+    if last_modified is not None and request.if_modified_since:
+        return _http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def _finish(resp, tag: str, last_modified: float | None):
+    resp.set_etag(tag)
+    if last_modified is not None:
+        resp.last_modified = _http_date(last_modified)
+    # Let browsers keep the body but always revalidate before reusing it
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def not_modified_response(tag: str, last_modified: float | None = None):
+    return _finish(current_app.response_class(status=304), tag, last_modified)
+
+
+def conditional_json(tag: str, build: T.Callable[[], T.Any],
+                     last_modified: float | None = None):
+    """304 if the client already holds *tag*, otherwise ``jsonify(build())``."""
+    if _not_modified(tag, last_modified):
+        return not_modified_response(tag, last_modified)
+    return _finish(jsonify(build()), tag, last_modified)
+
+
+# ---------------------------------------------------------------------
+# Per-key payload cache for endpoints backed by upstream calls
+class VersionedCache:
+    """
+    Keeps the latest rendered payload per key.  ``store`` compares the new
+    data with the previous data and only advances the key's sequence when
+    they differ; the serialized body is kept so repeat polls skip jsonify.
+    """
+
+    class Entry:
+        __slots__ = ("seq", "data", "body", "modified", "checked")
+
+        def __init__(self):
+            self.seq = 0
+            self.data = None
+            self.body = b""
+            self.modified = 0.0
+            self.checked = 0.0
+
+    def __init__(self, ttl: float, max_keys: int = 512):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: dict[T.Hashable, VersionedCache.Entry] = {}
+        self._lock = threading.Lock()
+
+    def fresh(self, key, stable: tuple[float, float] | None = None) -> "VersionedCache.Entry | None":
+        """
+        Entry for *key* if it was confirmed against upstream within ttl, or
+        inside *stable* - a (since, until) span in which upstream cannot
+        change (e.g. between the close and the next open).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry or not entry.seq:
+            return None
+        now = time.time()
+        if now - entry.checked < self.ttl:
+            return entry
+        if stable and stable[0] <= entry.checked and now < stable[1]:
+            return entry
+        return None
+
+    def store(self, key, data, render: T.Callable[[float], T.Any]) -> "VersionedCache.Entry":
+        """
+        Record *data* for *key*.  ``render(modified)`` builds the JSON payload
+        and is only called when the data actually changed.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_keys:
+                    oldest = min(self._entries, key=lambda k: self._entries[k].checked)
+                    del self._entries[oldest]
+                entry = self._entries[key] = VersionedCache.Entry()
+            if entry.seq == 0 or entry.data != data:
+                entry.seq += 1
+                entry.data = data
+                entry.modified = now
+                entry.body = jsonify(render(now)).get_data()
+            entry.checked = now
+            return entry
+
+    def response(self, entry: "VersionedCache.Entry", *tag_parts):
+        """304 or the cached body for *entry*."""
+        tag = etag_for(*tag_parts, entry.seq)
+        if _not_modified(tag, entry.modified):
+            return not_modified_response(tag, entry.modified)
+        resp = current_app.response_class(entry.body, mimetype="application/json")
+        return _finish(resp, tag, entry.modified)
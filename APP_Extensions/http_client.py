@@ -0,0 +1,264 @@
+"""
+Shared HTTP client for direct upstream calls
+Every plain HTTP call the app makes itself (symbol master CSVs, the
+options-chain REST call, token refreshes) goes through `http_client`: one
+keep-alive requests.Session per process, so repeated calls to a host reuse
+a warm TCP/TLS connection instead of paying the handshake each time.
+
+  * at most HOST_MAX_CONNECTIONS requests per host run at once; callers
+    beyond that wait up to POOL_WAIT_SECONDS for a slot
+  * every call has a (connect, read) timeout, and download() also bounds
+    the whole transfer, so a stalled server cannot hold a worker forever
+  * failures that are safe to repeat (connect errors always; timeouts and
+    429/502/503/504 for idempotent calls) are retried a bounded number of
+    times with jittered exponential backoff, honouring Retry-After
+  * latency, errors and retries are recorded per host (status())
+
+The session is rebuilt in a forked child so workers never share sockets.
+"""
+from __future__ import annotations
+import collections, os, random, threading, time, typing as T
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests, urllib3
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT", "30"))
+DOWNLOAD_DEADLINE_SECONDS = 120.0
+MAX_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_CAP_SECONDS = 4.0
+HOST_MAX_CONNECTIONS = int(os.environ.get("HTTP_HOST_CONNECTIONS", "8"))
+HOST_POOLS = 8                   # hosts kept warm at once
+POOL_WAIT_SECONDS = 10.0
+LATENCY_SAMPLES = 200
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+Timeout = T.Union[float, T.Tuple[float, float], None]
+
+
+class HostBusy(requests.exceptions.ConnectionError):
+    """No connection slot for the host freed up within POOL_WAIT_SECONDS."""
+
+
+class DownloadTooSlow(requests.exceptions.Timeout):
+    """A download did not finish within its overall deadline."""
+
+
+class Download(T.NamedTuple):
+    status_code: int
+    headers: T.Mapping[str, str]
+    content: bytes
+    encoding: str | None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error downloading")
+
+
+class HostStats:
+    """Call counts and recent latencies of one upstream host."""
+
+    def __init__(self):
+        self.requests = self.errors = self.retries = self.in_flight = 0
+        self.bytes = 0
+        self.latencies: collections.deque[float] = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.last_status: int | None = None
+        self.last_error: str | None = None
+
+    def report(self) -> dict:
+        ordered = sorted(self.latencies)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": self.in_flight,
+            "bytes_downloaded": self.bytes,
+            "p50_ms": pick(0.5) if ordered else None,
+            "p95_ms": pick(0.95) if ordered else None,
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+        }
+
+
+class HttpClient:
+    """Pooled, rate-bounded, retrying requests.Session; thread-safe."""
+
+    def __init__(self, max_retries: int = MAX_RETRIES, host_connections: int = HOST_MAX_CONNECTIONS):
+        self.max_retries = max_retries
+        self.host_connections = host_connections
+        self.reset()
+
+    def reset(self):
+        """Fresh session, slots and stats (forked child / tests)"""
+        self._lock = threading.Lock()
+        self._session: requests.Session | None = None
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._stats: dict[str, HostStats] = {}
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # Retries are ours (with jitter and stats), not urllib3's
+                    adapter = HTTPAdapter(pool_connections=HOST_POOLS,
+                                          pool_maxsize=self.host_connections, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    # -----------------------------------------------------------------
+    # Per-host bookkeeping
+    def _host(self, url: str) -> tuple[threading.BoundedSemaphore, HostStats, str]:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.host_connections)
+                self._stats[host] = HostStats()
+            return self._slots[host], self._stats[host], host
+
+    @contextmanager
+    def _slot(self, url: str):
+        slot, stats, host = self._host(url)
+        if not slot.acquire(timeout=POOL_WAIT_SECONDS):
+            with self._lock:
+                stats.errors += 1
+                stats.last_error = "no free connection"
+            raise HostBusy(f"{host}: all {self.host_connections} connections busy")
+        with self._lock:
+            stats.in_flight += 1
+        try:
+            yield stats
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+            slot.release()
+
+    def _record(self, stats: HostStats, started: float, status: int | None = None,
+                error: Exception | None = None, size: int = 0):
+        with self._lock:
+            stats.requests += 1
+            stats.bytes += size
+            if error is None:
+                stats.latencies.append(time.perf_counter() - started)
+                stats.last_status = status
+            else:
+                stats.errors += 1
+                stats.last_error = f"{type(error).__name__}: {error}"[:200]
+
+    @staticmethod
+    def _never_sent(error: Exception) -> bool:
+        """The connection could not be opened, so the server saw nothing"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+    @staticmethod
+    def _backoff(attempt: int, response: requests.Response | None = None) -> float:
+        """Full-jitter exponential delay, or the server's Retry-After"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), BACKOFF_CAP_SECONDS)
+        return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    # -----------------------------------------------------------------
+    # Requests
+    def request(self, method: str, url: str, *, timeout: Timeout = None,
+                retries: int | None = None, idempotent: bool | None = None, **kwargs) -> requests.Response:
+        """
+        session.request() with the client's timeout and retry policy.
+        *idempotent* (default: by method) allows retrying timeouts and
+        retryable statuses; a POST that only reads should pass True.
+        The last response is returned whatever its status.
+        """
+        return self._send(method, url, timeout, retries, idempotent, None, kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def download(self, url: str, headers: dict | None = None,
+                 deadline: float = DOWNLOAD_DEADLINE_SECONDS, chunk_size: int = 64 * 1024) -> Download:
+        """
+        Streamed GET of a (large) file, read in chunks.  A stall is cut off
+        by the read timeout, a trickle by DownloadTooSlow once *deadline*
+        seconds pass (checked between chunks).
+        """
+        started = time.monotonic()
+
+        def read(resp: requests.Response) -> Download:
+            chunks: list[bytes] = []
+            with resp:
+                for chunk in resp.iter_content(chunk_size):
+                    chunks.append(chunk)
+                    if time.monotonic() - started > deadline:
+                        raise DownloadTooSlow(f"{url}: not complete after {deadline:.0f}s")
+            content = b"".join(chunks)
+            return Download(resp.status_code, resp.headers, content, resp.encoding)
+
+        return self._send("GET", url, None, None, None, read, {"headers": headers, "stream": True})
+
+    def _send(self, method, url, timeout, retries, idempotent, read, kwargs):
+        """Attempts of one call; *read* consumes a streamed body inside the host slot"""
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.max_retries if retries is None else retries
+        timeout = timeout or (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)
+        attempt = 0
+        while True:
+            with self._slot(url) as stats:
+                started = time.perf_counter()
+                try:
+                    resp = self.session.request(method, url, timeout=timeout, **kwargs)
+                    retry = idempotent and resp.status_code in RETRY_STATUSES and attempt < retries
+                    result = resp if retry or read is None else read(resp)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    self._record(stats, started, error=e)
+                    if isinstance(e, DownloadTooSlow) or attempt >= retries \
+                            or not (idempotent or self._never_sent(e)):
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    size = len(result.content) if isinstance(result, Download) else \
+                        int(resp.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(resp.content)
+                    self._record(stats, started, status=resp.status_code, size=size)
+                    if not retry:
+                        return result
+                    delay = self._backoff(attempt, resp)
+                    resp.close()
+                with self._lock:
+                    stats.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    # -----------------------------------------------------------------
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "connect_timeout_s": CONNECT_TIMEOUT_SECONDS,
+                "read_timeout_s": READ_TIMEOUT_SECONDS,
+                "max_retries": self.max_retries,
+                "host_connections": self.host_connections,
+                "hosts": {host: stats.report() for host, stats in self._stats.items()},
+            }
+
+
+http_client = HttpClient()
+os.register_at_fork(after_in_child=http_client.reset)
@@ -0,0 +1,429 @@
+"""
+Technical indicators over OHLCV candle arrays
+Full history is computed with NumPy; afterwards only newly closed bars are
+stepped through each indicator's saved state (the forming bar is evaluated
+on a throw-away copy of that state).
+"""
+from __future__ import annotations
+import math, threading, typing as T
+from collections import OrderedDict
+
+import numpy as np
+
+IST_OFFSET_SECONDS = 5 * 3600 + 1800      # VWAP resets on the IST trading day
+NAN = float("nan")
+
+
+class Bars(T.NamedTuple):
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_candles(cls, candles) -> "Bars":
+        """[[ts, o, h, l, c, v], ...] → column arrays"""
+        a = np.asarray(candles, dtype=np.float64).reshape(-1, 6)
+        return cls(a[:, 0].astype(np.int64), a[:, 1], a[:, 2], a[:, 3], a[:, 4], a[:, 5])
+
+
+# ---------------------------------------------------------------------
+# Vectorised building blocks
+def _recursive_mean(x: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """
+    y[i] = (1 - alpha) * y[i-1] + alpha * x[i] with y[-1] = seed.
+    Evaluated in closed form per block; the block length keeps
+    (1 - alpha) ** -k below ~1e6 so float64 precision is preserved.
+    """
+    beta = 1.0 - alpha
+    out = np.empty(len(x))
+    if not len(x):
+        return out
+    if beta <= 0.0:
+        out[:] = x
+        return out
+    block = max(1, int(6 * math.log(10) / -math.log(beta)))
+    prev = seed
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        k = np.arange(len(chunk))
+        y = beta ** k * (beta * prev + alpha * np.cumsum(chunk * beta ** -k))
+        out[start:start + len(chunk)] = y
+        prev = y[-1]
+    return out
+
+
+def _smooth(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Recursive mean seeded with the SMA of the first *period* values."""
+    out = np.full(len(x), NAN)
+    if len(x) < period:
+        return out
+    seed = float(x[:period].mean())
+    out[period - 1] = seed
+    out[period:] = _recursive_mean(x[period:], alpha, seed)
+    return out
+
+
+def _true_range(high, low, close) -> np.ndarray:
+    prev_close = np.concatenate(([NAN], close[:-1]))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return tr
+
+
+def _rolling_sum(x: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(x), NAN)
+    if len(x) >= period:
+        c = np.concatenate(([0.0], np.cumsum(x)))
+        out[period - 1:] = c[period:] - c[:-period]
+    return out
+
+
+# ---------------------------------------------------------------------
+# Step-wise smoothing state: (count, running_total, value)
+def _smooth_step(state, x: float, period: int, alpha: float):
+    count, total, value = state
+    if count < period:
+        count, total = count + 1, total + x
+        value = total / period if count == period else NAN
+    else:
+        value = value + alpha * (x - value)
+    return (count, total, value)
+
+
+def _smooth_state(x: np.ndarray, smoothed: np.ndarray, period: int):
+    n = len(x)
+    return (min(n, period), float(x[:period].sum()), float(smoothed[-1]) if n else NAN)
+
+
+# ---------------------------------------------------------------------
+# Indicators.  ``batch`` returns (outputs, state) for a full history,
+# ``step`` returns (outputs, state) for one more bar without mutating.
+class Indicator:
+    name = ""
+    outputs: tuple[str, ...] = ("value",)
+    # Constructor parameters in order: "period" (whole number >= 1) or "mult" (> 0)
+    param_kinds: tuple[str, ...] = ()
+
+    def __init__(self, *params):
+        self.params = params
+        self.key = "_".join([self.name, *(_fmt(p) for p in params)])
+
+    def batch(self, bars: Bars):
+        raise NotImplementedError
+
+    def step(self, state, bar):
+        raise NotImplementedError
+
+
+class EMA(Indicator):
+    name = "ema"
+    param_kinds = ("period",)
+
+    def __init__(self, period=20):
+        super().__init__(int(period))
+        self.period, self.alpha = int(period), 2.0 / (int(period) + 1)
+
+    def batch(self, bars):
+        value = _smooth(bars.close, self.period, self.alpha)
+        return {"value": value}, _smooth_state(bars.close, value, self.period)
+
+    def step(self, state, bar):
+        state = _smooth_step(state, bar[4], self.period, self.alpha)
+        return {"value": state[2]}, state
+
+
+class RSI(Indicator):
+    name = "rsi"
+    param_kinds = ("period",)
+
+    def __init__(self, period=14):
+        super().__init__(int(period))
+        self.period = int(period)
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+
+    def batch(self, bars):
+        delta = np.diff(bars.close)
+        gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+        alpha = 1.0 / self.period
+        avg_gain = _smooth(gains, self.period, alpha)
+        avg_loss = _smooth(losses, self.period, alpha)
+        value = np.concatenate(([NAN], self._rsi(avg_gain, avg_loss)))
+        prev_close = float(bars.close[-1]) if len(bars.close) else None
+        state = (prev_close, _smooth_state(gains, avg_gain, self.period),
+                 _smooth_state(losses, avg_loss, self.period))
+        return {"value": value}, state
+
+    def step(self, state, bar):
+        prev_close, gain_state, loss_state = state
+        close = bar[4]
+        if prev_close is None:
+            return {"value": NAN}, (close, gain_state, loss_state)
+        delta, alpha = close - prev_close, 1.0 / self.period
+        gain_state = _smooth_step(gain_state, max(delta, 0.0), self.period, alpha)
+        loss_state = _smooth_step(loss_state, max(-delta, 0.0), self.period, alpha)
+        value = float(self._rsi(np.float64(gain_state[2]), np.float64(loss_state[2])))
+        return {"value": value}, (close, gain_state, loss_state)
+
+
+class ATR(Indicator):
+    name = "atr"
+    param_kinds = ("period",)
+
+    def __init__(self, period=14):
+        super().__init__(int(period))
+        self.period = int(period)
+
+    def batch(self, bars):
+        tr = _true_range(bars.high, bars.low, bars.close)
+        if len(tr):
+            tr[0] = bars.high[0] - bars.low[0]
+        value = _smooth(tr, self.period, 1.0 / self.period)
+        prev_close = float(bars.close[-1]) if len(bars.close) else None
+        return {"value": value}, (prev_close, _smooth_state(tr, value, self.period))
+
+    def step(self, state, bar):
+        prev_close, smooth_state = state
+        high, low, close = bar[2], bar[3], bar[4]
+        tr = high - low if prev_close is None else max(high - low, abs(high - prev_close), abs(low - prev_close))
+        smooth_state = _smooth_step(smooth_state, tr, self.period, 1.0 / self.period)
+        return {"value": smooth_state[2]}, (close, smooth_state)
+
+
+class Bollinger(Indicator):
+    name = "bb"
+    outputs = ("upper", "middle", "lower")
+    param_kinds = ("period", "mult")
+
+    def __init__(self, period=20, mult=2):
+        super().__init__(int(period), float(mult))
+        self.period, self.mult = int(period), float(mult)
+
+    def batch(self, bars):
+        close = bars.close
+        mean = _rolling_sum(close, self.period) / self.period
+        var = np.clip(_rolling_sum(close * close, self.period) / self.period - mean * mean, 0, None)
+        band = self.mult * np.sqrt(var)
+        window = tuple(close[-self.period:].tolist())
+        return {"upper": mean + band, "middle": mean, "lower": mean - band}, window
+
+    def step(self, state, bar):
+        window = (state + (bar[4],))[-self.period:]
+        if len(window) < self.period:
+            return {k: NAN for k in self.outputs}, window
+        arr = np.asarray(window)
+        mean, band = float(arr.mean()), self.mult * float(arr.std())
+        return {"upper": mean + band, "middle": mean, "lower": mean - band}, window
+
+
+class VWAP(Indicator):
+    name = "vwap"
+
+    def batch(self, bars):
+        tp = (bars.high + bars.low + bars.close) / 3.0
+        day = (bars.ts + IST_OFFSET_SECONDS) // 86400
+        pv, vol = np.cumsum(tp * bars.volume), np.cumsum(bars.volume)
+        # Offsets of each bar's session start in the running sums
+        starts = np.concatenate(([True], day[1:] != day[:-1]))
+        idx = np.maximum.accumulate(np.where(starts, np.arange(len(day)), 0))
+        base_pv = np.concatenate(([0.0], pv))[idx]
+        base_vol = np.concatenate(([0.0], vol))[idx]
+        day_pv, day_vol = pv - base_pv, vol - base_vol
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = np.where(day_vol > 0, day_pv / day_vol, NAN)
+        state = ((int(day[-1]), float(day_pv[-1]), float(day_vol[-1])) if len(day) else (None, 0.0, 0.0))
+        return {"value": value}, state
+
+    def step(self, state, bar):
+        day, cum_pv, cum_vol = state
+        bar_day = (int(bar[0]) + IST_OFFSET_SECONDS) // 86400
+        if bar_day != day:
+            day, cum_pv, cum_vol = bar_day, 0.0, 0.0
+        cum_pv += (bar[2] + bar[3] + bar[4]) / 3.0 * bar[5]
+        cum_vol += bar[5]
+        return {"value": cum_pv / cum_vol if cum_vol > 0 else NAN}, (day, cum_pv, cum_vol)
+
+
+class SuperTrend(Indicator):
+    """Band ratcheting is path dependent, so the batch form reuses ``step``."""
+    name = "supertrend"
+    outputs = ("value", "direction")
+    param_kinds = ("period", "mult")
+
+    def __init__(self, period=10, mult=3):
+        super().__init__(int(period), float(mult))
+        self.period, self.mult = int(period), float(mult)
+        self._atr = ATR(self.period)
+
+    def batch(self, bars):
+        n = len(bars.ts)
+        value, direction = np.full(n, NAN), np.full(n, NAN)
+        state = (self._atr_initial(), NAN, NAN, 0, None)
+        columns = np.column_stack(bars)
+        for i in range(n):
+            out, state = self.step(state, columns[i])
+            value[i], direction[i] = out["value"], out["direction"]
+        return {"value": value, "direction": direction}, state
+
+    @staticmethod
+    def _atr_initial():
+        return (None, (0, 0.0, NAN))
+
+    def step(self, state, bar):
+        atr_state, upper, lower, trend, prev_close = state
+        _, atr_state = self._atr.step(atr_state, bar)
+        atr = atr_state[1][2]
+        high, low, close = bar[2], bar[3], bar[4]
+        if atr != atr:
+            return {"value": NAN, "direction": NAN}, (atr_state, upper, lower, trend, close)
+        mid = (high + low) / 2.0
+        basic_upper, basic_lower = mid + self.mult * atr, mid - self.mult * atr
+        if upper != upper or basic_upper < upper or prev_close > upper:
+            upper = basic_upper
+        if lower != lower or basic_lower > lower or prev_close < lower:
+            lower = basic_lower
+        if trend >= 0:
+            trend = -1 if close < lower else 1
+        else:
+            trend = 1 if close > upper else -1
+        value = lower if trend == 1 else upper
+        return {"value": value, "direction": float(trend)}, (atr_state, upper, lower, trend, close)
+
+
+INDICATORS: dict[str, type[Indicator]] = {
+    "ema": EMA,
+    "rsi": RSI,
+    "atr": ATR,
+    "bb": Bollinger,
+    "vwap": VWAP,
+    "supertrend": SuperTrend,
+}
+
+
+def _fmt(p) -> str:
+    return str(int(p)) if float(p).is_integer() else str(p)
+
+
+def parse_spec(spec: str) -> list[Indicator]:
+    """
+    ``"ema:20,rsi:14,bb:20:2,vwap"`` → indicator instances (ValueError on
+    junk); a repeated indicator is kept once, as every output is keyed by it
+    """
+    out: dict[str, Indicator] = {}
+    for item in filter(None, (s.strip().lower() for s in spec.split(","))):
+        name, *params = item.split(":")
+        cls = INDICATORS.get(name)
+        if cls is None:
+            raise ValueError(f"Unknown indicator '{name}'")
+        if len(params) > len(cls.param_kinds):
+            raise ValueError(f"'{name}' takes at most {len(cls.param_kinds)} parameter(s)")
+        values = [float(p) for p in params]
+        for kind, value in zip(cls.param_kinds, values):
+            if kind == "period" and not (math.isfinite(value) and value >= 1 and value.is_integer()):
+                raise ValueError(f"'{name}' period must be a whole number >= 1")
+            if kind == "mult" and not (math.isfinite(value) and value > 0):
+                raise ValueError(f"'{name}' multiplier must be > 0")
+        ind = cls(*values)
+        out.setdefault(ind.key, ind)
+    return list(out.values())
+
+
+# ---------------------------------------------------------------------
+# Incremental evaluation over a rolling candle window
+def _json(values) -> list:
+    return [None if v != v else round(float(v), 6) for v in values]
+
+
+class IndicatorSet:
+    """
+    Keeps committed (closed-bar) outputs and end state for a list of
+    indicators.  ``update`` treats every candle except the last as closed.
+    """
+
+    def __init__(self, indicators: list[Indicator]):
+        self.indicators = indicators
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.ts: list[int] = []
+        self.series = {ind.key: {o: [] for o in ind.outputs} for ind in self.indicators}
+        self.states: dict[str, T.Any] = {}
+
+    def _recompute(self, bars: Bars):
+        self._reset()
+        self.ts = bars.ts.tolist()
+        for ind in self.indicators:
+            outputs, state = ind.batch(bars)
+            self.series[ind.key] = {o: outputs[o].tolist() for o in ind.outputs}
+            self.states[ind.key] = state
+
+    def _commit(self, bar):
+        self.ts.append(int(bar[0]))
+        for ind in self.indicators:
+            outputs, self.states[ind.key] = ind.step(self.states[ind.key], bar)
+            for o in ind.outputs:
+                self.series[ind.key][o].append(outputs[o])
+
+    def _trim(self, first_ts: int):
+        cut = int(np.searchsorted(self.ts, first_ts))
+        if cut:
+            del self.ts[:cut]
+            for outputs in self.series.values():
+                for values in outputs.values():
+                    del values[:cut]
+
+    def update(self, candles) -> dict:
+        """Outputs aligned with *candles* (``{key: list | {output: list}}``)."""
+        bars = Bars.from_candles(candles)
+        n = len(bars.ts)
+        if n == 0:
+            return {ind.key: ({o: [] for o in ind.outputs} if len(ind.outputs) > 1 else [])
+                    for ind in self.indicators}
+        closed = Bars(*(col[:-1] for col in bars))
+        closed_ts = closed.ts.tolist()
+        with self._lock:
+            last = self.ts[-1] if self.ts else None
+            overlap = closed_ts.index(last) + 1 if last in closed_ts else 0
+            # Incremental only when the committed bars line up with this window
+            if not overlap or closed_ts[0] < self.ts[0] or \
+                    self.ts[-overlap:] != closed_ts[:overlap]:
+                self._recompute(closed)
+            else:
+                rows = np.column_stack(bars)
+                for i in range(overlap, n - 1):
+                    self._commit(rows[i])
+            self._trim(closed_ts[0] if closed_ts else int(bars.ts[-1]))
+
+            forming = np.column_stack(bars)[-1]
+            result = {}
+            for ind in self.indicators:
+                outputs, _ = ind.step(self.states[ind.key], forming)
+                cols = {o: _json(self.series[ind.key][o] + [outputs[o]]) for o in ind.outputs}
+                result[ind.key] = cols if len(ind.outputs) > 1 else cols["value"]
+        return result
+
+
+class IndicatorCache:
+    """LRU of IndicatorSet per (symbol, resolution, spec)."""
+
+    def __init__(self, max_sets: int = 256):
+        self.max_sets = max_sets
+        self._sets: "OrderedDict[tuple, IndicatorSet]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, resolution: str, spec: str) -> IndicatorSet:
+        key = (symbol, resolution, spec)
+        with self._lock:
+            found = self._sets.get(key)
+            if found is None:
+                found = self._sets[key] = IndicatorSet(parse_spec(spec))
+                if len(self._sets) > self.max_sets:
+                    self._sets.popitem(last=False)
+            self._sets.move_to_end(key)
+            return found
@@ -0,0 +1,106 @@
+"""
+Market-data providers
+Routes ask this module for a quotes/chain/history client, the accounts to
+stream on and a socket per account, so the source can be swapped without
+touching them.  MARKET_DATA_PROVIDER selects the entry of PROVIDERS:
+
+  fyers      live FYERS API (default) through the shared client registry
+  simulator  deterministic in-process market (MARKET_SIM_SEED, MARKET_SIM_TICK_MS)
+"""
+from __future__ import annotations
+import os, typing as T
+
+from APP_Extensions.fyers_clients import Account, fyers_clients, get_fyers_client
+
+from APP_Extensions.startup import lazy_import
+
+# Optional import: only needed when the fyers SDK is installed (on first use)
+fyers_data_ws = lazy_import("fyers_apiv3.FyersWebsocket.data_ws")
+
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "fyers").strip().lower()
+
+SocketCallbacks = T.Callable[..., None]
+MarketDataProvider = T.TypedDict("MarketDataProvider", {
+    # (account_id | None) → (client, None) | (None, error); the client
+    # answers quotes / optionchain / history like fyersModel.FyersModel
+    "client":   T.Callable[[T.Optional[int]], tuple[T.Any, T.Optional[str]]],
+    # accounts a socket can be opened on right now
+    "accounts": T.Callable[[], list[Account]],
+    # (account, on_message, on_error, on_close) → connected socket with
+    # subscribe / unsubscribe / close_connection like FyersDataSocket
+    "socket":   T.Callable[[Account, SocketCallbacks, SocketCallbacks, SocketCallbacks], T.Any],
+})
+
+
+# ---------------------------------------------------------------------
+# FYERS
+def _fyers_socket(account: Account, on_message, on_error, on_close):
+    data_ws = fyers_data_ws()
+    if data_ws is None:
+        raise RuntimeError("fyers-apiv3 SDK not installed")
+    socket = data_ws.FyersDataSocket(
+        access_token=f"{account.clientid}:{account.access_token}",
+        on_message=on_message,
+        on_error=on_error,
+        on_close=on_close
+    )
+    socket.connect()
+    return socket
+
+
+# ---------------------------------------------------------------------
+# Simulator (built on first use so the fyers path never imports it)
+SIM_ACCOUNT = Account(0, "simulator", "SIM", "SIM", "sim", None, None)
+_sim = None
+
+def _sim_market():
+    global _sim
+    if _sim is None:
+        from APP_Extensions.market_sim import SimulatedMarket, SimFyersModel
+        market = SimulatedMarket(seed=int(os.environ.get("MARKET_SIM_SEED", "7")))
+        _sim = (market, SimFyersModel(market))
+    return _sim
+
+def _sim_client(account_id: int | None = None):
+    return _sim_market()[1], None
+
+def _sim_socket(account: Account, on_message, on_error, on_close):
+    from APP_Extensions.market_sim import SimDataSocket
+    socket = SimDataSocket(_sim_market()[0], on_message=on_message, on_error=on_error,
+                           on_close=on_close,
+                           interval=int(os.environ.get("MARKET_SIM_TICK_MS", "1000")) / 1000)
+    socket.connect()
+    return socket
+
+
+PROVIDERS: dict[str, MarketDataProvider] = {
+    "fyers":     {"client": get_fyers_client, "accounts": fyers_clients.usable,
+                  "socket": _fyers_socket},
+    "simulator": {"client": _sim_client, "accounts": lambda: [SIM_ACCOUNT],
+                  "socket": _sim_socket},
+    # …add other providers here…
+}
+
+
+def provider(name: str | None = None) -> MarketDataProvider:
+    name = name or MARKET_DATA_PROVIDER
+    p = PROVIDERS.get(name)
+    if not p:
+        raise KeyError(f"Unknown market data provider '{name}'")
+    return p
+
+
+def get_market_client(account_id: int | None = None):
+    """Client of the configured provider - same (client, error) contract as get_fyers_client"""
+    try:
+        return provider()["client"](account_id)
+    except Exception as e:
+        return None, str(e)
+
+
+def market_accounts() -> list[Account]:
+    return provider()["accounts"]()
+
+
+def open_market_socket(account: Account, on_message, on_error, on_close):
+    return provider()["socket"](account, on_message, on_error, on_close)
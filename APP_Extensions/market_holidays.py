@@ -0,0 +1,118 @@
+"""
+Cached exchange holiday / special-session calendar
+The MarketHoliday table is read once into {exchange: {date: entry}} and
+re-read only after a write (or every RECHECK_SECONDS, for other workers),
+so "is there a session today" never costs a query or a network call.
+"""
+from __future__ import annotations
+import csv, datetime, io, threading, time, typing as T
+
+from APP_Extensions import http_cache
+
+RECHECK_SECONDS = 60
+SESSION_TYPES = ("holiday", "special")
+
+
+class HolidayEntry(T.NamedTuple):
+    exchange_code: str
+    date: datetime.date
+    session_type: str
+    description: str | None
+    open: datetime.time | None          # special-session hours (local)
+    close: datetime.time | None
+
+    @property
+    def closed(self) -> bool:
+        return self.session_type == "holiday"
+
+
+def _hm(value: str | None) -> datetime.time | None:
+    if not value:
+        return None
+    return datetime.datetime.strptime(value.strip(), "%H:%M").time()
+
+
+def parse_entry(item: dict) -> dict:
+    """
+    Validate one import record → column values; raises ValueError.
+    Accepts exchange_code/exchange, date (YYYY-MM-DD), description,
+    session_type (holiday|special), open_time/close_time for specials.
+    """
+    exchange = (item.get("exchange_code") or item.get("exchange") or "").strip().upper()
+    if not exchange:
+        raise ValueError("exchange_code required")
+    try:
+        day = datetime.date.fromisoformat(str(item.get("date", "")).strip())
+    except ValueError:
+        raise ValueError("date must be YYYY-MM-DD")
+    session_type = (item.get("session_type") or "holiday").strip().lower()
+    if session_type not in SESSION_TYPES:
+        raise ValueError(f"session_type must be one of {', '.join(SESSION_TYPES)}")
+    open_time = (item.get("open_time") or "").strip() or None
+    close_time = (item.get("close_time") or "").strip() or None
+    if session_type == "special":
+        try:
+            if not (_hm(open_time) and _hm(close_time)) or _hm(open_time) >= _hm(close_time):
+                raise ValueError
+        except ValueError:
+            raise ValueError("special sessions need open_time < close_time (HH:MM)")
+    else:
+        open_time = close_time = None
+    return {"exchange_code": exchange, "holiday_date": day,
+            "description": (item.get("description") or "").strip() or None,
+            "session_type": session_type, "open_time": open_time, "close_time": close_time}
+
+
+def parse_csv(text: str) -> list[dict]:
+    """CSV with a header row using the same field names as the JSON import"""
+    return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+
+def _load_entries() -> list[HolidayEntry]:
+    from models import MarketHoliday
+    rows = MarketHoliday.query.filter_by(user_id=0).all()
+    return [HolidayEntry(r.exchange_code.upper(), r.holiday_date, r.session_type, r.description,
+                         _hm(r.open_time), _hm(r.close_time)) for r in rows]
+
+
+class HolidayCalendar:
+    """{exchange: {date: HolidayEntry}} kept in memory."""
+
+    def __init__(self, seq_name: str, loader: T.Callable[[], list[HolidayEntry]] = _load_entries):
+        self.seq_name = seq_name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[datetime.date, HolidayEntry]] | None = None
+        self._loaded_seq = -1
+        self._loaded_at = 0.0
+        self.version = 0
+
+    def _stale(self, now: float) -> bool:
+        return (self._entries is None or now - self._loaded_at >= RECHECK_SECONDS
+                or http_cache.sequence(self.seq_name)[0] != self._loaded_seq)
+
+    def entries(self) -> dict[str, dict[datetime.date, HolidayEntry]]:
+        """Current table (needs an app context when a reload is due)"""
+        now = time.time()
+        if self._stale(now):
+            with self._lock:
+                if self._stale(now):
+                    seq = http_cache.sequence(self.seq_name)[0]
+                    table: dict[str, dict[datetime.date, HolidayEntry]] = {}
+                    for entry in self._loader():
+                        table.setdefault(entry.exchange_code, {})[entry.date] = entry
+                    if table != self._entries:
+                        self.version += 1
+                    self._entries, self._loaded_seq, self._loaded_at = table, seq, now
+        return self._entries
+
+    def lookup(self, exchange_code: str, day: datetime.date) -> HolidayEntry | None:
+        return self.entries().get(exchange_code.upper(), {}).get(day)
+
+    def has_session(self, exchange_code: str, day: datetime.date,
+                    trading_days: T.Collection[int] = (1, 2, 3, 4, 5)) -> bool:
+        """Whether *exchange_code* trades at all on *day* (local date)"""
+        entry = self.lookup(exchange_code, day)
+        if entry is not None:
+            return not entry.closed
+        return day.isoweekday() in trading_days
@@ -0,0 +1,290 @@
+"""
+Market-hours scheduler
+Turns the precomputed session timeline into one phase per exchange:
+
+  warmup   WARMUP_LEAD before the (pre-)open - sockets and samplers resume
+  open     until GRACE after the close
+  closed   everything else - feeds are unsubscribed, samplers sleep and
+           polled responses tell the browser when to come back
+
+Symbols are mapped to an exchange by their "NSE:" prefix; exchanges without
+an active MarketTime row are always treated as open.  A daemon thread sleeps
+until the next phase change and tells the listeners registered with
+on_change(), so nothing is polled to find out the market has shut.
+"""
+from __future__ import annotations
+import bisect, os, threading, time, typing as T
+from datetime import datetime
+
+import pytz
+
+from APP_Extensions.market_data import MARKET_DATA_PROVIDER
+
+IST = pytz.timezone("Asia/Kolkata")
+
+# The simulator trades around the clock, so it is not scheduled by default
+ENABLED = os.environ.get("MARKET_SCHEDULER",
+                         "0" if MARKET_DATA_PROVIDER == "simulator" else "1") not in ("0", "false", "no")
+WARMUP_LEAD_SECONDS = int(os.environ.get("MARKET_WARMUP_MINUTES", "5")) * 60
+GRACE_SECONDS = int(os.environ.get("MARKET_CLOSE_GRACE_MINUTES", "5")) * 60
+RECHECK_SECONDS = 60                # picks up market / holiday edits
+CLIENT_BACKOFF_MAX_SECONDS = 300    # longest a browser is told to stay quiet
+
+PHASES = ("warmup", "open", "closed")
+PhaseListener = T.Callable[[str, str], None]
+
+
+def exchange_of(symbol: str | None) -> str | None:
+    """"NSE:NIFTY50-INDEX" → "NSE" (None when the symbol has no prefix)"""
+    if not symbol or ":" not in symbol:
+        return None
+    return symbol.split(":", 1)[0].strip().upper() or None
+
+
+class Window(T.NamedTuple):
+    """One session of an exchange as UTC epochs"""
+    warmup: float
+    open: float
+    end: float                      # close + grace
+
+
+def _default_engine():
+    from APP_Routes.market_times import session_engine
+    return session_engine
+
+
+class MarketScheduler:
+    """Per-exchange phase from the session engine, with change listeners."""
+
+    def __init__(self, engine_factory: T.Callable[[], T.Any] = _default_engine, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self._engine_factory = engine_factory
+        self._engine = None
+        self._lock = threading.Lock()
+        self._windows: dict[str, list[Window]] = {}
+        self._starts: dict[str, list[float]] = {}
+        self._ends: dict[str, list[float]] = {}
+        self._first: dict[str, float] = {}         # start of the timeline window
+        self._engine_version = -1
+        self._listeners: list[PhaseListener] = []
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._app = None
+        self.phases: dict[str, str] = {}
+        self.changed_at: dict[str, float] = {}
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = self._engine_factory()
+        return self._engine
+
+    # -----------------------------------------------------------------
+    # Session windows (rebuilt whenever the engine rebuilds its timelines)
+    def windows(self, now: float | None = None) -> dict[str, list[Window]]:
+        """{exchange: sorted sessions} (needs an app context when a reload is due)"""
+        now = now or time.time()
+        timelines = self.engine.timelines(now)
+        if self.engine.version != self._engine_version:
+            with self._lock:
+                if self.engine.version != self._engine_version:
+                    windows: dict[str, list[Window]] = {}
+                    first: dict[str, float] = {}
+                    for timeline in timelines:
+                        exchange = timeline.facts.exchange_code.upper()
+                        if timeline.days:
+                            first[exchange] = min(first.get(exchange, timeline.days[0].start),
+                                                  timeline.days[0].start)
+                        for day in timeline.days:
+                            if not day.is_trading_day:
+                                continue
+                            start = min(day.open, day.premarket_start or day.open)
+                            windows.setdefault(exchange, []).append(
+                                Window(start - WARMUP_LEAD_SECONDS, day.open, day.close + GRACE_SECONDS))
+                    for sessions in windows.values():
+                        sessions.sort()
+                    self._windows = windows
+                    self._starts = {ex: [w.warmup for w in s] for ex, s in windows.items()}
+                    self._ends = {ex: [w.end for w in s] for ex, s in windows.items()}
+                    self._first = first
+                    self._engine_version = self.engine.version
+        return self._windows
+
+    def _current(self, exchange: str, now: float) -> tuple[Window | None, Window | None]:
+        """(session containing now, next session) of *exchange*"""
+        sessions = self.windows(now).get(exchange, [])
+        i = bisect.bisect_right(self._starts.get(exchange, []), now)
+        current = sessions[i - 1] if i and now < sessions[i - 1].end else None
+        return current, sessions[i] if i < len(sessions) else None
+
+    def phase(self, exchange: str | None, now: float | None = None) -> str | None:
+        """warmup / open / closed (None = not scheduled: unknown exchange or disabled)"""
+        if not self.enabled or not exchange:
+            return None
+        now = now or time.time()
+        exchange = exchange.upper()
+        if exchange not in self.windows(now):
+            return None
+        current, _ = self._current(exchange, now)
+        if current is None:
+            return "closed"
+        return "warmup" if now < current.open else "open"
+
+    def frozen(self, exchange: str | None, now: float | None = None) -> tuple[float, float] | None:
+        """
+        (end of the last session, next open) while *exchange* is between
+        sessions - upstream prices cannot change inside that span, so data
+        fetched in it stays current until the open.  None otherwise.
+        """
+        if self.phase(exchange, now) not in ("closed", "warmup"):
+            return None
+        now = now or time.time()
+        exchange = exchange.upper()
+        sessions = self._windows.get(exchange, [])
+        i = bisect.bisect_right(self._ends.get(exchange, []), now)
+        upcoming = next((w for w in sessions[i:] if w.open > now), None)
+        if upcoming is None:
+            return None
+        # No session yet in the window (e.g. Monday morning): nothing traded since it began
+        return sessions[i - 1].end if i else self._first[exchange], upcoming.open
+
+    def is_active(self, exchange: str | None, now: float | None = None) -> bool:
+        return self.phase(exchange, now) != "closed"
+
+    def active_symbols(self, symbols: T.Iterable[str], now: float | None = None) -> list[str]:
+        """*symbols* whose exchange is warming up or open"""
+        now = now or time.time()
+        active: dict[str | None, bool] = {}
+        out = []
+        for symbol in symbols:
+            exchange = exchange_of(symbol)
+            if exchange not in active:
+                active[exchange] = self.is_active(exchange, now)
+            if active[exchange]:
+                out.append(symbol)
+        return out
+
+    def seconds_until_active(self, exchange: str | None, now: float | None = None) -> float | None:
+        """0 while active, seconds to the next warm-up otherwise (None = none in the window)"""
+        now = now or time.time()
+        if self.is_active(exchange, now):
+            return 0.0
+        _, upcoming = self._current(exchange.upper(), now)
+        return upcoming.warmup - now if upcoming else None
+
+    def idle_seconds(self, symbols: T.Iterable[str], now: float | None = None) -> float:
+        """How long nothing in *symbols* needs data (0 if any of them is active)"""
+        now = now or time.time()
+        waits = [self.seconds_until_active(ex, now) for ex in {exchange_of(s) for s in symbols}]
+        if not waits or 0.0 in waits:
+            return 0.0
+        return min((w for w in waits if w is not None), default=RECHECK_SECONDS)
+
+    def next_change(self, now: float | None = None) -> float | None:
+        """Earliest instant any exchange changes phase"""
+        now = now or time.time()
+        points = []
+        for exchange in self.windows(now):
+            current, upcoming = self._current(exchange, now)
+            if current is not None:
+                points.append(current.open if now < current.open else current.end)
+            if upcoming is not None:
+                points.append(upcoming.warmup)
+        return min((p for p in points if p > now), default=None)
+
+    # -----------------------------------------------------------------
+    # Browser back-off
+    def annotate(self, response, symbols: T.Iterable[str]):
+        """Add X-Market-Session (and X-Poll-After while closed) for *symbols*"""
+        try:
+            now = time.time()
+            exchanges = {ex for ex in map(exchange_of, symbols) if ex}
+            phases = {self.phase(ex, now) for ex in exchanges} - {None}
+            if not phases:
+                return response
+            for phase in PHASES:
+                if phase in phases:
+                    response.headers["X-Market-Session"] = phase
+                    break
+            if phases == {"closed"}:
+                wait = self.idle_seconds(symbols, now)
+                response.headers["X-Poll-After"] = str(int(min(wait, CLIENT_BACKOFF_MAX_SECONDS)))
+        except Exception as e:
+            print(f"MARKET SCHEDULER: cannot annotate response: {e}")
+        return response
+
+    # -----------------------------------------------------------------
+    # Listeners / background thread
+    def on_change(self, callback: PhaseListener):
+        """callback(exchange, phase) when an exchange enters a new phase (scheduler thread)"""
+        self._listeners.append(callback)
+
+    def run_once(self, now: float | None = None) -> float:
+        """Publish phase changes; returns seconds until the next one is due."""
+        now = now or time.time()
+        for exchange in self.windows(now):
+            phase = self.phase(exchange, now)
+            if self.phases.get(exchange) == phase:
+                continue
+            previous = self.phases.get(exchange)
+            self.phases[exchange] = phase
+            self.changed_at[exchange] = now
+            if previous is not None:
+                print(f"MARKET SCHEDULER: {exchange} {previous} → {phase}")
+            for callback in self._listeners:
+                try:
+                    callback(exchange, phase)
+                except Exception as e:
+                    print(f"MARKET SCHEDULER listener error ({exchange} {phase}): {e}")
+        upcoming = self.next_change(now)
+        return min(upcoming - now if upcoming else RECHECK_SECONDS, RECHECK_SECONDS)
+
+    def start(self, app):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, name="market-scheduler", daemon=True)
+        self._thread.start()
+        print(f"MARKET SCHEDULER: started, warm-up {WARMUP_LEAD_SECONDS // 60}min, "
+              f"grace {GRACE_SECONDS // 60}min")
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    delay = self.run_once()
+            except Exception as e:
+                print(f"MARKET SCHEDULER ERROR: {e}")
+                delay = RECHECK_SECONDS
+            self._wake.wait(max(1.0, delay))
+
+    def status(self, now: float | None = None) -> dict:
+        now = now or time.time()
+        fmt = lambda ts: datetime.fromtimestamp(ts, IST).isoformat() if ts else None
+        upcoming = self.next_change(now) if self.enabled else None
+        exchanges = {}
+        for exchange in (self.windows(now) if self.enabled else {}):
+            current, following = self._current(exchange, now)
+            exchanges[exchange] = {
+                "phase": self.phase(exchange, now),
+                "since": fmt(self.changed_at.get(exchange)),
+                "session_end": fmt(current.end) if current else None,
+                "next_warmup": fmt(following.warmup) if following else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "warmup_minutes": WARMUP_LEAD_SECONDS // 60,
+            "grace_minutes": GRACE_SECONDS // 60,
+            "next_change": fmt(upcoming),
+            "exchanges": exchanges,
+        }
+
+
+market_scheduler = MarketScheduler()
+
+
+def start_market_scheduler(app):
+    """Start publishing phase changes unless MARKET_SCHEDULER=0"""
+    market_scheduler.start(app)
@@ -0,0 +1,360 @@
+"""
+Precomputed market session timeline
+Every active MarketTime row is expanded once into per-day UTC instants
+(pre-market, open, lunch, close, after-hours) for a rolling window of local
+days, with exchange holidays and special sessions applied.  Status, local clocks and countdowns are then a bisect over the day
+starts plus a few comparisons - no strptime or timezone conversion per poll.
+The window is rebuilt when it rolls over or a market row changes.
+"""
+from __future__ import annotations
+import bisect, datetime, threading, time, typing as T
+
+import pytz
+
+from APP_Extensions import http_cache
+from APP_Extensions.market_holidays import HolidayCalendar, HolidayEntry
+
+WINDOW_PAST_DAYS = 1
+WINDOW_DAYS = 14
+RECHECK_SECONDS = 60               # picks up writes made by other workers
+IST = pytz.timezone("Asia/Kolkata")
+IST_OFFSET = 19800
+
+
+def _hm(value: str | None) -> datetime.time | None:
+    if not value:
+        return None
+    hours, _, minutes = value.partition(":")
+    return datetime.time(int(hours), int(minutes))
+
+
+class MarketFacts(T.NamedTuple):
+    """Plain copy of the MarketTime columns the timeline needs."""
+    id: int
+    market_name: str
+    country: str
+    exchange_code: str
+    timezone: str
+    trading_days: frozenset
+    local_open_time: str
+    local_close_time: str
+    open: datetime.time
+    close: datetime.time
+    premarket_start: datetime.time | None
+    afterhours_end: datetime.time | None
+    lunch_start: datetime.time | None
+    lunch_end: datetime.time | None
+    notify_open: bool
+    notify_close: bool
+    sound_enabled: bool
+
+    @classmethod
+    def from_row(cls, row) -> "MarketFacts":
+        return cls(row.id, row.market_name, row.country, row.exchange_code, row.timezone,
+                   frozenset(int(d) for d in row.trading_days.split(',')),
+                   row.local_open_time, row.local_close_time,
+                   _hm(row.local_open_time), _hm(row.local_close_time),
+                   _hm(row.premarket_start), _hm(row.afterhours_end),
+                   _hm(row.lunch_start), _hm(row.lunch_end),
+                   row.notify_open, row.notify_close, row.sound_enabled)
+
+
+class SessionDay(T.NamedTuple):
+    """One local calendar day of a market, as UTC epochs"""
+    date: datetime.date
+    start: float                    # local midnight
+    end: float                      # next local midnight
+    offset: int                     # UTC offset (s) at the start of the day
+    offset_change: float            # instant a DST switch applies (inf if none)
+    offset_after: int
+    is_trading_day: bool
+    open: float
+    close: float
+    premarket_start: float | None
+    afterhours_end: float | None
+    lunch_start: float | None
+    lunch_end: float | None
+    holiday: bool = False
+    note: str | None = None          # holiday / special-session description
+
+    def local_offset(self, now: float) -> int:
+        return self.offset_after if now >= self.offset_change else self.offset
+
+    def to_json(self) -> dict:
+        iso = lambda ts: (datetime.datetime.fromtimestamp(ts, pytz.UTC).isoformat()
+                          if ts is not None else None)
+        return {"date": self.date.isoformat(), "note": self.note,
+                "premarket_start": iso(self.premarket_start),
+                "open": iso(self.open), "lunch_start": iso(self.lunch_start),
+                "lunch_end": iso(self.lunch_end), "close": iso(self.close),
+                "afterhours_end": iso(self.afterhours_end)}
+
+
+def _offset(tz, ts: float) -> int:
+    return int(datetime.datetime.fromtimestamp(ts, tz).utcoffset().total_seconds())
+
+
+def build_day(facts: MarketFacts, tz, day: datetime.date,
+              entry: HolidayEntry | None = None) -> SessionDay:
+    at = lambda t: tz.localize(datetime.datetime.combine(day, t)).timestamp() if t else None
+    start = at(datetime.time(0))
+    end = tz.localize(datetime.datetime.combine(day + datetime.timedelta(days=1),
+                                                datetime.time(0))).timestamp()
+    offset, offset_after = _offset(tz, start), _offset(tz, end)
+    change = float("inf")
+    if offset != offset_after:
+        # DST switch inside the day: find the instant to the minute
+        lo, hi = start, end
+        while hi - lo > 60:
+            mid = (lo + hi) // 2
+            lo, hi = (mid, hi) if _offset(tz, mid) == offset else (lo, mid)
+        change = hi
+    if entry is not None and entry.closed:
+        return SessionDay(day, start, end, offset, change, offset_after, False,
+                          at(facts.open), at(facts.close), None, None, None, None,
+                          True, entry.description)
+    if entry is not None:
+        # Special session (e.g. muhurat): only its own hours, any weekday
+        return SessionDay(day, start, end, offset, change, offset_after, True,
+                          at(entry.open), at(entry.close), None, None, None, None,
+                          False, entry.description)
+    return SessionDay(day, start, end, offset, change, offset_after,
+                      day.isoweekday() in facts.trading_days,
+                      at(facts.open), at(facts.close),
+                      at(facts.premarket_start), at(facts.afterhours_end),
+                      at(facts.lunch_start), at(facts.lunch_end))
+
+
+class MarketTimeline:
+    """SessionDays of one market over the window, searchable by instant."""
+
+    def __init__(self, facts: MarketFacts, first: datetime.date, days: int,
+                 holidays: dict[datetime.date, HolidayEntry] | None = None):
+        self.facts = facts
+        tz = pytz.timezone(facts.timezone)
+        holidays = holidays or {}
+        dates = [first + datetime.timedelta(days=i) for i in range(days)]
+        self.days = [build_day(facts, tz, d, holidays.get(d)) for d in dates]
+        self.starts = [d.start for d in self.days]
+
+    def day_at(self, now: float) -> SessionDay | None:
+        i = bisect.bisect_right(self.starts, now) - 1
+        if i < 0 or now >= self.days[i].end:
+            return None
+        return self.days[i]
+
+    def upcoming(self, now: float, count: int) -> list[SessionDay]:
+        """Next *count* trading sessions that have not closed yet"""
+        i = max(0, bisect.bisect_right(self.starts, now) - 1)
+        return [d for d in self.days[i:] if d.is_trading_day and d.close > now][:count]
+
+    # Same states as the original per-request computation
+    @staticmethod
+    def status(day: SessionDay, now: float) -> tuple[str, str]:
+        if day.holiday:
+            return "closed", "closed_holiday"
+        if not day.is_trading_day:
+            return "closed", "closed_weekend"
+        if now < day.open:
+            return "pre_market", "opening"
+        if now >= day.close:
+            return "closed", "closed_day"
+        if day.lunch_start is not None and day.lunch_end is not None \
+                and day.lunch_start <= now <= day.lunch_end:
+            return "lunch_break", "lunch_end"
+        return "open", "closing"
+
+    def next_transition(self, now: float) -> float | None:
+        """Earliest instant after *now* at which status() can change"""
+        for day in self.days[max(0, bisect.bisect_right(self.starts, now) - 1):]:
+            points = [day.start, day.end]
+            if day.is_trading_day:
+                points += [day.open, day.close, day.lunch_start, day.lunch_end]
+            later = [p for p in points if p is not None and p > now]
+            if later:
+                return min(later)
+        return None
+
+
+def _clock(ts: float, offset: int, fmt: str) -> str:
+    return time.strftime(fmt, time.gmtime(ts + offset))
+
+
+def _load_facts() -> list[MarketFacts]:
+    from models import MarketTime
+    facts = []
+    for row in MarketTime.query.filter_by(user_id=0, is_active=True).all():
+        try:
+            facts.append(MarketFacts.from_row(row))
+        except Exception as e:
+            # Skip this market if its row cannot be parsed
+            print(f"MARKET SESSIONS: skipping {row.market_name}: {e}")
+    return facts
+
+
+class SessionEngine:
+    """Timelines of all active markets; rebuilt on change or window roll-over."""
+
+    def __init__(self, seq_name: str, holidays: HolidayCalendar,
+                 loader: T.Callable[[], list[MarketFacts]] = _load_facts):
+        self.seq_name = seq_name
+        self.holidays = holidays
+        self._loader = loader
+        self._holidays_version = -1
+        self._lock = threading.Lock()
+        self._timelines: list[MarketTimeline] = []
+        self._facts: list[MarketFacts] | None = None
+        self._loaded_seq = -1
+        self._loaded_at = 0.0
+        self._valid_until = 0.0
+        self.version = 0
+        self.built_at = 0.0
+
+    def _stale(self, now: float) -> bool:
+        return (now >= self._valid_until or now - self._loaded_at >= RECHECK_SECONDS
+                or http_cache.sequence(self.seq_name)[0] != self._loaded_seq
+                or self.holidays.version != self._holidays_version)
+
+    def timelines(self, now: float | None = None) -> list[MarketTimeline]:
+        """Current timelines (needs an app context when a reload is due)"""
+        now = now or time.time()
+        self.holidays.entries()
+        if self._stale(now):
+            with self._lock:
+                if self._stale(now):
+                    self._rebuild(now)
+        return self._timelines
+
+    def _rebuild(self, now: float):
+        seq = http_cache.sequence(self.seq_name)[0]
+        facts = self._loader()
+        holidays = self.holidays.entries()
+        first = datetime.datetime.fromtimestamp(now, pytz.UTC).date() \
+            - datetime.timedelta(days=WINDOW_PAST_DAYS + 1)
+        if facts != self._facts or now >= self._valid_until \
+                or self.holidays.version != self._holidays_version:
+            timelines = []
+            for f in facts:
+                try:
+                    timelines.append(MarketTimeline(f, first, WINDOW_PAST_DAYS + WINDOW_DAYS + 2,
+                                                    holidays.get(f.exchange_code.upper())))
+                except Exception as e:
+                    print(f"MARKET SESSIONS: cannot build {f.market_name}: {e}")
+            self._timelines = timelines
+            self.version += 1
+            self.built_at = now
+            # Roll the window a day before its last full day is reached
+            self._valid_until = (datetime.datetime.combine(first, datetime.time(0), pytz.UTC)
+                                 + datetime.timedelta(days=WINDOW_PAST_DAYS + 2)).timestamp()
+        self._facts, self._loaded_seq, self._loaded_at = facts, seq, now
+        self._holidays_version = self.holidays.version
+
+    # -----------------------------------------------------------------
+    # Payloads
+    def current_status(self, now: float | None = None) -> list[dict]:
+        now = now or time.time()
+        out = []
+        for timeline in self.timelines(now):
+            day = timeline.day_at(now)
+            if day is None:
+                continue
+            f = timeline.facts
+            offset = day.local_offset(now)
+            status, next_event = timeline.status(day, now)
+            out.append({
+                'id': f.id,
+                'market_name': f.market_name,
+                'country': f.country,
+                'exchange_code': f.exchange_code,
+                'status': status,
+                'next_event': next_event,
+                'local_time': _clock(now, offset, '%H:%M'),
+                'local_date': day.date.isoformat(),
+                'timezone': f.timezone,
+                'is_trading_day': day.is_trading_day,
+                'session_note': day.note,
+                'notify_open': f.notify_open,
+                'notify_close': f.notify_close,
+                'sound_enabled': f.sound_enabled
+            })
+        return out
+
+    def simple_markets(self, now: float | None = None) -> list[dict]:
+        now = now or time.time()
+        iso = lambda ts: datetime.datetime.fromtimestamp(ts, pytz.UTC).isoformat()
+        out = []
+        for timeline in self.timelines(now):
+            day = timeline.day_at(now)
+            if day is None:
+                continue
+            f = timeline.facts
+            offset = day.local_offset(now)
+
+            next_event = next_event_at_utc = next_event_ist = None
+            if day.is_trading_day:
+                if now < day.open:
+                    next_event = "opening"
+                    next_event_at_utc = iso(day.open)
+                    next_event_ist = _clock(day.open, IST_OFFSET, '%H:%M')
+                elif now < day.close:
+                    next_event = "closing"
+                    next_event_at_utc = iso(day.close)
+                    next_event_ist = _clock(day.close, IST_OFFSET, '%H:%M')
+                else:
+                    next_event = "closed"
+            else:
+                next_event = "holiday" if day.holiday else "weekend"
+
+            out.append({
+                'id': f.id,
+                'market_name': f.market_name,
+                'country': f.country,
+                'timezone': f.timezone,
+                'local_now': _clock(now, offset, '%H:%M'),
+                'local_date': day.date.isoformat(),
+                'local_open': f.local_open_time,
+                'local_close': f.local_close_time,
+                'ist_now': _clock(now, IST_OFFSET, '%H:%M'),
+                'ist_open': _clock(day.open, IST_OFFSET, '%H:%M'),
+                'ist_close': _clock(day.close, IST_OFFSET, '%H:%M'),
+                'ist_open_date': _clock(day.open, IST_OFFSET, '%Y-%m-%d'),
+                'ist_close_date': _clock(day.close, IST_OFFSET, '%Y-%m-%d'),
+                'next_event': next_event,
+                'next_event_at_utc': next_event_at_utc,
+                'next_event_ist': next_event_ist,
+                'is_trading_day': day.is_trading_day,
+                'session_note': day.note,
+                'notify_open': f.notify_open,
+                'notify_close': f.notify_close,
+                'sound_enabled': f.sound_enabled
+            })
+        return out
+
+    def timeline(self, days: int, now: float | None = None) -> dict:
+        """Next *days* trading sessions of every market"""
+        now = now or time.time()
+        return {
+            "generated_at": datetime.datetime.fromtimestamp(now, pytz.UTC).isoformat(),
+            "markets": [{
+                'id': t.facts.id,
+                'market_name': t.facts.market_name,
+                'exchange_code': t.facts.exchange_code,
+                'timezone': t.facts.timezone,
+                'sessions': [d.to_json() for d in t.upcoming(now, days)],
+            } for t in self.timelines(now)],
+        }
+
+    def has_session(self, exchange_code: str, now: float | None = None) -> bool | None:
+        """Whether *exchange_code* trades on its current local day (None = unknown market)"""
+        now = now or time.time()
+        for timeline in self.timelines(now):
+            if timeline.facts.exchange_code.upper() == exchange_code.upper():
+                day = timeline.day_at(now)
+                return bool(day and day.is_trading_day)
+        return None
+
+    def next_transition(self, now: float | None = None) -> float | None:
+        """Earliest status change over all markets"""
+        now = now or time.time()
+        points = [p for t in self.timelines(now) if (p := t.next_transition(now))]
+        return min(points, default=None)
@@ -0,0 +1,397 @@
+"""
+Deterministic in-process market simulator
+Stands in for FyersModel / FyersDataSocket so routes can be exercised and
+profiled without the network: every underlying follows a seeded per-second
+GBM path, options are Black-Scholes priced off it with a small smile, and
+the same (seed, symbol, instant) always yields the same quote.
+"""
+from __future__ import annotations
+import datetime, functools, math, re, threading, time, typing as T, zlib
+
+import numpy as np
+
+from APP_Extensions.symbol_master import IST
+from APP_Extensions import chain_skeleton
+
+SECONDS_PER_DAY = 86400
+SESSION_OPEN = datetime.time(9, 15)
+SESSION_CLOSE = datetime.time(15, 30)
+EXPIRY_TIME = datetime.time(15, 30)
+RATE = 0.065
+YEAR_SECONDS = 365 * SECONDS_PER_DAY
+# Per-second volatility as if the whole day traded like a session
+SECOND_SCALE = math.sqrt(252 * 22500)
+DAILY_GAP_SIGMA = 0.01
+
+# Starting levels of the common underlyings; others are derived from the name
+BASE_LEVELS = {
+    "NIFTY": 24500.0, "BANKNIFTY": 52000.0, "FINNIFTY": 23500.0,
+    "MIDCPNIFTY": 12500.0, "NIFTYNXT50": 68000.0, "SENSEX": 80500.0,
+    "BANKEX": 58000.0, "INDIAVIX": 13.5,
+}
+BASE_VOLS = {"NIFTY": 0.13, "BANKNIFTY": 0.16, "SENSEX": 0.13, "INDIAVIX": 0.9}
+DEFAULT_VOL = 0.25
+STRIKE_STEPS = ((100, 1.0), (500, 5.0), (2000, 10.0), (10000, 20.0), (30000, 50.0))
+WEEKLY_EXPIRIES = 4
+
+_WEEKLY_MONTHS = "123456789OND"
+_OPTION = re.compile(r"([A-Z][A-Z0-9&-]*?)(\d{2})([1-9OND])(\d{2})(\d+(?:\.\d+)?)(CE|PE)$")
+_MONTHLY_OPTION = re.compile(r"([A-Z][A-Z0-9&-]*?)(\d{2})([A-Z]{3})(\d+(?:\.\d+)?)(CE|PE)$")
+_MONTHS = {m: i for i, m in enumerate(
+    ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), 1)}
+
+
+def _crc(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+def _norm_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def black_scholes(spot: float, strike: float, years: float, vol: float,
+                  option_type: str, rate: float = RATE) -> float:
+    if spot <= 0 or strike <= 0:
+        return 0.0
+    if years <= 0 or vol <= 0:
+        return max(0.0, spot - strike) if option_type == "CE" else max(0.0, strike - spot)
+    sd = vol * math.sqrt(years)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / sd
+    d2 = d1 - sd
+    disc = strike * math.exp(-rate * years)
+    if option_type == "CE":
+        return spot * _norm_cdf(d1) - disc * _norm_cdf(d2)
+    return disc * _norm_cdf(-d2) - spot * _norm_cdf(-d1)
+
+
+def _last_thursday(year: int, month: int) -> datetime.date:
+    day = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1))
+    return day - datetime.timedelta(days=(day.weekday() - 3) % 7)
+
+
+def _expiry_epoch(day: datetime.date) -> int:
+    return int(IST.localize(datetime.datetime.combine(day, EXPIRY_TIME)).timestamp())
+
+
+class OptionSpec(T.NamedTuple):
+    underlying: str
+    expiry: datetime.date
+    strike: float
+    option_type: str
+
+
+def parse_option(symbol: str) -> OptionSpec | None:
+    """"NSE:NIFTY2581424500CE" / "NSE:NIFTY25AUG24500CE" → OptionSpec"""
+    ticker = symbol.upper().partition(":")[2]
+    m = _OPTION.match(ticker)
+    if m:
+        und, yy, mon, dd, strike, kind = m.groups()
+        try:
+            day = datetime.date(2000 + int(yy), _WEEKLY_MONTHS.index(mon) + 1, int(dd))
+            return OptionSpec(und, day, float(strike), kind)
+        except ValueError:
+            pass
+    m = _MONTHLY_OPTION.match(ticker)
+    if m and m.group(3) in _MONTHS:
+        und, yy, mon, strike, kind = m.groups()
+        return OptionSpec(und, _last_thursday(2000 + int(yy), _MONTHS[mon]), float(strike), kind)
+    return None
+
+
+def option_symbol(exchange: str, underlying: str, day: datetime.date,
+                  strike: float, option_type: str) -> str:
+    """Weekly-style FYERS ticker for a synthesized contract"""
+    strike_text = f"{strike:g}"
+    return (f"{exchange}:{underlying}{day:%y}{_WEEKLY_MONTHS[day.month - 1]}{day:%d}"
+            f"{strike_text}{option_type}")
+
+
+def strike_step(level: float) -> float:
+    return next((step for bound, step in STRIKE_STEPS if level < bound), 100.0)
+
+
+class SimulatedMarket:
+    """Seeded price paths and derived quotes; all methods are thread-safe."""
+
+    def __init__(self, seed: int = 7):
+        self.seed = seed
+
+    # -----------------------------------------------------------------
+    # Underlying paths
+    def base_level(self, underlying: str) -> float:
+        if underlying in BASE_LEVELS:
+            return BASE_LEVELS[underlying]
+        return 50.0 + _crc(underlying) % 4950
+
+    def vol(self, underlying: str) -> float:
+        return BASE_VOLS.get(underlying, DEFAULT_VOL)
+
+    @functools.lru_cache(maxsize=64)
+    def _day_path(self, underlying: str, ordinal: int) -> np.ndarray:
+        """Per-second prices of *underlying* for one IST calendar day"""
+        rng = np.random.default_rng([self.seed, _crc(underlying), ordinal])
+        sigma = self.vol(underlying) / SECOND_SCALE
+        opening = self.base_level(underlying) * math.exp(DAILY_GAP_SIGMA * rng.standard_normal())
+        steps = rng.standard_normal(SECONDS_PER_DAY - 1) * sigma - 0.5 * sigma * sigma
+        path = np.empty(SECONDS_PER_DAY)
+        path[0] = 0.0
+        np.cumsum(steps, out=path[1:])
+        return opening * np.exp(path)
+
+    @staticmethod
+    def _split(ts: float) -> tuple[int, int]:
+        moment = datetime.datetime.fromtimestamp(ts, IST)
+        return moment.date().toordinal(), moment.hour * 3600 + moment.minute * 60 + moment.second
+
+    def spot(self, underlying: str, ts: float | None = None) -> float:
+        ordinal, second = self._split(ts if ts is not None else time.time())
+        return float(self._day_path(underlying, ordinal)[second])
+
+    def day_open(self, underlying: str, ts: float | None = None) -> float:
+        ordinal, _ = self._split(ts if ts is not None else time.time())
+        return float(self._day_path(underlying, ordinal)[0])
+
+    def prev_close(self, underlying: str, ts: float | None = None) -> float:
+        ordinal, _ = self._split(ts if ts is not None else time.time())
+        return float(self._day_path(underlying, ordinal - 1)[-1])
+
+    # -----------------------------------------------------------------
+    # Quotes
+    def underlying_of(self, symbol: str) -> str:
+        option = parse_option(symbol)
+        if option:
+            return option.underlying
+        target = chain_skeleton.fo_underlying(symbol)
+        if target:
+            return target[1]
+        ticker = symbol.upper().partition(":")[2] or symbol.upper()
+        return ticker.split("-")[0]
+
+    def price(self, symbol: str, ts: float | None = None) -> float:
+        ts = ts if ts is not None else time.time()
+        option = parse_option(symbol)
+        if option is None:
+            return self.spot(self.underlying_of(symbol), ts)
+        spot = self.spot(option.underlying, ts)
+        years = (_expiry_epoch(option.expiry) - ts) / YEAR_SECONDS
+        moneyness = math.log(option.strike / spot) if spot > 0 else 0.0
+        vol = self.vol(option.underlying) * (1.0 + 2.0 * moneyness * moneyness)
+        return black_scholes(spot, option.strike, years, vol, option.option_type)
+
+    def tick_size(self, price: float) -> float:
+        return 0.05 if price < 10000 else 0.5
+
+    def quote(self, symbol: str, ts: float | None = None) -> dict:
+        ts = ts if ts is not None else time.time()
+        ordinal, second = self._split(ts)
+        midnight = IST.localize(datetime.datetime.combine(
+            datetime.date.fromordinal(ordinal), datetime.time(0))).timestamp()
+        lp = self.price(symbol, ts)
+        tick = self.tick_size(lp)
+        lp = round(round(lp / tick) * tick, 2)
+        base_volume = 1000 + _crc(symbol) % 50000
+        volume = base_volume * second // 60
+        base_oi = 50000 + _crc(symbol[::-1]) % 2000000
+        oi = int(base_oi * (1.0 + 0.05 * math.sin(second / 3600.0)))
+        prev = self.price(symbol, midnight - 1)
+        return {
+            "symbol": symbol, "lp": lp, "bid": round(max(0.0, lp - tick), 2),
+            "ask": round(lp + tick, 2), "volume": int(volume),
+            "bid_qty": 25 + _crc(symbol) % 500, "ask_qty": 25 + _crc(symbol[::-1]) % 500,
+            "oi": oi, "oich": oi - base_oi,
+            "ch": round(lp - prev, 2), "chp": round((lp - prev) / prev * 100, 2) if prev else 0,
+            "prev_close_price": round(prev, 2),
+        }
+
+    # -----------------------------------------------------------------
+    # Chains
+    def expiries(self, underlying: str, ts: float | None = None) -> list[datetime.date]:
+        """Next WEEKLY_EXPIRIES Thursdays that have not expired yet"""
+        ts = ts if ts is not None else time.time()
+        day = datetime.datetime.fromtimestamp(ts, IST).date()
+        day += datetime.timedelta(days=(3 - day.weekday()) % 7)
+        if _expiry_epoch(day) <= ts:
+            day += datetime.timedelta(days=7)
+        return [day + datetime.timedelta(weeks=i) for i in range(WEEKLY_EXPIRIES)]
+
+    def candles(self, symbol: str, start: float, end: float, resolution: int) -> list[list]:
+        """[epoch, o, h, l, c, v] bars of *resolution* seconds inside session hours"""
+        end = min(end, time.time())
+        out = []
+        day = datetime.datetime.fromtimestamp(start, IST).date()
+        last = datetime.datetime.fromtimestamp(end, IST).date()
+        open_s = SESSION_OPEN.hour * 3600 + SESSION_OPEN.minute * 60
+        close_s = SESSION_CLOSE.hour * 3600 + SESSION_CLOSE.minute * 60
+        option = parse_option(symbol)
+        while day <= last:
+            midnight = IST.localize(datetime.datetime.combine(day, datetime.time(0))).timestamp()
+            if day.weekday() < 5:
+                lo = max(open_s, int(start - midnight))
+                hi = min(close_s, int(end - midnight))
+                lo = open_s + -(-(lo - open_s) // resolution) * resolution
+                if option is None:
+                    path = self._day_path(self.underlying_of(symbol), day.toordinal())
+                for bar in range(lo, hi, resolution):
+                    stop = min(bar + resolution, close_s, hi + 1)
+                    if option is None:
+                        window = path[bar:stop]
+                    else:
+                        window = np.array([self.price(symbol, midnight + s)
+                                           for s in range(bar, stop, max(1, (stop - bar) // 8))])
+                    volume = (1000 + _crc(symbol) % 50000) * (stop - bar) // 60
+                    out.append([int(midnight + bar), round(float(window[0]), 2),
+                                round(float(window.max()), 2), round(float(window.min()), 2),
+                                round(float(window[-1]), 2), int(volume)])
+            day += datetime.timedelta(days=1)
+        return out
+
+
+# ---------------------------------------------------------------------
+class SimFyersModel:
+    """Subset of fyersModel.FyersModel answered from a SimulatedMarket."""
+
+    def __init__(self, market: SimulatedMarket, client_id: str = "SIM", token: str = "sim"):
+        self.market = market
+        self.token = token
+        self.header = f"{client_id}:{token}"
+
+    def quotes(self, data: dict) -> dict:
+        symbols = [s for s in str(data.get("symbols", "")).split(",") if s]
+        if len(symbols) > 50:
+            return {"s": "error", "code": -300, "message": "Max 50 symbols allowed"}
+        now = time.time()
+        rows = []
+        for sym in symbols:
+            q = self.market.quote(sym, now)
+            rows.append({"n": sym, "s": "ok", "v": {
+                "lp": q["lp"], "bid": q["bid"], "ask": q["ask"], "volume": q["volume"],
+                "ch": q["ch"], "chp": q["chp"], "prev_close_price": q["prev_close_price"],
+                "symbol": sym}})
+        return {"s": "ok", "code": 200, "d": rows}
+
+    def optionchain(self, data: dict) -> dict:
+        symbol = data.get("symbol", "")
+        target = chain_skeleton.fo_underlying(symbol)
+        if not target:
+            return {"s": "error", "code": -300, "message": f"Invalid symbol {symbol}"}
+        name, underlying = target
+        exchange = name.split("_")[0]
+        now = time.time()
+        expiries = self.market.expiries(underlying, now)
+        expiry_data = [{"date": d.strftime("%d-%m-%Y"), "expiry": str(_expiry_epoch(d))}
+                       for d in expiries]
+        timestamp = str(data.get("timestamp") or "")
+        day = next((d for d, e in zip(expiries, expiry_data) if e["expiry"] == timestamp),
+                   expiries[0])
+        count = max(1, min(int(data.get("strikecount") or 1), 100))
+        spot = self.market.spot(underlying, now)
+        step = strike_step(spot)
+        atm = round(spot / step) * step
+        spot_quote = self.market.quote(symbol, now)
+        chain = [{"symbol": symbol, "strike_price": -1, "option_type": "",
+                  "ltp": spot_quote["lp"], "ltpch": spot_quote["ch"], "ltpchp": spot_quote["chp"]}]
+        call_oi = put_oi = 0
+        for k in range(-count, count + 1):
+            strike = atm + k * step
+            if strike <= 0:
+                continue
+            for kind in ("CE", "PE"):
+                sym = option_symbol(exchange, underlying, day, strike, kind)
+                q = self.market.quote(sym, now)
+                chain.append({"symbol": sym, "strike_price": strike, "option_type": kind,
+                              "ltp": q["lp"], "bid": q["bid"], "ask": q["ask"],
+                              "bid_qty": q["bid_qty"], "ask_qty": q["ask_qty"],
+                              "volume": q["volume"], "oi": q["oi"], "oich": q["oich"],
+                              "ltpch": q["ch"], "ltpchp": q["chp"]})
+                if kind == "CE":
+                    call_oi += q["oi"]
+                else:
+                    put_oi += q["oi"]
+        return {"s": "ok", "code": 200, "message": "", "data": {
+            "expiryData": expiry_data, "optionsChain": chain,
+            "callOi": call_oi, "putOi": put_oi}}
+
+    def history(self, data: dict) -> dict:
+        resolution = str(data.get("resolution", "1")).upper()
+        seconds = SECONDS_PER_DAY if resolution in ("D", "1D") else int(resolution) * 60
+        if str(data.get("date_format", "0")) == "1":
+            start = IST.localize(datetime.datetime.strptime(data["range_from"], "%Y-%m-%d")).timestamp()
+            end = IST.localize(datetime.datetime.strptime(data["range_to"], "%Y-%m-%d")).timestamp() \
+                + SECONDS_PER_DAY - 1
+        else:
+            start, end = float(data["range_from"]), float(data["range_to"])
+        candles = self.market.candles(data.get("symbol", ""), start, end, seconds)
+        if not candles:
+            return {"s": "no_data", "code": 200, "candles": []}
+        return {"s": "ok", "code": 200, "candles": candles}
+
+
+class SimDataSocket:
+    """Subset of FyersDataSocket pushing simulated ticks from a thread."""
+
+    def __init__(self, market: SimulatedMarket, access_token: str = "",
+                 on_message: T.Callable[[dict], None] | None = None,
+                 on_error: T.Callable | None = None, on_close: T.Callable | None = None,
+                 on_connect: T.Callable | None = None, interval: float = 1.0, **_):
+        self.market = market
+        self.on_message = on_message
+        self.on_error = on_error
+        self.on_close = on_close
+        self.on_connect = on_connect
+        self.interval = interval
+        self._symbols: dict[str, None] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def connect(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sim-socket", daemon=True)
+        self._thread.start()
+        if self.on_connect:
+            self.on_connect()
+
+    def subscribe(self, symbols: T.Iterable[str], data_type: str = "SymbolUpdate"):
+        with self._lock:
+            for sym in symbols:
+                self._symbols[sym] = None
+
+    def unsubscribe(self, symbols: T.Iterable[str] | None = None, data_type: str = "SymbolUpdate"):
+        with self._lock:
+            if symbols is None:
+                self._symbols.clear()
+            for sym in symbols or ():
+                self._symbols.pop(sym, None)
+
+    def keep_running(self):
+        pass
+
+    def close_connection(self):
+        self._stop.set()
+        if self.on_close:
+            self.on_close()
+
+    def is_connected(self) -> bool:
+        return bool(self._thread and self._thread.is_alive() and not self._stop.is_set())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                symbols = list(self._symbols)
+            now = time.time()
+            for sym in symbols:
+                try:
+                    q = self.market.quote(sym, now)
+                    self.on_message and self.on_message({
+                        "type": "sf", "symbol": sym, "ltp": q["lp"],
+                        "vol_traded_today": q["volume"], "tot_buy_qty": q["oi"],
+                        "ch": q["ch"], "chp": q["chp"],
+                        "bid_price": q["bid"], "ask_price": q["ask"],
+                        "bid_size": q["bid_qty"], "ask_size": q["ask_qty"],
+                        "prev_close_price": q["prev_close_price"],
+                        "last_traded_time": int(now)})
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error({"code": -1, "message": str(e)})
@@ -0,0 +1,134 @@
+"""
+Pre-open cache warm-up
+When the market scheduler puts an exchange into its warm-up phase, the
+registered steps run once, in order, inside an app context: symbol master
+files and expiry calendars, previous-session candles of the watched
+underlyings and their near-ATM strikes, and last-close chain snapshots.
+The rush of first page loads at the open then finds every cache warm.
+
+Steps are registered by the modules owning the caches (step()), and the
+underlyings to warm are MARKET_WARMUP_SYMBOLS plus every underlying whose
+chain was loaded since start-up (watch()).
+"""
+from __future__ import annotations
+import os, threading, time, typing as T
+from datetime import datetime
+
+import pytz
+
+from APP_Extensions.market_scheduler import exchange_of
+
+IST = pytz.timezone("Asia/Kolkata")
+
+WARMUP_SYMBOLS = os.environ.get("MARKET_WARMUP_SYMBOLS",
+                                "NSE:NIFTY50-INDEX,NSE:NIFTYBANK-INDEX,BSE:SENSEX-INDEX")
+WARMUP_STRIKES = int(os.environ.get("MARKET_WARMUP_STRIKES", "5"))   # each side of ATM
+MAX_WATCHED = 50
+
+# (exchange, watched underlyings of that exchange) → items warmed
+StepRunner = T.Callable[[str, list[str]], int]
+
+
+class WarmupStep(T.NamedTuple):
+    order: int
+    name: str
+    run: StepRunner
+
+
+class MarketWarmup:
+    """Ordered warm-up steps run at each exchange's warm-up phase."""
+
+    def __init__(self, symbols: T.Iterable[str] = ()):
+        self._steps: list[WarmupStep] = []
+        self._configured = [s.strip() for s in symbols if s.strip()]
+        self._watched: dict[str, float] = {}        # symbol → last requested
+        self._lock = threading.Lock()
+        self._running: set[str] = set()
+        self._app = None
+        self.runs: dict[str, dict] = {}
+
+    def step(self, name: str, run: StepRunner, order: int = 50):
+        """Register *run* as a warm-up step (lower order runs first)."""
+        self._steps.append(WarmupStep(order, name, run))
+        self._steps.sort(key=lambda s: s.order)
+
+    def watch(self, symbol: str):
+        """Remember an underlying users load, so the next warm-up includes it."""
+        if not symbol or symbol in self._configured:
+            return
+        with self._lock:
+            self._watched[symbol] = time.time()
+            if len(self._watched) > MAX_WATCHED:
+                del self._watched[min(self._watched, key=self._watched.get)]
+
+    def watched(self, exchange: str | None = None) -> list[str]:
+        with self._lock:
+            symbols = self._configured + [s for s in self._watched if s not in self._configured]
+        return [s for s in symbols if exchange is None or exchange_of(s) == exchange]
+
+    def run(self, exchange: str) -> dict:
+        """Run every step for *exchange* now (needs an app context)."""
+        exchange = exchange.upper()
+        with self._lock:
+            if exchange in self._running:
+                return self.runs.get(exchange, {})
+            self._running.add(exchange)
+        try:
+            symbols = self.watched(exchange)
+            started = time.time()
+            steps = {}
+            for step in self._steps:
+                t0 = time.perf_counter()
+                try:
+                    count, error = step.run(exchange, symbols), None
+                except Exception as e:
+                    count, error = 0, str(e)
+                    print(f"MARKET WARMUP: {exchange} {step.name} failed: {e}")
+                steps[step.name] = {"items": count, "error": error,
+                                    "ms": round((time.perf_counter() - t0) * 1000, 1)}
+            result = {"started_at": datetime.fromtimestamp(started, IST).isoformat(),
+                      "seconds": round(time.time() - started, 2), "symbols": symbols, "steps": steps}
+            self.runs[exchange] = result
+            print(f"MARKET WARMUP: {exchange} warmed in {result['seconds']}s "
+                  + ", ".join(f"{name}={s['items']}" for name, s in steps.items()))
+            return result
+        finally:
+            with self._lock:
+                self._running.discard(exchange)
+
+    def _on_phase(self, exchange: str, phase: str):
+        if phase != "warmup" or not self._app:
+            return
+        # Off the scheduler thread: downloads must not delay other phase changes
+        threading.Thread(target=self._run_in_app, args=(exchange,),
+                         name=f"market-warmup-{exchange}", daemon=True).start()
+
+    def _run_in_app(self, exchange: str):
+        try:
+            with self._app.app_context():
+                self.run(exchange)
+        except Exception as e:
+            print(f"MARKET WARMUP ERROR ({exchange}): {e}")
+
+    def attach(self, app, scheduler):
+        """Run at every warm-up phase published by *scheduler*."""
+        if self._app is None:
+            scheduler.on_change(self._on_phase)
+        self._app = app
+
+    def status(self) -> dict:
+        return {
+            "steps": [s.name for s in self._steps],
+            "watched": self.watched(),
+            "strikes_each_side": WARMUP_STRIKES,
+            "runs": self.runs,
+        }
+
+
+market_warmup = MarketWarmup(WARMUP_SYMBOLS.split(","))
+
+
+def start_market_warmup(app):
+    """Warm caches ahead of each open announced by the market scheduler"""
+    from APP_Extensions.market_scheduler import market_scheduler
+    market_warmup.attach(app, market_scheduler)
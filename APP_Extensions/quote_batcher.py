@@ -0,0 +1,107 @@
+"""
+Micro-batched quote fetching
+Single-symbol quote requests arriving within BATCH_WINDOW of each other
+are answered by one multi-symbol upstream call: the first request to find
+no open batch opens one, waits out the window while others add their
+symbols, then fetches them all and wakes every waiter.  Requests for a
+symbol already being fetched join that fetch, and an answer younger than
+MAX_AGE is reused, so upstream traffic follows the number of distinct
+symbols rather than clients × poll rate.
+"""
+from __future__ import annotations
+import threading, time, typing as T
+
+BATCH_WINDOW_SECONDS = 0.025
+MAX_AGE_SECONDS = 1.0           # polls every 2s per client: one fetch serves them all
+WAIT_TIMEOUT_SECONDS = 10.0
+MAX_RECENT = 2048
+
+Quote = T.Dict[str, T.Any]
+# symbols → {symbol: quote values}; may raise (every waiter gets the error)
+Fetch = T.Callable[[T.List[str]], T.Dict[str, Quote]]
+
+
+class _Pending:
+    __slots__ = ("event", "quote", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.quote: Quote | None = None
+        self.error: Exception | None = None
+
+
+class QuoteBatcher:
+    """Coalesces concurrent quote requests into batched upstream calls."""
+
+    def __init__(self, fetch: Fetch, window: float = BATCH_WINDOW_SECONDS,
+                 max_age: float = MAX_AGE_SECONDS):
+        self._fetch = fetch
+        self.window = window
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._batch: dict[str, _Pending] | None = None      # open, still collecting
+        self._inflight: dict[str, _Pending] = {}             # open or being fetched
+        self._recent: dict[str, tuple[float, Quote]] = {}
+        self.requests = self.reused = self.joined = self.batches = self.fetched = 0
+
+    def get(self, symbol: str) -> Quote | None:
+        """Quote values of *symbol* (None if upstream did not return it)."""
+        now = time.time()
+        leader = False
+        with self._lock:
+            self.requests += 1
+            recent = self._recent.get(symbol)
+            if recent and now - recent[0] < self.max_age:
+                self.reused += 1
+                return recent[1]
+            pending = self._inflight.get(symbol)
+            if pending is None:
+                pending = self._inflight[symbol] = _Pending()
+                if self._batch is None:
+                    self._batch, leader = {}, True
+                self._batch[symbol] = pending
+            else:
+                self.joined += 1
+        if leader:
+            self._flush()
+        if not pending.event.wait(WAIT_TIMEOUT_SECONDS):
+            raise TimeoutError(f"quote for {symbol} timed out")
+        if pending.error is not None:
+            raise pending.error
+        return pending.quote
+
+    def _flush(self):
+        """Leader: let the window fill, then fetch the whole batch once"""
+        time.sleep(self.window)
+        with self._lock:
+            batch, self._batch = self._batch or {}, None
+        try:
+            quotes, error = self._fetch(list(batch)), None
+        except Exception as e:
+            quotes, error = {}, e
+        now = time.time()
+        with self._lock:
+            self.batches += 1
+            self.fetched += len(batch)
+            for symbol in batch:
+                self._inflight.pop(symbol, None)
+                if symbol in quotes:
+                    self._recent[symbol] = (now, quotes[symbol])
+            if len(self._recent) > MAX_RECENT:
+                cutoff = now - self.max_age
+                self._recent = {s: r for s, r in self._recent.items() if r[0] >= cutoff}
+        for symbol, pending in batch.items():
+            pending.quote, pending.error = quotes.get(symbol), error
+            pending.event.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "reused": self.reused,
+                "joined": self.joined,
+                "batches": self.batches,
+                "symbols_fetched": self.fetched,
+                "window_ms": round(self.window * 1000, 1),
+                "max_age_seconds": self.max_age,
+            }
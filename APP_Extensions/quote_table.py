@@ -0,0 +1,259 @@
+"""
+Shared-memory quote table
+One feed process writes ticks into a fixed array of slots in a named
+shared-memory block; every web worker maps the same block and reads it
+without locks or IPC.  Each slot is a seqlock record:
+
+    seq (u64) | symbol (48 bytes) | ltp volume oi change bid ask ts (f64)
+
+The writer makes seq odd, writes the fields and makes it even again; a
+reader copies the record and retries if seq was odd or moved meanwhile.
+Slots are claimed on first tick of a symbol and recycled least-recently
+updated first when the table is full.  A header generation counter moves
+whenever a slot changes symbol, so readers rebuild their symbol → slot
+index only then.
+"""
+from __future__ import annotations
+import os, struct, threading, time, typing as T
+from collections.abc import Mapping
+from datetime import datetime
+from multiprocessing import shared_memory, resource_tracker
+
+TABLE_NAME = os.environ.get("MARKET_FEED_TABLE", "market_quotes")
+TABLE_SLOTS = int(os.environ.get("MARKET_FEED_SLOTS", "4096"))
+
+MAGIC = b"QUOTES01"
+HEADER = struct.Struct("<8sIIQdQ")        # magic, version, slots, generation, heartbeat, writer pid
+HEADER_SIZE = 64
+SEQ = struct.Struct("<Q")
+BEAT = struct.Struct("<d")
+GENERATION_AT, HEARTBEAT_AT = 16, 24      # header field offsets (written on their own)
+RECORD = struct.Struct("<Q48sddddddd")
+FIELDS = ("ltp", "volume", "oi", "change", "bid", "ask")
+READ_RETRIES = 100
+STALE_SECONDS = 5.0                       # heartbeat age after which readers re-attach
+
+Quote = T.Dict[str, T.Any]
+
+
+def _slot_offset(i: int) -> int:
+    return HEADER_SIZE + i * RECORD.size
+
+
+class QuoteTable:
+    """A mapped quote table; create() in the feed process, attach() in workers."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+        magic, _, slots, _, _, _ = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise RuntimeError(f"{shm.name} is not a quote table")
+        self.slots = slots
+        self._index: dict[str, int] = {}
+        self._index_generation = -1
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: str = TABLE_NAME, slots: int = TABLE_SLOTS) -> "QuoteTable":
+        """New zeroed table (replaces a stale one left by a crashed feed)."""
+        size = HEADER_SIZE + slots * RECORD.size
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, 1, slots, 0, time.time(), os.getpid())
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str = TABLE_NAME) -> "QuoteTable":
+        """Map the table published by the feed process; FileNotFoundError if none."""
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the block when they exit (tracked on 3.11)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    # -----------------------------------------------------------------
+    # Header
+    def _header(self):
+        return HEADER.unpack_from(self._buf, 0)
+
+    @property
+    def generation(self) -> int:
+        return SEQ.unpack_from(self._buf, GENERATION_AT)[0]
+
+    def heartbeat(self):
+        """Feed process: mark the table as alive"""
+        BEAT.pack_into(self._buf, HEARTBEAT_AT, time.time())
+
+    def writer_alive(self, max_age: float = STALE_SECONDS) -> bool:
+        return time.time() - BEAT.unpack_from(self._buf, HEARTBEAT_AT)[0] < max_age
+
+    def _bump_generation(self):
+        # After the slot names are written, so a rebuilt index sees them
+        SEQ.pack_into(self._buf, GENERATION_AT, self.generation + 1)
+        self._index_generation = self.generation
+
+    # -----------------------------------------------------------------
+    # Slots
+    def _read_slot(self, i: int) -> tuple | None:
+        off = _slot_offset(i)
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(self._buf, off)[0]
+            if seq & 1:
+                continue
+            record = RECORD.unpack_from(self._buf, off)
+            if SEQ.unpack_from(self._buf, off)[0] == seq:
+                return record
+        return None
+
+    def _write_slot(self, i: int, name: bytes, values: T.Sequence[float]):
+        off = _slot_offset(i)
+        seq = SEQ.unpack_from(self._buf, off)[0]
+        SEQ.pack_into(self._buf, off, seq + 1)
+        RECORD.pack_into(self._buf, off, seq + 1, name, *values)
+        SEQ.pack_into(self._buf, off, seq + 2)
+
+    def _symbol_at(self, i: int) -> str:
+        record = self._read_slot(i)
+        return record[1].rstrip(b"\0").decode() if record else ""
+
+    def index(self) -> dict[str, int]:
+        """symbol → slot, rebuilt only when the writer reassigned slots"""
+        generation = self.generation
+        if generation != self._index_generation:
+            index = {}
+            for i in range(self.slots):
+                symbol = self._symbol_at(i)
+                if symbol:
+                    index[symbol] = i
+            self._index, self._index_generation = index, generation
+        return self._index
+
+    # -----------------------------------------------------------------
+    # Writer (feed process)
+    def publish(self, symbol: str, quote: Quote, ts: float | None = None):
+        name = symbol.encode()[:48]
+        values = [float(quote.get(f) or 0) for f in FIELDS] + [ts or time.time()]
+        with self._write_lock:
+            slot = self._index.get(symbol)
+            if slot is not None:
+                self._write_slot(slot, name, values)
+                return
+            slot = self._claim()
+            self._index[symbol] = slot
+            self._write_slot(slot, name, values)
+            self._bump_generation()
+
+    def _claim(self) -> int:
+        used = set(self._index.values())
+        free = next((i for i in range(self.slots) if i not in used), None)
+        if free is None:
+            # Recycle the slot updated longest ago
+            free = min(used, key=lambda i: self._read_slot(i)[-1])
+            self._index.pop(self._symbol_at(free), None)
+        return free
+
+    def discard(self, symbol: str):
+        """Free the slot of a symbol nobody watches any more"""
+        with self._write_lock:
+            slot = self._index.pop(symbol, None)
+            if slot is None:
+                return
+            self._write_slot(slot, b"", [0.0] * (len(FIELDS) + 1))
+            self._bump_generation()
+
+    def clear(self):
+        with self._write_lock:
+            for i in self._index.values():
+                self._write_slot(i, b"", [0.0] * (len(FIELDS) + 1))
+            self._index = {}
+            self._bump_generation()
+
+    # -----------------------------------------------------------------
+    # Readers
+    @staticmethod
+    def _quote(record: tuple) -> Quote:
+        quote = dict(zip(FIELDS, record[2:8]))
+        quote["volume"] = int(quote["volume"])
+        quote["oi"] = int(quote["oi"])
+        quote["timestamp"] = datetime.fromtimestamp(record[8]).isoformat()
+        return quote
+
+    def read(self, symbol: str) -> Quote | None:
+        slot = self.index().get(symbol)
+        if slot is None:
+            return None
+        record = self._read_slot(slot)
+        # The slot may have been recycled since the index was built
+        if not record or record[1].rstrip(b"\0").decode() != symbol:
+            return None
+        return self._quote(record)
+
+    def snapshot(self, symbols: T.Iterable[str] | None = None) -> dict[str, Quote]:
+        out = {}
+        for symbol in (self.index() if symbols is None else symbols):
+            quote = self.read(symbol)
+            if quote is not None:
+                out[symbol] = quote
+        return out
+
+
+class QuoteView(Mapping):
+    """
+    Read-only dict-like view of the table for web workers, attaching on
+    first use (the feed process may start after them).
+    """
+
+    def __init__(self, name: str = TABLE_NAME):
+        self.name = name
+        self._table: QuoteTable | None = None
+        self._retry_at = 0.0
+
+    @property
+    def table(self) -> QuoteTable | None:
+        now = time.time()
+        if self._table is not None and now >= self._retry_at and not self._table.writer_alive(STALE_SECONDS):
+            # Feed gone or restarted (a restart maps a fresh block): re-attach
+            self._table.close()
+            self._table = None
+        if self._table is None and now >= self._retry_at:
+            try:
+                self._table = QuoteTable.attach(self.name)
+            except FileNotFoundError:
+                pass
+            self._retry_at = now + 1.0
+        return self._table
+
+    def __getitem__(self, symbol: str) -> Quote:
+        quote = self.table.read(symbol) if self.table else None
+        if quote is None:
+            raise KeyError(symbol)
+        return quote
+
+    def __iter__(self):
+        return iter(list(self.table.index()) if self.table else [])
+
+    def __len__(self) -> int:
+        return len(self.table.index()) if self.table else 0
+
+    def snapshot(self, symbols: T.Iterable[str] | None = None) -> dict[str, Quote]:
+        return self.table.snapshot(symbols) if self.table else {}
+
+    def clear(self):
+        """Writes belong to the feed process"""
+        pass
@@ -0,0 +1,135 @@
+"""
+Start-up modes and boot timing
+APP_LAZY_INIT=1 selects the fork-friendly start-up for pre-forking servers
+(gunicorn --preload, several workers):
+
+  * importing app.py opens no database connection - the database/schema
+    bootstrap is the explicit one-time step `flask --app main init-db`
+  * background threads (schedulers, samplers, refreshers) are started in
+    each worker on its first request instead of in the parent, where they
+    would not survive the fork
+  * the broker SDK is imported on first use (lazy_import)
+
+Without it app.py bootstraps and starts everything at import as before.
+Either way every boot stage is timed into `startup`, printed once the app
+is built and served at /api/startup.
+
+Services that talk upstream or write shared state on their own (schedulers,
+samplers, the token refresher) are started with owned(): only in the
+process that owns the market feed - the feed process, or the single
+process when there is none - never in MARKET_FEED=shared web workers.
+"""
+from __future__ import annotations
+import importlib, os, threading, time, typing as T
+from contextlib import contextmanager
+from types import ModuleType
+
+_BOOT_STARTED = time.perf_counter()
+
+LAZY_INIT = os.environ.get("APP_LAZY_INIT", "0") not in ("0", "false", "no")
+# Web workers behind a feed process (MARKET_FEED=shared) leave owned services to it
+OWNS_SERVICES = os.environ.get("MARKET_FEED", "local").strip().lower() != "shared"
+
+
+class StartupTimer:
+    """Named boot stages with their duration, per process."""
+
+    def __init__(self, lazy: bool = LAZY_INIT, owns_services: bool = OWNS_SERVICES):
+        self.lazy = lazy
+        self.owns_services = owns_services
+        self.not_owned: list[str] = []
+        self.stages: list[tuple[str, float]] = []
+        self.ready_ms: float | None = None
+        self.first_request_ms: float | None = None
+        self._deferred: list[tuple[str, T.Callable[[], T.Any]]] = []
+        self._deferred_done = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ms(since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, self._ms(t0)))
+
+    def background(self, name: str, start: T.Callable[[], T.Any]):
+        """Start a background service now, or at the first request in lazy mode."""
+        if self.lazy:
+            self._deferred.append((name, start))
+            return
+        with self.stage(name):
+            start()
+
+    def owned(self, name: str, start: T.Callable[[], T.Any]):
+        """background() for a service that must run once per deployment"""
+        if not self.owns_services:
+            self.not_owned.append(name)
+            return
+        self.background(name, start)
+
+    def first_request(self):
+        """Run deferred starts once per process (call from before_request)."""
+        if self._deferred_done:
+            return
+        with self._lock:
+            if self._deferred_done:
+                return
+            t0 = time.perf_counter()
+            for name, start in self._deferred:
+                with self.stage(f"{name} (first request)"):
+                    try:
+                        start()
+                    except Exception as e:
+                        print(f"STARTUP: deferred {name} failed: {e}")
+            self.first_request_ms = self._ms(t0)
+            self._deferred_done = True
+
+    def after_fork(self):
+        """A forked worker has started none of the deferred services yet."""
+        self._deferred_done = False
+        self.first_request_ms = None
+
+    def ready(self):
+        self.ready_ms = self._ms(_BOOT_STARTED)
+        slowest = sorted(self.stages, key=lambda s: -s[1])[:5]
+        print(f"STARTUP: app built in {self.ready_ms}ms ({'lazy' if self.lazy else 'eager'} init); "
+              + ", ".join(f"{name} {ms}ms" for name, ms in slowest))
+
+    def report(self) -> dict:
+        return {
+            "mode": "lazy" if self.lazy else "eager",
+            "pid": os.getpid(),
+            "ready_ms": self.ready_ms,
+            "first_request_ms": self.first_request_ms,
+            "stages": [{"name": name, "ms": ms} for name, ms in self.stages],
+            "deferred": [name for name, _ in self._deferred] if not self._deferred_done else [],
+            "run_by_feed": self.not_owned,
+        }
+
+
+startup = StartupTimer()
+
+
+def lazy_import(name: str) -> T.Callable[[], ModuleType | None]:
+    """
+    Loader for an optional, heavy module: imports *name* on the first call
+    and returns it (None when it is not installed).
+    """
+    module: list[ModuleType | None] = []
+
+    def load() -> ModuleType | None:
+        if not module:
+            try:
+                t0 = time.perf_counter()
+                module.append(importlib.import_module(name))
+                startup.stages.append((f"import {name}", startup._ms(t0)))
+            except ImportError:
+                module.append(None)
+        return module[0]
+
+    return load
@@ -0,0 +1,123 @@
+"""
+Per-session subscription views over one upstream subscription set
+Each browser session (and each view in it - the option chain, the watch
+list) asks for its own symbols; the upstream feed streams the refcounted
+union of all of them, so a second trader opening another underlying adds
+to the sockets instead of replacing the first trader's symbols.  set() and
+drop() return the (added, removed) change of that union - only those
+symbols need to be (un)subscribed upstream.
+
+Sessions that stop polling without saying goodbye (closed tab) are
+dropped by expire() after SESSION_IDLE_SECONDS.
+"""
+from __future__ import annotations
+import collections, os, threading, time, typing as T
+
+SESSION_IDLE_SECONDS = int(os.environ.get("FEED_SESSION_IDLE_MINUTES", "15")) * 60
+
+Delta = T.Tuple[T.List[str], T.List[str]]       # (added, removed) upstream symbols
+
+
+class SubscriptionBook:
+    """Symbols wanted per session view, and their refcounted union."""
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._views: dict[str, dict[str, list[str]]] = {}     # session → view → symbols
+        self._seen: dict[str, float] = {}
+        self._refs: collections.Counter[str] = collections.Counter()
+        self._union: dict[str, None] = {}                      # insertion-ordered set
+        self._lock = threading.Lock()
+        self.version = 0
+
+    # -----------------------------------------------------------------
+    # Refcounting (lock held)
+    def _retain(self, symbols: T.Iterable[str], added: list[str]):
+        for s in symbols:
+            self._refs[s] += 1
+            if self._refs[s] == 1:
+                self._union[s] = None
+                added.append(s)
+
+    def _release(self, symbols: T.Iterable[str], removed: list[str]):
+        for s in symbols:
+            self._refs[s] -= 1
+            if self._refs[s] <= 0:
+                del self._refs[s]
+                self._union.pop(s, None)
+                removed.append(s)
+
+    def _changed(self, added: list[str], removed: list[str]) -> Delta:
+        if added or removed:
+            self.version += 1
+        return added, removed
+
+    # -----------------------------------------------------------------
+    # Sessions
+    def set(self, session: str, view: str, symbols: T.Iterable[str]) -> Delta:
+        """Replace what *view* of *session* watches."""
+        wanted = list(dict.fromkeys(s for s in symbols if s))
+        with self._lock:
+            self._seen[session] = time.time()
+            views = self._views.setdefault(session, {})
+            previous = views.get(view, [])
+            if previous == wanted:
+                return [], []
+            # Retain before releasing: symbols kept by the view never drop to 0
+            added, removed = [], []
+            self._retain(wanted, added)
+            self._release(previous, removed)
+            if wanted:
+                views[view] = wanted
+            else:
+                views.pop(view, None)
+            return self._changed(added, removed)
+
+    def drop(self, session: str) -> Delta:
+        """Forget every view of *session* (stop / expiry)."""
+        with self._lock:
+            removed: list[str] = []
+            for symbols in self._views.pop(session, {}).values():
+                self._release(symbols, removed)
+            self._seen.pop(session, None)
+            return self._changed([], removed)
+
+    def touch(self, session: str):
+        with self._lock:
+            if session in self._views:
+                self._seen[session] = time.time()
+
+    def expire(self, now: float | None = None) -> Delta:
+        """Drop sessions idle for longer than idle_seconds."""
+        now = now or time.time()
+        idle = [s for s, seen in list(self._seen.items()) if now - seen > self.idle_seconds]
+        removed: list[str] = []
+        for session in idle:
+            removed += self.drop(session)[1]
+        return [], removed
+
+    # -----------------------------------------------------------------
+    # Queries
+    def symbols(self, session: str) -> list[str]:
+        """Everything *session* watches, over all its views."""
+        with self._lock:
+            views = self._views.get(session, {})
+            return list(dict.fromkeys(s for symbols in views.values() for s in symbols))
+
+    def view(self, session: str, view: str) -> list[str]:
+        with self._lock:
+            return list(self._views.get(session, {}).get(view, []))
+
+    def union(self) -> list[str]:
+        with self._lock:
+            return list(self._union)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._views),
+                "views": sum(len(v) for v in self._views.values()),
+                "symbols": len(self._union),
+                "shared_symbols": sum(1 for n in self._refs.values() if n > 1),
+                "idle_minutes": self.idle_seconds // 60,
+            }
@@ -0,0 +1,375 @@
+"""
+In-memory symbol master built from the public Fyers sym_details CSVs
+Each exchange file is downloaded and parsed once, indexed, and reloaded on a
+daily schedule; the symbol endpoints answer from the indexes.  Parsed files
+are persisted as binary snapshots so a restart needs no download at all.
+"""
+from __future__ import annotations
+import calendar, csv, datetime, functools, os, threading, time, typing as T
+from io import StringIO
+
+import pytz
+
+from APP_Extensions import symbol_snapshot
+from APP_Extensions.http_client import http_client
+
+SYM_DETAILS_URL = "https://public.fyers.in/sym_details/{}.csv"
+IST = pytz.timezone("Asia/Kolkata")
+
+# Fyers publishes fresh files every morning; anything loaded before the
+# most recent refresh instant is reloaded
+REFRESH_AT = datetime.time(8, 30)
+RETRY_AFTER_SECONDS = 300
+
+SNAPSHOT_DIR = os.environ.get(
+    "SYMBOL_MASTER_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "symbol_master"))
+
+# sym_details column positions
+COL_FYTOKEN, COL_DESC, COL_LOT, COL_TICK = 0, 1, 3, 4
+COL_EXPIRY, COL_TICKER, COL_UNDERLYING, COL_STRIKE, COL_OPT_TYPE = 8, 9, 13, 15, 16
+
+
+class Instrument(T.NamedTuple):
+    symbol: str              # exchange ticker, e.g. NSE:NIFTY25AUG24000CE
+    description: str
+    underlying: str
+    lot_size: int
+    tick_size: float
+    expiry_ts: int           # epoch seconds, 0 for cash instruments
+    strike: float
+    option_type: str         # CE / PE / XX
+    fytoken: str
+    exchange_file: str
+
+    @property
+    def kind(self) -> str:
+        if self.option_type in ("CE", "PE"):
+            return "option"
+        return "future" if self.expiry_ts else "cash"
+
+    def spec(self) -> dict:
+        """Contract details as returned by the symbol endpoints"""
+        day = None
+        if self.expiry_ts:
+            day = (_expiry_from_desc(self.description)
+                   or datetime.datetime.fromtimestamp(self.expiry_ts, IST).date())
+        return {
+            "symbol": self.symbol,
+            "description": self.description,
+            "underlying": self.underlying,
+            "kind": self.kind,
+            "exchange_file": self.exchange_file,
+            "lot_size": self.lot_size,
+            "tick_size": self.tick_size,
+            "expiry": expiry_label(day) if day else None,
+            "expiry_ts": self.expiry_ts or None,
+            "strike": self.strike if self.strike > 0 else None,
+            "option_type": self.option_type if self.option_type in ("CE", "PE") else None,
+        }
+
+
+def _num(value: str, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+_MONTHS = {abbr.upper(): i for i, abbr in enumerate(calendar.month_abbr) if abbr}
+
+
+@functools.lru_cache(maxsize=4096)
+def _expiry_date(y: str, m: str, d: str) -> datetime.date | None:
+    try:
+        return datetime.date(2000 + int(y), _MONTHS[m.upper()], int(d))
+    except (KeyError, ValueError):
+        return None
+
+
+def _expiry_from_desc(desc: str) -> datetime.date | None:
+    """"NIFTY 25 Aug 28 24000 CE" → 2025-08-28 (None for undated rows)"""
+    parts = desc.split(" ", 4)
+    if len(parts) < 4:
+        return None
+    return _expiry_date(parts[1], parts[2], parts[3])
+
+
+def expiry_label(day: datetime.date) -> str:
+    """Label format used by the UI: 28-AUG-25"""
+    return day.strftime("%d-%b-%y").upper()
+
+
+class SymbolFile:
+    """Parsed rows of one sym_details file and the indexes built over them."""
+
+    def __init__(self, name: str, instruments: list[Instrument], loaded_at: float):
+        self.name = name
+        self.instruments = instruments
+        self.loaded_at = loaded_at
+
+        self.by_symbol: dict[str, int] = {}
+        self.by_underlying: dict[str, list[int]] = {}
+        # (underlying, expiry date) → {strike: {"CE": idx, "PE": idx}}
+        self.chains: dict[tuple[str, datetime.date], dict[float, dict[str, int]]] = {}
+
+        for i, inst in enumerate(instruments):
+            self.by_symbol[inst.symbol] = i
+            self.by_underlying.setdefault(inst.underlying, []).append(i)
+            day = _expiry_from_desc(inst.description)
+            if day is None:
+                continue
+            if inst.option_type in ("CE", "PE"):
+                strikes = self.chains.setdefault((inst.underlying, day), {})
+                strikes.setdefault(inst.strike, {})[inst.option_type] = i
+
+        self.underlyings = sorted(u for u in self.by_underlying if u)
+
+    # -----------------------------------------------------------------
+    def symbols(self, exclude: T.Collection[str] = ()) -> list[str]:
+        return [u for u in self.underlyings if u not in exclude]
+
+    def instrument(self, symbol: str) -> Instrument | None:
+        i = self.by_symbol.get(symbol)
+        return None if i is None else self.instruments[i]
+
+    def first_for_underlying(self, underlying: str) -> Instrument | None:
+        rows = self.by_underlying.get(underlying)
+        return self.instruments[rows[0]] if rows else None
+
+    def lot_size(self, underlying: str) -> int | None:
+        inst = self.first_for_underlying(underlying)
+        return inst.lot_size if inst else None
+
+    def chain(self, underlying: str, day: datetime.date) -> dict[float, dict[str, Instrument]]:
+        """{strike: {"CE": Instrument, "PE": Instrument}} sorted by strike"""
+        strikes = self.chains.get((underlying, day), {})
+        return {k: {t: self.instruments[i] for t, i in strikes[k].items()}
+                for k in sorted(strikes)}
+
+
+# Files that can hold a ticker with a given exchange prefix
+PREFIX_FILES = {
+    "NSE": ("NSE_CM", "NSE_FO", "NSE_CD", "NSE_COM"),
+    "BSE": ("BSE_CM", "BSE_FO"),
+    "MCX": ("MCX_COM",),
+}
+
+
+def parse_sym_details(name: str, text: str) -> list[Instrument]:
+    instruments = []
+    for row in csv.reader(StringIO(text)):
+        if len(row) <= COL_UNDERLYING:
+            continue
+        instruments.append(Instrument(
+            symbol=row[COL_TICKER].strip(),
+            description=row[COL_DESC].strip(),
+            underlying=row[COL_UNDERLYING].strip().upper(),
+            lot_size=_num(row[COL_LOT], lambda v: int(float(v)), 1),
+            tick_size=_num(row[COL_TICK], float, 0.05),
+            expiry_ts=_num(row[COL_EXPIRY], lambda v: int(float(v)), 0),
+            strike=_num(row[COL_STRIKE], float, 0.0) if len(row) > COL_STRIKE else 0.0,
+            option_type=row[COL_OPT_TYPE].strip().upper() if len(row) > COL_OPT_TYPE else "",
+            fytoken=row[COL_FYTOKEN].strip(),
+            exchange_file=name,
+        ))
+    return instruments
+
+
+def last_refresh_boundary(now: float | None = None) -> float:
+    """Epoch of the most recent REFRESH_AT instant (IST)."""
+    now_ist = datetime.datetime.fromtimestamp(now or time.time(), IST)
+    boundary = IST.localize(datetime.datetime.combine(now_ist.date(), REFRESH_AT))
+    if boundary > now_ist:
+        boundary -= datetime.timedelta(days=1)
+    return boundary.timestamp()
+
+
+class SymbolMaster:
+    """Lazily loaded, daily refreshed SymbolFile per exchange file."""
+
+    def __init__(self, fetch: T.Callable[[str, dict], tuple[str | None, dict]] | None = None,
+                 cache_dir: str | None = SNAPSHOT_DIR):
+        self._fetch = fetch or self._download
+        self.cache_dir = cache_dir
+        self._files: dict[str, SymbolFile] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._listeners: list[T.Callable[[SymbolFile], None]] = []
+        self._scheduler: threading.Thread | None = None
+        self.last_errors: dict[str, str] = {}
+        self._failed_at: dict[str, float] = {}
+
+    @staticmethod
+    def _download(name: str, validators: dict) -> tuple[str | None, dict]:
+        """
+        Conditional, streamed GET of one file.  Returns (None, validators)
+        when the server answers 304, otherwise (text, new validators).
+        """
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        resp = http_client.download(SYM_DETAILS_URL.format(name), headers=headers)
+        if resp.status_code == 304:
+            return None, validators
+        resp.raise_for_status()
+        return resp.text, {"etag": resp.headers.get("ETag"),
+                           "last_modified": resp.headers.get("Last-Modified")}
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def on_reload(self, callback: T.Callable[[SymbolFile], None]):
+        """Register a callback run whenever a new copy of a file is installed."""
+        self._listeners.append(callback)
+
+    def _install(self, sym_file: SymbolFile) -> SymbolFile:
+        self._files[sym_file.name] = sym_file
+        self.last_errors.pop(sym_file.name, None)
+        for callback in self._listeners:
+            try:
+                callback(sym_file)
+            except Exception as e:
+                print(f"SYMBOL MASTER listener error: {e}")
+        return sym_file
+
+    def _load_snapshot(self, name: str) -> SymbolFile | None:
+        if not self.cache_dir:
+            return None
+        path = symbol_snapshot.snapshot_path(self.cache_dir, name)
+        if not os.path.exists(path):
+            return None
+        started = time.time()
+        try:
+            _, instruments = symbol_snapshot.read_snapshot(path, Instrument)
+        except Exception as e:
+            print(f"SYMBOL MASTER: ignoring unreadable snapshot {path}: {e}")
+            return None
+        checked_at = symbol_snapshot.read_meta(self.cache_dir, name).get("checked_at", 0)
+        sym_file = SymbolFile(name, instruments, checked_at)
+        print(f"SYMBOL MASTER: {name} restored from snapshot ({len(instruments)} rows) "
+              f"in {(time.time() - started) * 1000:.0f}ms")
+        return sym_file
+
+    def load(self, name: str) -> SymbolFile:
+        """
+        Bring *name* up to date: restore the on-disk snapshot if nothing is in
+        memory, then revalidate with the server unless already fresh.
+        """
+        current = self._files.get(name)
+        if current is None:
+            current = self._load_snapshot(name)
+            if current is not None:
+                self._install(current)
+                if current.loaded_at >= last_refresh_boundary():
+                    return current
+
+        meta = symbol_snapshot.read_meta(self.cache_dir, name) if self.cache_dir else {}
+        started = time.time()
+        text, validators = self._fetch(name, meta if current is not None else {})
+        now = time.time()
+        if text is None:
+            # 304 – the copy we hold is still current
+            current.loaded_at = now
+            self.last_errors.pop(name, None)
+            if self.cache_dir:
+                symbol_snapshot.write_meta(self.cache_dir, name, {**validators, "checked_at": now})
+            print(f"SYMBOL MASTER: {name} not modified")
+            return current
+
+        instruments = parse_sym_details(name, text)
+        sym_file = SymbolFile(name, instruments, now)
+        print(f"SYMBOL MASTER: loaded {name} ({len(instruments)} rows) "
+              f"in {time.time() - started:.2f}s")
+        if self.cache_dir:
+            try:
+                symbol_snapshot.write_snapshot(
+                    symbol_snapshot.snapshot_path(self.cache_dir, name), name, instruments, now)
+                symbol_snapshot.write_meta(self.cache_dir, name, {**validators, "checked_at": now})
+            except OSError as e:
+                print(f"SYMBOL MASTER: could not write snapshot for {name}: {e}")
+        return self._install(sym_file)
+
+    def _usable(self, current: SymbolFile | None) -> bool:
+        if current is None:
+            return False
+        if current.loaded_at >= last_refresh_boundary():
+            return True
+        # Stale, but a reload failed recently – keep serving it for a while
+        return time.time() - self._failed_at.get(current.name, 0) < RETRY_AFTER_SECONDS
+
+    def file(self, name: str) -> SymbolFile:
+        """Current copy of *name*; loads on first use or when past the refresh time."""
+        current = self._files.get(name)
+        if self._usable(current):
+            return current
+        with self._lock_for(name):
+            current = self._files.get(name)
+            if self._usable(current):
+                return current
+            if current is None and time.time() - self._failed_at.get(name, 0) < RETRY_AFTER_SECONDS:
+                raise RuntimeError(self.last_errors.get(name, f"{name} unavailable"))
+            try:
+                return self.load(name)
+            except Exception as e:
+                self.last_errors[name] = str(e)
+                self._failed_at[name] = time.time()
+                current = self._files.get(name)   # may have been restored from disk
+                if current:                       # serve yesterday's copy over nothing
+                    return current
+                raise
+
+    def resolve(self, symbol: str) -> Instrument | None:
+        """Full ticker ("NSE:SBIN-EQ") → Instrument, searching files already in memory first."""
+        exchange = symbol.partition(":")[0].upper()
+        names = PREFIX_FILES.get(exchange, ())
+        error = None
+        for name in sorted(names, key=lambda n: n not in self._files):
+            try:
+                inst = self.file(name).instrument(symbol)
+            except Exception as e:
+                error = e
+                continue
+            if inst:
+                return inst
+        if error is not None:
+            raise error
+        return None
+
+    def refresh_loaded(self):
+        for name in list(self._files):
+            with self._lock_for(name):
+                try:
+                    self.load(name)
+                except Exception as e:
+                    self.last_errors[name] = str(e)
+                    print(f"SYMBOL MASTER: refresh of {name} failed: {e}")
+
+    def start_scheduler(self):
+        """Reload every loaded file shortly after each daily refresh instant."""
+        if self._scheduler and self._scheduler.is_alive():
+            return
+
+        def run():
+            while True:
+                next_at = last_refresh_boundary() + 86400
+                time.sleep(max(1.0, next_at - time.time()))
+                self.refresh_loaded()
+
+        self._scheduler = threading.Thread(target=run, name="symbol-master-refresh", daemon=True)
+        self._scheduler.start()
+
+    def status(self) -> dict:
+        return {
+            "files": {name: {"rows": len(f.instruments), "underlyings": len(f.underlyings),
+                             "loaded_at": f.loaded_at}
+                      for name, f in self._files.items()},
+            "next_refresh": last_refresh_boundary() + 86400,
+            "errors": dict(self.last_errors),
+        }
+
+
+symbol_master = SymbolMaster()
@@ -0,0 +1,160 @@
+"""
+Ranked instrument search over the symbol master
+Every SymbolFile gets sorted key arrays (searched with bisect) and a word
+index over cash-instrument descriptions; a difflib pass over the short list
+of cash symbols and underlyings catches typos when nothing matches a prefix.
+"""
+from __future__ import annotations
+import bisect, difflib, threading, typing as T
+
+from APP_Extensions.symbol_master import SymbolFile, Instrument, _expiry_from_desc
+
+# Result tiers (lower ranks first)
+EXACT, CASH, FUTURE, OPTION, WORD, FUZZY = range(6)
+KIND_RANK = {"cash": CASH, "future": FUTURE, "option": OPTION}
+
+SCAN_PER_TIER = 200          # prefix candidates inspected per tier and file
+FUZZY_CUTOFF = 0.6
+
+
+def _key(inst: Instrument) -> str:
+    """NSE:SBIN-EQ → SBIN-EQ"""
+    return inst.symbol.partition(":")[2].upper() or inst.symbol.upper()
+
+
+def _prefix_range(keys: list[str], prefix: str, cap: int) -> range:
+    lo = bisect.bisect_left(keys, prefix)
+    hi = bisect.bisect_left(keys, prefix + "\uffff", lo, min(len(keys), lo + cap))
+    return range(lo, hi)
+
+
+class FileSearchIndex:
+    """Search structures for one SymbolFile."""
+
+    def __init__(self, sym_file: SymbolFile):
+        self.sym_file = sym_file
+        rows = sym_file.instruments
+        by_kind: dict[str, list[tuple[str, int]]] = {"cash": [], "future": [], "option": []}
+        words: list[tuple[str, int]] = []
+        for i, inst in enumerate(rows):
+            kind = inst.kind
+            by_kind[kind].append((_key(inst), i))
+            if kind == "cash":
+                words.extend((w, i) for w in set(inst.description.upper().split()))
+        self.tiers: dict[str, tuple[list[str], list[int]]] = {}
+        for kind, pairs in by_kind.items():
+            pairs.sort()
+            self.tiers[kind] = ([k for k, _ in pairs], [i for _, i in pairs])
+        words.sort()
+        self.words = [w for w, _ in words]
+        self.word_rows = [i for _, i in words]
+
+        # Short vocabulary for the fuzzy pass: cash keys and underlyings
+        self.fuzzy: dict[str, int] = {}
+        for key, i in zip(*self.tiers["cash"]):
+            self.fuzzy.setdefault(key, i)
+        for underlying, idx in sym_file.by_underlying.items():
+            if underlying:
+                self.fuzzy.setdefault(underlying, idx[0])
+        self.fuzzy_keys = list(self.fuzzy)
+
+    # -----------------------------------------------------------------
+    def candidates(self, tokens: list[str], limit: int) -> T.Iterator[tuple[tuple, int]]:
+        """Yield (sort key, row index) for *tokens* (already upper-cased)."""
+        rows = self.sym_file.instruments
+        if len(tokens) > 1:
+            yield from self._multi_token(tokens, limit)
+            return
+
+        q = tokens[0]
+        found = 0
+        for kind in ("cash", "future", "option"):
+            keys, idx = self.tiers[kind]
+            for j in _prefix_range(keys, q, SCAN_PER_TIER):
+                inst = rows[idx[j]]
+                rank = EXACT if keys[j] == q or (kind == "cash" and inst.underlying == q) else KIND_RANK[kind]
+                found += 1
+                yield (rank, len(keys[j]), inst.expiry_ts, inst.strike, keys[j]), idx[j]
+            if found >= limit:
+                return       # derivatives only matter when the cheaper tiers run dry
+
+        for j in _prefix_range(self.words, q, SCAN_PER_TIER):
+            i = self.word_rows[j]
+            found += 1
+            yield (WORD, len(rows[i].description), 0, 0.0, _key(rows[i])), i
+        if found:
+            return
+
+        for match in difflib.get_close_matches(q, self.fuzzy_keys, n=limit, cutoff=FUZZY_CUTOFF):
+            i = self.fuzzy[match]
+            ratio = difflib.SequenceMatcher(None, q, match).ratio()
+            yield (FUZZY, -ratio, 0, 0.0, match), i
+
+    def _multi_token(self, tokens: list[str], limit: int) -> T.Iterator[tuple[tuple, int]]:
+        """
+        "NIFTY 28 AUG 24000 CE", "STATE BANK": the first token picks the
+        underlying (or a description word), every token must prefix a word
+        """
+        rows = self.sym_file.instruments
+        head, rest = tokens[0], tokens[1:]
+        pool = list(self.sym_file.by_underlying.get(head, ()))
+        pool.extend(self.word_rows[j] for j in _prefix_range(self.words, head, SCAN_PER_TIER))
+        seen = set()
+        matched = 0
+        for i in pool:
+            if i in seen:
+                continue
+            seen.add(i)
+            inst = rows[i]
+            words = inst.description.upper().split()
+            if all(any(w.startswith(t) for w in words) for t in rest):
+                day = _expiry_from_desc(inst.description)
+                yield (KIND_RANK[inst.kind], day.toordinal() if day else 0,
+                       inst.strike, 0, _key(inst)), i
+                matched += 1
+                if matched >= limit * 10:
+                    return
+
+
+class SymbolSearch:
+    """FileSearchIndex per exchange file, rebuilt whenever the master reloads."""
+
+    def __init__(self):
+        self._indexes: dict[str, FileSearchIndex] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, sym_file: SymbolFile) -> FileSearchIndex:
+        index = FileSearchIndex(sym_file)
+        with self._lock:
+            self._indexes[sym_file.name] = index
+        return index
+
+    def index_for(self, sym_file: SymbolFile) -> FileSearchIndex:
+        index = self._indexes.get(sym_file.name)
+        if index is None or index.sym_file is not sym_file:
+            index = self.rebuild(sym_file)
+        return index
+
+    def search(self, query: str, files: T.Iterable[SymbolFile], limit: int = 20) -> list[dict]:
+        tokens = query.upper().split()
+        if not tokens:
+            return []
+        ranked, rows = [], {}
+        for sym_file in files:
+            rows[sym_file.name] = sym_file.instruments
+            for sort_key, i in self.index_for(sym_file).candidates(tokens, limit):
+                ranked.append((sort_key, sym_file.name, i))
+        ranked.sort()
+        results, seen = [], set()
+        for _, name, i in ranked:
+            inst = rows[name][i]
+            if inst.symbol in seen:
+                continue
+            seen.add(inst.symbol)
+            results.append(inst.spec())
+            if len(results) >= limit:
+                break
+        return results
+
+
+symbol_search = SymbolSearch()
@@ -0,0 +1,92 @@
+"""
+Compact binary snapshot of a parsed sym_details file
+Layout (little endian):
+    header   MAGIC, version, row count, string count, blob size, loaded_at, name
+    strings  NUL-separated UTF-8 blob; every text column is an index into it
+    rows     fixed-width records (ROW_DTYPE)
+
+Restoring skips the CSV parse, not the per-row work: every record is still
+turned into an Instrument and the SymbolFile indexes are rebuilt over them.
+"""
+from __future__ import annotations
+import json, mmap, os, struct, typing as T
+from itertools import repeat
+
+import numpy as np
+
+MAGIC = b"SYMSNAP1"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIIQd16s")
+
+ROW_DTYPE = np.dtype([
+    ("symbol", "<u4"), ("description", "<u4"), ("underlying", "<u4"),
+    ("lot_size", "<i4"), ("tick_size", "<f8"), ("expiry_ts", "<i8"),
+    ("strike", "<f8"), ("option_type", "<u4"), ("fytoken", "<u4"),
+])
+_TEXT_COLUMNS = ("symbol", "description", "underlying", "option_type", "fytoken")
+
+
+def snapshot_path(cache_dir: str, name: str) -> str:
+    return os.path.join(cache_dir, f"{name}.snap")
+
+
+def meta_path(cache_dir: str, name: str) -> str:
+    return os.path.join(cache_dir, f"{name}.meta.json")
+
+
+def _atomic_write(path: str, chunks: T.Iterable[bytes]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        for chunk in chunks:
+            fh.write(chunk)
+    os.replace(tmp, path)
+
+
+def write_snapshot(path: str, name: str, instruments: list, loaded_at: float):
+    """Persist Instrument tuples with every text column interned."""
+    strings: dict[str, int] = {}
+    intern = lambda s: strings.setdefault(s.replace("\0", ""), len(strings))
+    rows = np.empty(len(instruments), dtype=ROW_DTYPE)
+    for i, inst in enumerate(instruments):
+        rows[i] = (intern(inst.symbol), intern(inst.description), intern(inst.underlying),
+                   inst.lot_size, inst.tick_size, inst.expiry_ts, inst.strike,
+                   intern(inst.option_type), intern(inst.fytoken))
+    blob = "\0".join(strings).encode("utf-8")
+    header = _HEADER.pack(MAGIC, VERSION, len(rows), len(strings), len(blob),
+                          loaded_at, name.encode()[:16])
+    _atomic_write(path, (header, blob, rows.tobytes()))
+
+
+def read_snapshot(path: str, instrument_cls) -> tuple[float, list]:
+    """mmap *path* and rebuild the Instrument list (raises on a bad file)."""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, count, n_strings, blob_size, loaded_at, raw_name = _HEADER.unpack_from(mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported snapshot {path}")
+        name = raw_name.rstrip(b"\0").decode()
+        start = _HEADER.size
+        strings = mm[start:start + blob_size].decode("utf-8").split("\0") if n_strings else []
+        if len(strings) != n_strings:
+            raise ValueError(f"Corrupt string table in {path}")
+        rows = np.frombuffer(mm, dtype=ROW_DTYPE, count=count, offset=start + blob_size)
+        text = {col: list(map(strings.__getitem__, rows[col].tolist())) for col in _TEXT_COLUMNS}
+        instruments = list(map(instrument_cls._make, zip(
+            text["symbol"], text["description"], text["underlying"],
+            rows["lot_size"].tolist(), rows["tick_size"].tolist(),
+            rows["expiry_ts"].tolist(), rows["strike"].tolist(),
+            text["option_type"], text["fytoken"], repeat(name))))
+        del rows                                  # release the buffer before mmap closes
+    return loaded_at, instruments
+
+
+def read_meta(cache_dir: str, name: str) -> dict:
+    try:
+        with open(meta_path(cache_dir, name)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(cache_dir: str, name: str, meta: dict):
+    _atomic_write(meta_path(cache_dir, name), (json.dumps(meta).encode(),))
@@ -0,0 +1,197 @@
+"""
+Precomputed broker token status for the bell notifications
+Token states only change at known instants (expiry, warning thresholds), so
+the board keeps one snapshot of the broker rows, computes the next
+transition, and re-evaluates only then or after a broker write.  The
+version moves only when the notifications actually change, so polls of
+/notifications are answered with a 304 in between.
+"""
+from __future__ import annotations
+import hashlib, json, threading, time, typing as T
+from datetime import datetime, timezone
+
+from APP_Extensions import http_cache
+
+ACCESS_WARNING_MINUTES = 60        # warn an hour before the access token dies
+REFRESH_WARNING_DAYS = 2           # ... and two days before the refresh token
+RECHECK_SECONDS = 60               # picks up writes made by other workers
+
+
+def _epoch(dt: datetime | None) -> float | None:
+    """Naive UTC (as stored) or aware datetime → epoch seconds"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class BrokerFacts(T.NamedTuple):
+    id: int
+    brokername: str
+    broker_user_id: str
+    has_access_token: bool
+    has_refresh_token: bool
+    access_expires: float | None       # None = no creation time → treated as expired
+    refresh_expires: float | None
+
+    @classmethod
+    def from_row(cls, row) -> "BrokerFacts":
+        from models import access_token_expiry, REFRESH_TOKEN_VALID_DAYS
+        refresh_created = _epoch(getattr(row, "refresh_token_created_at", None))
+        return cls(row.id, row.brokername, row.broker_user_id,
+                   bool(row.access_token), bool(row.refresh_token),
+                   _epoch(access_token_expiry(getattr(row, "access_token_created_at", None))),
+                   refresh_created + REFRESH_TOKEN_VALID_DAYS * 86400 if refresh_created else None)
+
+    # Same definitions as BrokerSettings.get_token_status, on plain numbers
+    def status(self, now: float) -> dict:
+        access_left = (self.access_expires - now) if self.access_expires else 0
+        refresh_left = (self.refresh_expires - now) if self.refresh_expires and self.has_refresh_token else 0
+        return {
+            'broker_id': self.id,
+            'brokername': self.brokername,
+            'broker_user_id': self.broker_user_id,
+            'access_token_expired': not self.access_expires or access_left < 0,
+            'refresh_token_expired': not (self.refresh_expires and self.has_refresh_token) or refresh_left < 0,
+            'access_token_expires_in_minutes': max(0, int(access_left / 60)),
+            'refresh_token_expires_in_days': max(0, int(refresh_left / 86400)),
+            'has_refresh_token': self.has_refresh_token,
+        }
+
+    def transitions(self, now: float) -> list[float]:
+        """
+        Instants from *now* on right after which this broker's notifications
+        change (countdowns truncate, so the value at the instant is the old one)
+        """
+        out = []
+        if self.access_expires:
+            exp = self.access_expires
+            warn = exp - (ACCESS_WARNING_MINUTES + 1) * 60
+            if now <= warn:
+                out.append(warn)
+            elif now <= exp:
+                # Inside the warning the message counts minutes down
+                out.append(exp - 60 * int((exp - now) / 60))
+            out.append(exp)
+        if self.refresh_expires and self.has_refresh_token:
+            exp = self.refresh_expires
+            out.extend(exp - k * 86400 for k in range(REFRESH_WARNING_DAYS + 1, -1, -1))
+        return [t for t in out if t >= now]
+
+
+def notifications_for(facts: BrokerFacts, now: float) -> list[dict]:
+    status = facts.status(now)
+    base = {
+        'broker_id': facts.id,
+        'brokername': status['brokername'],
+        'broker_user_id': status['broker_user_id'],
+    }
+    label = f"{status['brokername']} ({status['broker_user_id']})"
+    out = []
+
+    # Access token notifications
+    if status['access_token_expired']:
+        out.append({**base, 'type': 'error',
+                    'message': f"{label} access token has expired",
+                    'action': 'refresh_access', 'priority': 'high',
+                    'supports_refresh_token': facts.has_refresh_token,
+                    'supports_access_token': True})
+    elif status['access_token_expires_in_minutes'] <= ACCESS_WARNING_MINUTES:
+        out.append({**base, 'type': 'warning',
+                    'message': f"{label} access token expires in {status['access_token_expires_in_minutes']} minutes",
+                    'action': 'refresh_access', 'priority': 'medium',
+                    'supports_refresh_token': facts.has_refresh_token,
+                    'supports_access_token': True})
+
+    # Refresh token notifications (if broker supports refresh tokens)
+    if status['has_refresh_token']:
+        if status['refresh_token_expired']:
+            out.append({**base, 'type': 'error',
+                        'message': f"{label} refresh token has expired - need new access token",
+                        'action': 'create_access', 'priority': 'high',
+                        'supports_refresh_token': True, 'supports_access_token': True})
+        elif status['refresh_token_expires_in_days'] <= REFRESH_WARNING_DAYS:
+            out.append({**base, 'type': 'warning',
+                        'message': f"{label} refresh token expires in {status['refresh_token_expires_in_days']} days",
+                        'action': 'create_access', 'priority': 'medium',
+                        'supports_refresh_token': True, 'supports_access_token': True})
+    return out
+
+
+def _digest(notifications: list[dict]) -> str:
+    payload = json.dumps(notifications, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def _load_facts() -> list[BrokerFacts]:
+    from models import BrokerSettings
+    # TODO: Replace with proper user session filtering when authentication is implemented
+    rows = BrokerSettings.query.filter_by(user_id=0).order_by(BrokerSettings.id).all()
+    return [BrokerFacts.from_row(r) for r in rows]
+
+
+class TokenBoard:
+    """Cached facts + notifications, versioned by actual change."""
+
+    def __init__(self, seq_name: str, loader: T.Callable[[], list[BrokerFacts]] = _load_facts):
+        self.seq_name = seq_name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._facts: list[BrokerFacts] | None = None
+        self._loaded_seq = -1
+        self._loaded_at = 0.0
+        self.version = 0
+        self.changed_at = time.time()
+        self.notifications: list[dict] = []
+        self.digest = _digest(self.notifications)      # same in every worker
+        self.next_transition = 0.0
+        http_cache.on_bump(seq_name, lambda seq: self._expire())
+
+    def _expire(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _stale(self, now: float) -> bool:
+        return (self._facts is None or now > self.next_transition
+                or now - self._loaded_at >= RECHECK_SECONDS
+                or http_cache.sequence(self.seq_name)[0] != self._loaded_seq)
+
+    def current(self, now: float | None = None) -> "TokenBoard":
+        """Re-evaluate if a transition passed or the rows changed (needs app context then)."""
+        now = now or time.time()
+        if self._stale(now):
+            self.evaluate(now)
+        return self
+
+    def evaluate(self, now: float):
+        seq = http_cache.sequence(self.seq_name)[0]
+        reload = (self._facts is None or seq != self._loaded_seq
+                  or now - self._loaded_at >= RECHECK_SECONDS)
+        facts = self._loader() if reload else self._facts
+        notifications = [n for f in facts for n in notifications_for(f, now)]
+        upcoming = [t for f in facts for t in f.transitions(now)]
+        with self._lock:
+            if reload:
+                self._facts, self._loaded_seq, self._loaded_at = facts, seq, now
+            self.next_transition = min(upcoming, default=now + RECHECK_SECONDS)
+            if notifications != self.notifications or self.version == 0:
+                self.notifications = notifications
+                self.digest = _digest(notifications)
+                self.version += 1
+                self.changed_at = now
+
+    def status(self, now: float | None = None) -> dict:
+        """Payload of /status (countdowns computed from the cached instants)"""
+        now = now or time.time()
+        statuses = [f.status(now) for f in self._facts or () if f.has_access_token]
+        return {
+            "brokers": statuses,
+            "total_brokers": len(statuses),
+            "expired_access_tokens": sum(1 for s in statuses if s['access_token_expired']),
+            "expired_refresh_tokens": sum(1 for s in statuses if s['refresh_token_expired']),
+        }
+
+    def notifications_payload(self) -> dict:
+        return {"notifications": self.notifications, "count": len(self.notifications),
+                "version": self.digest}
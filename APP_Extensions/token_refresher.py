@@ -0,0 +1,158 @@
+"""
+Background access-token refresh
+Each account's expiry instant is known from its creation time, so the
+refresher sleeps until shortly before the earliest one, refreshes through
+the broker's refresh handler and hands the token to the client registry
+(which re-points cached clients and tells the live socket).
+
+It is started only in the process owning the market feed (startup.owned);
+as a second line against two processes refreshing one account anyway, the
+row is claimed (SELECT ... FOR UPDATE SKIP LOCKED) for the duration of the
+refresh and skipped if another process holds it or has already stored a
+newer token.
+"""
+from __future__ import annotations
+import os, threading, time, typing as T
+from datetime import datetime, timedelta
+
+import pytz
+
+from APP_Extensions.fyers_clients import fyers_clients, Account
+
+IST = pytz.timezone("Asia/Kolkata")
+
+AUTO_REFRESH = os.environ.get("TOKEN_AUTO_REFRESH", "1") not in ("0", "false", "no")
+REFRESH_LEAD_SECONDS = int(os.environ.get("TOKEN_REFRESH_LEAD_MINUTES", "10")) * 60
+# A token refreshed before 8 AM IST still dies at 8 AM, so that boundary is
+# crossed first and the refresh follows right after it (markets are shut)
+AFTER_BOUNDARY_SECONDS = 15
+RETRY_SECONDS = (30, 60, 120, 300)
+IDLE_RECHECK_SECONDS = 300
+REFRESH_TOKEN_VALID = timedelta(days=10)
+
+
+def refresh_due_at(account: Account) -> float | None:
+    """Epoch at which *account* should be refreshed (None = nothing to do)."""
+    from models import access_token_expiry
+
+    if not account.access_token or not account.refresh_token:
+        return None
+    if account.refresh_token_created_at and \
+            datetime.utcnow() > account.refresh_token_created_at + REFRESH_TOKEN_VALID:
+        return None                                   # needs a fresh login, not a refresh
+    expires = access_token_expiry(account.access_token_created_at)
+    if expires is None:
+        return time.time()
+    if (expires.hour, expires.minute, expires.second) == (8, 0, 0):
+        return expires.timestamp() + AFTER_BOUNDARY_SECONDS
+    return expires.timestamp() - REFRESH_LEAD_SECONDS
+
+
+class TokenRefresher:
+    """Daemon thread refreshing every account ahead of its expiry."""
+
+    def __init__(self, registry=fyers_clients):
+        self.registry = registry
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._app = None
+        self._failures: dict[int, int] = {}
+        self._retry_at: dict[int, float] = {}
+        self.schedule: dict[int, float] = {}
+        self.last_refresh: dict[int, float] = {}
+        self.last_errors: dict[int, str] = {}
+        registry.on_token_change(lambda account: self._wake.set())
+
+    def start(self, app):
+        if self._thread and self._thread.is_alive():
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+        self._thread.start()
+        print(f"TOKEN REFRESHER: started, lead={REFRESH_LEAD_SECONDS // 60}min")
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    delay = self.run_once()
+            except Exception as e:
+                print(f"TOKEN REFRESHER ERROR: {e}")
+                delay = RETRY_SECONDS[0]
+            self._wake.wait(max(1.0, delay))
+
+    def run_once(self, now: float | None = None) -> float:
+        """Refresh whatever is due; returns seconds until the next due time."""
+        now = now or time.time()
+        schedule = {}
+        for account in self.registry.accounts():
+            due = refresh_due_at(account)
+            if due is None:
+                continue
+            due = max(due, self._retry_at.get(account.id, 0))
+            if due <= now:
+                due = self._refresh(account, now)
+            schedule[account.id] = due
+        self.schedule = schedule
+        upcoming = [d for d in schedule.values() if d]
+        return min([d - now for d in upcoming] + [IDLE_RECHECK_SECONDS])
+
+    def _refresh(self, account: Account, now: float) -> float:
+        from models import BrokerSettings
+        from APP_Routes.broker_settings import refresh_access_token
+
+        from app import db
+
+        try:
+            # Claim the row until refresh_access_token commits; a row locked
+            # by another process is being refreshed there
+            row = (BrokerSettings.query.filter_by(id=account.id)
+                   .with_for_update(skip_locked=True).first())
+            if row is None:                 # being refreshed elsewhere (or deleted)
+                db.session.rollback()
+                return now + RETRY_SECONDS[0]
+            if row.access_token != account.access_token:
+                # Already refreshed elsewhere: adopt that token, do not refresh it away
+                db.session.rollback()
+                self.registry.set_token(row.id, row.access_token, row.access_token_created_at)
+                return refresh_due_at(Account.from_row(row)) or now + IDLE_RECHECK_SECONDS
+            refresh_access_token(row)
+        except Exception as e:
+            db.session.rollback()
+            failures = self._failures[account.id] = self._failures.get(account.id, 0) + 1
+            retry = now + RETRY_SECONDS[min(failures, len(RETRY_SECONDS)) - 1]
+            self._retry_at[account.id] = retry
+            self.last_errors[account.id] = str(e)
+            print(f"TOKEN REFRESHER: refresh of {account.brokername} "
+                  f"({account.broker_user_id}) failed: {e}")
+            return retry
+        self._failures.pop(account.id, None)
+        self._retry_at.pop(account.id, None)
+        self.last_errors.pop(account.id, None)
+        self.last_refresh[account.id] = now
+        print(f"TOKEN REFRESHER: refreshed {account.brokername} ({account.broker_user_id})")
+        current = self.registry.account(account.id)   # None if deleted meanwhile
+        return (refresh_due_at(current) if current else None) or now + IDLE_RECHECK_SECONDS
+
+    def status(self) -> dict:
+        fmt = lambda ts: datetime.fromtimestamp(ts, IST).isoformat() if ts else None
+        return {
+            "enabled": AUTO_REFRESH,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "lead_minutes": REFRESH_LEAD_SECONDS // 60,
+            "accounts": [{"broker_id": account_id,
+                          "next_refresh": fmt(due),
+                          "last_refresh": fmt(self.last_refresh.get(account_id)),
+                          "last_error": self.last_errors.get(account_id)}
+                         for account_id, due in self.schedule.items()],
+        }
+
+
+token_refresher = TokenRefresher()
+
+
+def start_token_refresher(app):
+    """Start the refresher unless TOKEN_AUTO_REFRESH=0"""
+    if AUTO_REFRESH:
+        token_refresher.start(app)
@@ -4,24 +4,23 @@
 # ---------------------------------------------------------------------
 from __future__ import annotations
 from datetime import date, datetime
-import hashlib, json, typing as T, requests
+import hashlib, json, typing as T
 import pytz
 import logging
 
 from flask import Blueprint, jsonify, request
 from app import db
 from models import BrokerSettings
-
-# ---------------------------------------------------------------------
-# Optional import: only needed when the fyers SDK is installed.
-try:
-    from fyers_apiv3 import fyersModel
-except ImportError:
-    fyersModel = None
+from APP_Extensions import http_cache
+from APP_Extensions.fyers_clients import fyers_clients, fyers_model
+from APP_Extensions.http_client import http_client
 
 bp = Blueprint("broker_settings", __name__, url_prefix="/api/broker_settings")
 _rows = lambda: BrokerSettings.query.filter_by(user_id=0)
 
+# Sequence bumped on every broker row write (token monitor ETags)
+BROKER_SETTINGS_SEQ = http_cache.shared("broker_settings")
+
 # Configure logging for debugging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -95,6 +94,8 @@ def api_create():
     row = BrokerSettings(user_id=0, **_clean(js))
     db.session.add(row)
     db.session.commit()
+    http_cache.bump(BROKER_SETTINGS_SEQ)
+    fyers_clients.invalidate()
     return jsonify(_dto(row)), 201
 
 @bp.put("/<int:row_id>")
@@ -109,12 +110,16 @@ def api_update(row_id: int):
     for k, v in payload.items():
         setattr(row, k, v)
     db.session.commit()
+    http_cache.bump(BROKER_SETTINGS_SEQ)
+    fyers_clients.invalidate()
     return jsonify(_dto(row))
 
 @bp.delete("/<int:row_id>")
 def api_delete(row_id: int):
     db.session.delete(BrokerSettings.query.get_or_404(row_id))
     db.session.commit()
+    http_cache.bump(BROKER_SETTINGS_SEQ)
+    fyers_clients.invalidate()
     return "", 204
 
 # ---------------------------------------------------------------------
@@ -125,12 +130,15 @@ BrokerHandler = T.TypedDict("BrokerHandler", {
 })
 
 def _fyers_ok():
+    """fyersModel (imported on first use) or RuntimeError when not installed."""
+    fyersModel = fyers_model()
     if fyersModel is None:
         raise RuntimeError("fyers-apiv3 SDK not installed")
+    return fyersModel
 
 def _fyers_token(row: BrokerSettings, auth_code: str) -> tuple[str, str]:
     """Exchange auth_code → (access, refresh)."""
-    _fyers_ok()
+    fyersModel = _fyers_ok()
     s = fyersModel.SessionModel(
         client_id   = row.clientid,
         secret_key  = row.appkey,
@@ -162,7 +170,7 @@ def _fyers_refresh(row: BrokerSettings) -> str:
         "pin": row.pin,
     }
     logger.debug(f"Request body for Fyers API: {body}")  # Debug: Log request body
-    r = requests.post(
+    r = http_client.post(
         "https://api-t1.fyers.in/api/v3/validate-refresh-token",
         data=json.dumps(body),
         headers={"Content-Type": "application/json"},
@@ -204,21 +212,29 @@ def api_token(row_id: int):
         row.access_token_created_at = now
         row.refresh_token_created_at = now
         db.session.commit()
+        http_cache.bump(BROKER_SETTINGS_SEQ)
+        fyers_clients.set_token(row.id, access, now, refresh)
         return jsonify(_dto(row))
     except KeyError:
         return _json_error("Select a valid broker for this action")
     except Exception as exc:
         return _json_error(str(exc), 502)
 
+def refresh_access_token(row: BrokerSettings) -> BrokerSettings:
+    """Refresh *row*'s access token, store it and hand it to the cached clients."""
+    new_access_token = _handler(row)["refresh"](row)
+    row.access_token = new_access_token
+    row.access_token_created_at = datetime.utcnow()
+    db.session.commit()
+    http_cache.bump(BROKER_SETTINGS_SEQ)
+    fyers_clients.set_token(row.id, new_access_token, row.access_token_created_at)
+    return row
+
 @bp.post("/<int:row_id>/refresh")
 def api_refresh(row_id: int):
     row = BrokerSettings.query.get_or_404(row_id)
     try:
-        new_access_token = _handler(row)["refresh"](row)
-        row.access_token = new_access_token
-        row.access_token_created_at = datetime.utcnow()
-        db.session.commit()
-        return jsonify(_dto(row))
+        return jsonify(_dto(refresh_access_token(row)))
     except KeyError:
         return _json_error("Select a valid broker for this action")
     except Exception as exc:
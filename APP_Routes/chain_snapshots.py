@@ -0,0 +1,300 @@
+"""
+Intraday option chain sampler
+Records the full chain for configured underlyings/expiries at a fixed
+interval and answers "as of T" and per-strike history queries from memory.
+The sampler runs once per deployment (startup.owned); web workers behind a
+feed process (MARKET_FEED=shared) forward these endpoints to its store.
+"""
+from flask import Blueprint, request, jsonify, current_app
+import os
+import threading
+import time
+from datetime import datetime
+from APP_Extensions.chain_store import ChainSnapshotStore, FIELDS
+from APP_Extensions.market_data import get_market_client
+from APP_Extensions.market_scheduler import market_scheduler, exchange_of, RECHECK_SECONDS
+from APP_Extensions.market_warmup import market_warmup
+from APP_Extensions.feed_channel import FeedUnavailable
+from APP_Routes.websocket_handler import FEED_COMMANDS, _feed
+
+chain_snapshots_bp = Blueprint('chain_snapshots', __name__, url_prefix='/api/chain_snapshots')
+
+# Sampler configuration (targets: "SYMBOL@EXPIRY,SYMBOL" - empty expiry = nearest)
+SAMPLER_INTERVAL = int(os.environ.get("CHAIN_SAMPLER_INTERVAL", "60"))
+SAMPLER_STRIKES = int(os.environ.get("CHAIN_SAMPLER_STRIKES", "50"))
+SAMPLER_RETENTION_HOURS = int(os.environ.get("CHAIN_SAMPLER_RETENTION_HOURS", "24"))
+
+snapshot_store = ChainSnapshotStore()
+
+
+def _parse_targets(spec):
+    targets = []
+    for item in filter(None, (t.strip() for t in spec.split(','))):
+        symbol, _, expiry = item.partition('@')
+        targets.append((symbol.strip(), expiry.strip()))
+    return targets
+
+
+class ChainSampler:
+    """Background thread that snapshots every target once per interval"""
+
+    def __init__(self, store, interval, strike_count):
+        self.store = store
+        self.interval = interval
+        self.strike_count = strike_count
+        self.targets = {}               # (symbol, expiry) as configured ("" = nearest)
+        self.resolved = {}              # (symbol, expiry) -> upstream expiry timestamp
+        self.last_run = None
+        self.last_errors = {}
+        self.paused = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._app = None
+
+    def add_target(self, symbol, expiry=""):
+        with self._lock:
+            self.targets.setdefault((symbol, expiry), None)
+        self.wake()
+
+    def remove_target(self, symbol, expiry=""):
+        with self._lock:
+            self.resolved.pop((symbol, expiry), None)
+            return self.targets.pop((symbol, expiry), False) is not False
+
+    def start(self, app):
+        if self._thread and self._thread.is_alive():
+            return
+        self._app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chain-sampler", daemon=True)
+        self._thread.start()
+        print(f"CHAIN SAMPLER: started, interval={self.interval}s, targets={len(self.targets)}")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self, *_):
+        """Re-evaluate now (new target, or a market changed phase)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.time()
+            self._wake.clear()
+            idle = 0
+            try:
+                with self._app.app_context():
+                    self.sample_once()
+                    with self._lock:
+                        symbols = [symbol for symbol, _ in self.targets]
+                    # Sleep through closed sessions (the scheduler wakes us at warm-up)
+                    idle = min(market_scheduler.idle_seconds(symbols), RECHECK_SECONDS * 5)
+            except Exception as e:
+                print(f"CHAIN SAMPLER ERROR: {e}")
+            self._wake.wait(max(1.0, self.interval - (time.time() - started), idle))
+
+    def sample_once(self):
+        """Take one snapshot of every target"""
+        with self._lock:
+            targets = [(target, self.resolved.get(target)) for target in self.targets]
+        active = {ex for ex in {exchange_of(s) for (s, _), _ in targets}
+                  if market_scheduler.is_active(ex)}
+        self.paused = [f"{s}@{e}" for (s, e), _ in targets if exchange_of(s) not in active]
+        targets = [t for t in targets if exchange_of(t[0][0]) in active]
+        if not targets:
+            return
+        fyers, error = get_market_client()
+        if error:
+            self.last_errors = {"client": error}
+            return
+
+        now = int(time.time())
+        errors = {}
+        for (symbol, expiry), timestamp in targets:
+            try:
+                # "Nearest" moves on to the next expiry once the resolved one has passed
+                if not timestamp or (not expiry and int(timestamp) <= now):
+                    timestamp = self._resolve_expiry(fyers, symbol, expiry)
+                    with self._lock:
+                        if (symbol, expiry) in self.targets:
+                            self.resolved[(symbol, expiry)] = timestamp
+                self.record(fyers, symbol, timestamp, now)
+            except Exception as e:
+                errors[f"{symbol}@{expiry}"] = str(e)
+
+        self.store.clear(before=now - SAMPLER_RETENTION_HOURS * 3600)
+        self.last_run = now
+        self.last_errors = errors
+
+    def record(self, fyers, symbol, timestamp, now):
+        """Fetch one chain and add it to the store as the sample at *now*"""
+        response = fyers.optionchain(data={
+            "symbol": symbol,
+            "strikecount": self.strike_count,
+            "timestamp": timestamp,
+        })
+        if response.get('s') != 'ok':
+            raise RuntimeError(response.get('message', 'Unknown error'))
+        options = response.get('data', {}).get('optionsChain', [])
+        # The underlying itself comes back as a row without a strike
+        spot = next((o.get('ltp', 0) for o in options
+                     if (o.get('strike_price') or 0) <= 0), 0)
+        self.store.record(symbol, timestamp, now, options, spot)
+
+    @staticmethod
+    def _resolve_expiry(fyers, symbol, expiry):
+        """Expiry label ("28-AUG-25"), timestamp or "" (nearest) → upstream timestamp"""
+        if expiry.isdigit():
+            return expiry
+        response = fyers.optionchain(data={"symbol": symbol, "strikecount": 1, "timestamp": ""})
+        if response.get('s') != 'ok':
+            raise RuntimeError(f"Failed to get expiry data: {response.get('message', 'Unknown error')}")
+        expiry_data = response.get('data', {}).get('expiryData', [])
+        if not expiry_data:
+            raise RuntimeError("No expiry data")
+        if not expiry:
+            return str(expiry_data[0]['expiry'])
+        formatted_date = datetime.strptime(expiry, "%d-%b-%y").strftime("%d-%m-%Y")
+        for exp in expiry_data:
+            if exp['date'] == formatted_date:
+                return str(exp['expiry'])
+        raise RuntimeError(f"Invalid expiry date: {expiry}")
+
+    def status(self):
+        with self._lock:
+            targets = [{"symbol": s, "expiry": e, "expiry_timestamp": self.resolved.get((s, e))}
+                       for s, e in self.targets]
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "interval": self.interval,
+            "strike_count": self.strike_count,
+            "targets": targets,
+            "last_run": self.last_run,
+            "last_errors": self.last_errors,
+            "paused": self.paused,
+        }
+
+
+chain_sampler = ChainSampler(snapshot_store, SAMPLER_INTERVAL, SAMPLER_STRIKES)
+market_scheduler.on_change(chain_sampler.wake)
+
+
+def _warm_last_close(exchange, underlyings):
+    """Last-close chain of each underlying's nearest expiry, for as-of queries before the open"""
+    fyers, error = get_market_client()
+    if error:
+        raise RuntimeError(error)
+    now = int(time.time())
+    recorded = 0
+    for symbol in underlyings:
+        try:
+            chain_sampler.record(fyers, symbol, ChainSampler._resolve_expiry(fyers, symbol, ""), now)
+            recorded += 1
+        except Exception as e:
+            print(f"CHAIN WARMUP: {symbol} failed: {e}")
+    return recorded
+
+market_warmup.step("last_close_chains", _warm_last_close, order=40)
+
+
+def start_chain_sampler(app):
+    """Start sampling at boot when targets are configured via the environment"""
+    for symbol, expiry in _parse_targets(os.environ.get("CHAIN_SAMPLER_TARGETS", "")):
+        chain_sampler.add_target(symbol, expiry)
+    if chain_sampler.targets:
+        chain_sampler.start(app)
+
+
+def _int_arg(name, default=None):
+    value = request.args.get(name, '')
+    return int(value) if value.strip() else default
+
+
+def _sampler_status():
+    return {**chain_sampler.status(), "series": snapshot_store.keys(), "fields": list(FIELDS)}
+
+
+def _add_target(symbol, expiry):
+    chain_sampler.add_target(symbol, expiry)
+    chain_sampler.start(current_app._get_current_object())
+    return chain_sampler.status()
+
+
+def _remove_target(symbol, expiry):
+    return chain_sampler.status() if chain_sampler.remove_target(symbol, expiry) else None
+
+
+# Served by the process running the sampler to web workers (MARKET_FEED=shared)
+FEED_COMMANDS.update({
+    "snapshots.status": _sampler_status,
+    "snapshots.add": _add_target,
+    "snapshots.remove": _remove_target,
+    "snapshots.as_of": snapshot_store.as_of,
+    "snapshots.strike": snapshot_store.strike_series,
+})
+
+
+@chain_snapshots_bp.errorhandler(FeedUnavailable)
+def _feed_unavailable(e):
+    return jsonify({"error": str(e)}), 503
+
+
+@chain_snapshots_bp.route('/', methods=['GET'])
+def sampler_status():
+    """Sampler configuration and the series currently held in memory"""
+    return jsonify(_feed("snapshots.status"))
+
+
+@chain_snapshots_bp.route('/targets', methods=['POST'])
+def add_target():
+    """Add an underlying/expiry to the sampler and start it if needed"""
+    data = request.get_json() or {}
+    symbol = (data.get('symbol') or '').strip()
+    if not symbol:
+        return jsonify({"error": "symbol required"}), 400
+    return jsonify(_feed("snapshots.add", symbol, (data.get('expiry') or '').strip())), 201
+
+
+@chain_snapshots_bp.route('/targets', methods=['DELETE'])
+def remove_target():
+    data = request.get_json() or {}
+    status = _feed("snapshots.remove", (data.get('symbol') or '').strip(),
+                   (data.get('expiry') or '').strip())
+    if status is None:
+        return jsonify({"error": "Target not found"}), 404
+    return jsonify(status)
+
+
+@chain_snapshots_bp.route('/as_of', methods=['GET'])
+def chain_as_of():
+    """Full chain as of ?t=<epoch seconds> (default: latest sample)"""
+    try:
+        symbol = request.args.get('symbol', '')
+        expiry = request.args.get('expiry', '')
+        if not symbol or not expiry:
+            return jsonify({"error": "symbol and expiry (timestamp) required"}), 400
+        snapshot = _feed("snapshots.as_of", symbol, expiry, _int_arg('t', int(time.time())))
+        if snapshot is None:
+            return jsonify({"error": "No snapshot recorded for that time"}), 404
+        return jsonify(snapshot)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+
+@chain_snapshots_bp.route('/strike', methods=['GET'])
+def strike_history():
+    """Time series of one strike between ?from= and ?to= (epoch seconds)"""
+    try:
+        symbol = request.args.get('symbol', '')
+        expiry = request.args.get('expiry', '')
+        strike = float(request.args.get('strike', ''))
+        series = _feed("snapshots.strike", symbol, expiry, strike,
+                       _int_arg('from'), _int_arg('to'))
+        if series is None:
+            return jsonify({"error": "No snapshots recorded for that underlying/expiry"}), 404
+        return jsonify(series)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
@@ -5,56 +5,90 @@ Fetches FYERS historical data for option symbols
 
 from flask import Blueprint, request, jsonify
 import logging
+import threading
 from datetime import datetime, timedelta
-from fyers_apiv3 import fyersModel
-from models import BrokerSettings
+import pytz
+from APP_Extensions import http_cache, chain_skeleton
+from APP_Extensions.market_data import get_market_client
+from APP_Extensions.indicators import IndicatorCache, parse_spec
+from APP_Extensions.market_scheduler import market_scheduler, exchange_of
+from APP_Extensions.market_warmup import market_warmup, WARMUP_STRIKES
+from APP_Extensions.symbol_master import symbol_master
 
 historical_bp = Blueprint('historical', __name__)
 
-def get_fyers_client():
-    """Get FYERS client with access token"""
-    try:
-        broker_row = BrokerSettings.query.filter_by(brokername='fyers').first()
-        if not broker_row or not broker_row.access_token:
-            return None, "No FYERS access token found"
-            
-        access_token = broker_row.access_token
-        client_id = broker_row.clientid
-        
-        fyers = fyersModel.FyersModel(
-            client_id=client_id, 
-            token=access_token, 
-            is_async=False, 
-            log_path=""
-        )
-        
-        return fyers, None
-    except Exception as e:
-        return None, str(e)
+# Repeat polls inside this window reuse the last upstream answer
+HISTORY_TTL_SECONDS = 5
+_history_cache = http_cache.VersionedCache(ttl=HISTORY_TTL_SECONDS)
+
+# Indicator state per (symbol, resolution, spec) - only new bars are stepped
+_indicator_cache = IndicatorCache()
+
+# Candles before today, fetched by the pre-open warm-up:
+# (symbol, resolution) → (IST midnight they were fetched for, candles).
+# With them in hand a history request only asks upstream for today.
+HISTORY_DAYS = 4
+WARMUP_RESOLUTIONS = ("1",)
+IST = pytz.timezone('Asia/Kolkata')
+_prior_candles = {}
+_prior_lock = threading.Lock()
+
+def _today_start():
+    now = datetime.now(IST)
+    return int(IST.localize(datetime.combine(now.date(), datetime.min.time())).timestamp())
+
+@historical_bp.after_request
+def _market_session_headers(response):
+    """Microchart refreshes back off while the symbol's market is shut"""
+    symbol = (request.view_args or {}).get('symbol', '')
+    return market_scheduler.annotate(response, [symbol] if symbol else [])
 
 @historical_bp.route('/api/option_history/<symbol>')
 def get_option_history(symbol):
     """Get historical price data for option microchart"""
     try:
+        # Get resolution from query parameter (default: 1-minute for more granular data)
+        resolution = request.args.get('resolution', '1')  # 1-minute intervals
+        
+        # Optional server-side indicators, e.g. ?indicators=ema:20,rsi:14,vwap
+        indicator_spec = request.args.get('indicators', '').strip().lower()
+        if indicator_spec:
+            try:
+                parse_spec(indicator_spec)
+            except ValueError as e:
+                return jsonify({"error": f"Invalid indicators: {e}"}), 400
+        
+        cache_key = (symbol, resolution, indicator_spec)
+        frozen = market_scheduler.frozen(exchange_of(symbol))
+        cached = _history_cache.fresh(cache_key, frozen)
+        if cached:
+            return _history_cache.response(cached, "history", *cache_key)
+        
         # Get FYERS client
-        fyers, error = get_fyers_client()
+        fyers, error = get_market_client()
         if error:
             return jsonify({"error": error}), 500
         
         # Get date range (last 4 days to current time for recent market data)
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=4)
+        start_date = end_date - timedelta(days=HISTORY_DAYS)
         
         # Format dates for FYERS API
         from_date = start_date.strftime("%Y-%m-%d")
         to_date = end_date.strftime("%Y-%m-%d")
         
+        # Previous sessions warmed before the open: only today is fetched,
+        # and nothing at all while today's session has not started
+        today_start = _today_start()
+        prior = _prior_candles.get((symbol, resolution))
+        if prior and prior[0] != today_start:
+            prior = None
+        if prior:
+            from_date = datetime.fromtimestamp(today_start, IST).strftime("%Y-%m-%d")
+        
         print(f"FETCHING HISTORICAL DATA FOR: {symbol}")
         print(f"Date Range: {from_date} to {to_date}")
         
-        # Get resolution from query parameter (default: 1-minute for more granular data)
-        resolution = request.args.get('resolution', '1')  # 1-minute intervals
-        
         # FYERS historical data request
         data = {
             "symbol": symbol,
@@ -67,10 +101,17 @@ def get_option_history(symbol):
         
         print(f"Resolution: {resolution}-minute intervals")
         
-        response = fyers.history(data=data)
+        if prior and frozen and frozen[0] <= today_start:
+            response = {"s": "no_data", "candles": []}
+        else:
+            response = fyers.history(data=data)
         
         print(f"FYERS HISTORY RESPONSE: {response}")
         
+        if prior and response.get('s') in ('ok', 'no_data'):
+            response = {"s": "ok", "candles": prior[1] + [c for c in response.get('candles') or []
+                                                         if c[0] >= today_start]}
+        
         if response.get('s') == 'no_data':
             print(f"FYERS HISTORY: No data available for {symbol}")
             return jsonify({
@@ -116,25 +157,91 @@ def get_option_history(symbol):
         
         print(f"PROCESSED DATA: {len(ohlc_data)} OHLC candles for {symbol}")
         
-        return jsonify({
-            "symbol": symbol,
-            "prices": prices,           # For microcharts
-            "timestamps": timestamps,   # For microcharts
-            "ohlc_data": ohlc_data,    # For candlestick charts
-            "count": len(prices)
-        })
+        def render(_modified):
+            payload = {
+                "symbol": symbol,
+                "prices": prices,           # For microcharts
+                "timestamps": timestamps,   # For microcharts
+                "ohlc_data": ohlc_data,    # For candlestick charts
+                "count": len(prices)
+            }
+            if indicator_spec:
+                # Aligned with ohlc_data; the last value uses the forming bar
+                candles_s = [[row[0] // 1000, *row[1:]] for row in ohlc_data]
+                payload["indicators"] = _indicator_cache.get(
+                    symbol, resolution, indicator_spec).update(candles_s)
+            return payload
+        
+        # Sequence only advances when the candles differ from the last fetch
+        entry = _history_cache.store(cache_key, ohlc_data, render)
+        return _history_cache.response(entry, "history", *cache_key)
         
     except Exception as e:
         print(f"HISTORICAL DATA ERROR: {e}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 
+def prefetch_previous_sessions(symbols, resolutions=WARMUP_RESOLUTIONS):
+    """Fetch the candles before today of *symbols* into the warm-up store"""
+    fyers, error = get_market_client()
+    if error:
+        raise RuntimeError(error)
+    today_start = _today_start()
+    day = datetime.fromtimestamp(today_start, IST)
+    warmed = 0
+    for symbol in symbols:
+        for resolution in resolutions:
+            key = (symbol, resolution)
+            if _prior_candles.get(key, (None,))[0] == today_start:
+                warmed += 1
+                continue
+            response = fyers.history(data={
+                "symbol": symbol,
+                "resolution": resolution,
+                "date_format": "1",
+                "range_from": (day - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d"),
+                "range_to": (day - timedelta(days=1)).strftime("%Y-%m-%d"),
+                "cont_flag": "1"
+            })
+            if response.get('s') not in ('ok', 'no_data'):
+                print(f"HISTORY WARMUP ERROR {symbol}: {response.get('message', 'Unknown error')}")
+                continue
+            candles = [c for c in response.get('candles') or [] if c[0] < today_start]
+            with _prior_lock:
+                _prior_candles[key] = (today_start, candles)
+            warmed += 1
+    # Yesterday's entries are no use any more
+    with _prior_lock:
+        for key in [k for k, (start, _) in _prior_candles.items() if start != today_start]:
+            del _prior_candles[key]
+    return warmed
+
+def _warm_history(exchange, underlyings):
+    """Previous-session candles of the underlyings and their near-ATM strikes"""
+    warmed = prefetch_previous_sessions(underlyings)
+    options = []
+    for symbol in underlyings:
+        try:
+            expiry = chain_skeleton.resolve_expiry(symbol_master, symbol, "")
+            if not expiry:
+                continue
+            candles = _prior_candles.get((symbol, WARMUP_RESOLUTIONS[0]), (None, []))[1]
+            spot = candles[-1][4] if candles else 0
+            skeleton = chain_skeleton.build_skeleton(symbol_master, symbol, expiry, WARMUP_STRIKES, spot)
+            if skeleton:
+                options += skeleton.symbols
+        except Exception as e:
+            print(f"HISTORY WARMUP: no strikes for {symbol}: {e}")
+    return warmed + prefetch_previous_sessions(options)
+
+market_warmup.step("previous_session_candles", _warm_history, order=30)
+
 @historical_bp.route('/api/tick_data/<symbol>')
 def get_tick_data(symbol):
     """Get tick-level data for real-time market analysis"""
     try:
         # Get FYERS client
-        fyers, error = get_fyers_client()
+        fyers, error = get_market_client()
         if error:
             return jsonify({"error": error}), 500
         
@@ -213,7 +320,7 @@ def get_batch_option_history():
             return jsonify({"error": "No symbols provided"}), 400
             
         # Get FYERS client
-        fyers, error = get_fyers_client()
+        fyers, error = get_market_client()
         if error:
             return jsonify({"error": error}), 500
         
@@ -1,8 +1,27 @@
 from flask import request, jsonify
 from datetime import datetime, time
+import time as _time
 import pytz
 from app import db
-from models import MarketTime
+from models import MarketTime, MarketHoliday
+from APP_Extensions import http_cache
+from APP_Extensions.market_holidays import HolidayCalendar, parse_entry, parse_csv
+from APP_Extensions.market_sessions import SessionEngine, WINDOW_DAYS
+
+# Sequence name bumped on every MarketTime write (drives the ETag of the
+# polled market endpoints)
+MARKET_TIMES_SEQ = http_cache.shared("market_times")
+# ... and on every MarketHoliday write
+MARKET_HOLIDAYS_SEQ = http_cache.shared("market_holidays")
+# Every market payload is derived from these two tables and the clock
+_MARKET_SEQS = (MARKET_TIMES_SEQ, MARKET_HOLIDAYS_SEQ)
+
+# Holiday table and session instants of every active market, precomputed
+# for a rolling window
+holiday_calendar = HolidayCalendar(MARKET_HOLIDAYS_SEQ)
+session_engine = SessionEngine(MARKET_TIMES_SEQ, holiday_calendar)
+TIMELINE_DEFAULT_DAYS = 5
+HOLIDAY_IMPORT_LIMIT = 2000
 
 
 def api_list_market_times():
@@ -60,6 +79,7 @@ def api_create_market_time():
         
         db.session.add(market_time)
         db.session.commit()
+        http_cache.bump(MARKET_TIMES_SEQ)
         
         return jsonify(market_time.to_dict()), 201
     
@@ -111,6 +131,7 @@ def api_update_market_time(market_id):
         
         market_time.updated_at = datetime.utcnow()
         db.session.commit()
+        http_cache.bump(MARKET_TIMES_SEQ)
         
         return jsonify(market_time.to_dict())
     
@@ -129,6 +150,7 @@ def api_delete_market_time(market_id):
         market_time.is_active = False
         market_time.updated_at = datetime.utcnow()
         db.session.commit()
+        http_cache.bump(MARKET_TIMES_SEQ)
         
         return jsonify({"message": "Market time deleted successfully"})
     
@@ -140,71 +162,14 @@ def api_delete_market_time(market_id):
 def api_get_current_market_status():
     """Get current status of all active markets"""
     try:
-        market_times = MarketTime.query.filter_by(user_id=0, is_active=True).all()
-        current_utc = datetime.utcnow()
-        
-        market_status = []
-        
-        for market in market_times:
-            try:
-                # Convert to market timezone
-                market_tz = pytz.timezone(market.timezone)
-                market_time = current_utc.replace(tzinfo=pytz.UTC).astimezone(market_tz)
-                
-                # Check if current day is a trading day
-                current_weekday = market_time.weekday() + 1  # Monday = 1
-                trading_days = [int(d) for d in market.trading_days.split(',')]
-                
-                is_trading_day = current_weekday in trading_days
-                
-                # Parse market times
-                open_time = datetime.strptime(market.local_open_time, '%H:%M').time()
-                close_time = datetime.strptime(market.local_close_time, '%H:%M').time()
-                current_time = market_time.time()
-                
-                # Determine market status
-                if not is_trading_day:
-                    status = "closed"
-                    next_event = "closed_weekend"
-                elif current_time < open_time:
-                    status = "pre_market"
-                    next_event = "opening"
-                elif current_time >= close_time:
-                    status = "closed"
-                    next_event = "closed_day"
-                else:
-                    status = "open"
-                    next_event = "closing"
-                
-                # Check for lunch break
-                if market.lunch_start and market.lunch_end and status == "open":
-                    lunch_start = datetime.strptime(market.lunch_start, '%H:%M').time()
-                    lunch_end = datetime.strptime(market.lunch_end, '%H:%M').time()
-                    if lunch_start <= current_time <= lunch_end:
-                        status = "lunch_break"
-                        next_event = "lunch_end"
-                
-                market_status.append({
-                    'id': market.id,
-                    'market_name': market.market_name,
-                    'country': market.country,
-                    'exchange_code': market.exchange_code,
-                    'status': status,
-                    'next_event': next_event,
-                    'local_time': market_time.strftime('%H:%M'),
-                    'local_date': market_time.strftime('%Y-%m-%d'),
-                    'timezone': market.timezone,
-                    'is_trading_day': is_trading_day,
-                    'notify_open': market.notify_open,
-                    'notify_close': market.notify_close,
-                    'sound_enabled': market.sound_enabled
-                })
-                
-            except Exception as e:
-                # Skip this market if there's an error processing it
-                continue
-        
-        return jsonify(market_status)
+        # Status and HH:MM clocks only change on minute boundaries
+        session_engine.timelines()
+        minute = int(_time.time() // 60)
+        return http_cache.conditional_json(
+            http_cache.shared_etag(_MARKET_SEQS, "market-status", minute),
+            session_engine.current_status,
+            last_modified=max(session_engine.built_at, minute * 60),
+        )
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -213,88 +178,144 @@ def api_get_current_market_status():
 def api_get_simple_markets():
     """Get simplified market information with IST conversions for easy user understanding"""
     try:
-        market_times = MarketTime.query.filter_by(user_id=0, is_active=True).all()
-        current_utc = datetime.utcnow()
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        
-        simple_markets = []
+        # Payload only changes when a market/holiday row changes or the clock
+        # ticks over to the next minute (times are rendered as HH:MM)
+        session_engine.timelines()
+        minute = int(_time.time() // 60)
+        return http_cache.conditional_json(
+            http_cache.shared_etag(_MARKET_SEQS, "markets", minute),
+            session_engine.simple_markets,
+            last_modified=max(session_engine.built_at, minute * 60),
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def api_get_market_timeline():
+    """Next N trading sessions (UTC instants) of every active market"""
+    try:
+        days = request.args.get('days', TIMELINE_DEFAULT_DAYS, type=int)
+        if not days or days < 1:
+            return jsonify({"error": "days must be a positive integer"}), 400
+        days = min(days, WINDOW_DAYS)
+        session_engine.timelines()
+        # Sessions only move on a market write or when the window rolls
+        today = int(_time.time() // 86400)
+        return http_cache.conditional_json(
+            http_cache.shared_etag(_MARKET_SEQS, "market-timeline", days, today),
+            lambda: session_engine.timeline(days),
+            last_modified=session_engine.built_at,
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def api_get_market_scheduler():
+    """Phase (warmup / open / closed) of every scheduled exchange and the last warm-ups"""
+    try:
+        from APP_Extensions.market_scheduler import market_scheduler
+        from APP_Extensions.market_warmup import market_warmup
+        return jsonify({**market_scheduler.status(), "warmup": market_warmup.status()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def api_run_market_warmup():
+    """Run the pre-open warm-up for one exchange now (normally done at its warm-up phase)"""
+    try:
+        from APP_Extensions.market_warmup import market_warmup
+        exchange = ((request.get_json(silent=True) or {}).get('exchange')
+                    or request.args.get('exchange', '')).strip().upper()
+        if not exchange:
+            return jsonify({"error": "exchange required"}), 400
+        return jsonify(market_warmup.run(exchange))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def api_list_market_holidays():
+    """Holidays / special sessions, optionally for one exchange and year"""
+    try:
+        exchange = request.args.get('exchange', '').strip().upper()
+        year = request.args.get('year', type=int)
+        query = MarketHoliday.query.filter_by(user_id=0)
+        if exchange:
+            query = query.filter_by(exchange_code=exchange)
+        if year:
+            query = query.filter(MarketHoliday.holiday_date >= datetime(year, 1, 1).date(),
+                                 MarketHoliday.holiday_date <= datetime(year, 12, 31).date())
+        rows = query.order_by(MarketHoliday.holiday_date, MarketHoliday.exchange_code).all()
+        return jsonify([r.to_dict() for r in rows])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def api_import_market_holidays():
+    """
+    Bulk upsert of holidays / special sessions, one row per exchange and
+    date.  Body: JSON list (or {"holidays": [...]}) or text/csv with a header
+    row; fields exchange_code, date, description, session_type
+    (holiday|special), open_time, close_time.
+    """
+    try:
+        if request.mimetype == 'text/csv':
+            items = parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            items = data.get('holidays') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Expected a non-empty list of holidays"}), 400
+        if len(items) > HOLIDAY_IMPORT_LIMIT:
+            return jsonify({"error": f"At most {HOLIDAY_IMPORT_LIMIT} rows per import"}), 400
         
-        for market in market_times:
+        parsed, errors = {}, []
+        for i, item in enumerate(items):
             try:
-                # Convert to market timezone
-                market_tz = pytz.timezone(market.timezone)
-                market_time = current_utc.replace(tzinfo=pytz.UTC).astimezone(market_tz)
-                
-                # Convert to IST
-                ist_time = current_utc.replace(tzinfo=pytz.UTC).astimezone(ist_tz)
-                
-                # Check if current day is a trading day
-                current_weekday = market_time.weekday() + 1  # Monday = 1
-                trading_days = [int(d) for d in market.trading_days.split(',')]
-                is_trading_day = current_weekday in trading_days
-                
-                # Parse market times
-                open_time = datetime.strptime(market.local_open_time, '%H:%M').time()
-                close_time = datetime.strptime(market.local_close_time, '%H:%M').time()
-                current_local_time = market_time.time()
-                
-                # Convert market open/close times to IST
-                market_date = market_time.date()
-                market_open_dt = market_tz.localize(datetime.combine(market_date, open_time))
-                market_close_dt = market_tz.localize(datetime.combine(market_date, close_time))
-                
-                ist_open_dt = market_open_dt.astimezone(ist_tz)
-                ist_close_dt = market_close_dt.astimezone(ist_tz)
-                
-                # Determine next event
-                next_event = None
-                next_event_at_utc = None
-                next_event_ist = None
-                
-                if is_trading_day:
-                    if current_local_time < open_time:
-                        next_event = "opening"
-                        next_event_at_utc = market_open_dt.astimezone(pytz.UTC).isoformat()
-                        next_event_ist = ist_open_dt.strftime('%H:%M')
-                    elif current_local_time < close_time:
-                        next_event = "closing"
-                        next_event_at_utc = market_close_dt.astimezone(pytz.UTC).isoformat()
-                        next_event_ist = ist_close_dt.strftime('%H:%M')
-                    else:
-                        next_event = "closed"
-                else:
-                    next_event = "weekend"
-                
-                simple_markets.append({
-                    'id': market.id,
-                    'market_name': market.market_name,
-                    'country': market.country,
-                    'timezone': market.timezone,
-                    'local_now': market_time.strftime('%H:%M'),
-                    'local_date': market_time.strftime('%Y-%m-%d'),
-                    'local_open': market.local_open_time,
-                    'local_close': market.local_close_time,
-                    'ist_now': ist_time.strftime('%H:%M'),
-                    'ist_open': ist_open_dt.strftime('%H:%M'),
-                    'ist_close': ist_close_dt.strftime('%H:%M'),
-                    'ist_open_date': ist_open_dt.strftime('%Y-%m-%d'),
-                    'ist_close_date': ist_close_dt.strftime('%Y-%m-%d'),
-                    'next_event': next_event,
-                    'next_event_at_utc': next_event_at_utc,
-                    'next_event_ist': next_event_ist,
-                    'is_trading_day': is_trading_day,
-                    'notify_open': market.notify_open,
-                    'notify_close': market.notify_close,
-                    'sound_enabled': market.sound_enabled
-                })
-                
-            except Exception as e:
-                # Skip this market if there's an error processing it
+                values = parse_entry(item if isinstance(item, dict) else {})
+            except ValueError as e:
+                errors.append({"index": i, "error": str(e)})
                 continue
+            parsed[(values['exchange_code'], values['holiday_date'])] = values
+        if errors:
+            return jsonify({"error": "Invalid rows, nothing imported", "rows": errors}), 400
+        
+        existing = {(r.exchange_code, r.holiday_date): r for r in MarketHoliday.query.filter(
+            MarketHoliday.user_id == 0,
+            MarketHoliday.exchange_code.in_({k[0] for k in parsed}),
+            MarketHoliday.holiday_date.in_({k[1] for k in parsed})).all()}
+        created = updated = 0
+        for key, values in parsed.items():
+            row = existing.get(key)
+            if row is None:
+                db.session.add(MarketHoliday(user_id=0, **values))
+                created += 1
+            else:
+                for field, value in values.items():
+                    setattr(row, field, value)
+                updated += 1
+        db.session.commit()
+        http_cache.bump(MARKET_HOLIDAYS_SEQ)
         
-        return jsonify(simple_markets)
+        return jsonify({"message": "Holidays imported", "created": created, "updated": updated})
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+def api_delete_market_holiday(holiday_id):
+    """Delete one holiday / special session"""
+    try:
+        row = MarketHoliday.query.filter_by(id=holiday_id, user_id=0).first()
+        if not row:
+            return jsonify({"error": "Holiday not found"}), 404
+        db.session.delete(row)
+        db.session.commit()
+        http_cache.bump(MARKET_HOLIDAYS_SEQ)
+        return jsonify({"message": "Holiday deleted successfully"})
     
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
@@ -436,6 +457,7 @@ def api_initialize_default_markets():
             created_markets.append(market_data['market_name'])
         
         db.session.commit()
+        http_cache.bump(MARKET_TIMES_SEQ)
         
         return jsonify({
             "message": "Default markets initialized successfully",
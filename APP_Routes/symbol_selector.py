@@ -1,9 +1,18 @@
 # symbol_selector.py
 
 from flask import Blueprint, request, jsonify
-import requests, csv, datetime
-from io import StringIO
-from models import BrokerSettings  # for retrieving tokens
+import datetime
+from APP_Extensions.fyers_clients import fyers_clients  # for retrieving tokens
+from APP_Extensions.symbol_master import symbol_master, SYM_DETAILS_URL, IST, PREFIX_FILES
+from APP_Extensions.symbol_search import symbol_search
+from APP_Extensions.expiry_calendar import expiry_calendar, CALENDAR_FILES, CALENDAR_SEQ
+from APP_Extensions.market_warmup import market_warmup
+from APP_Extensions.http_client import http_client
+from APP_Extensions import http_cache
+
+# Keep the search index and expiry calendar in step with the master
+symbol_master.on_reload(symbol_search.rebuild)
+symbol_master.on_reload(expiry_calendar.rebuild)
 
 
 symbol_selector_bp = Blueprint('symbol_selector', __name__)
@@ -21,38 +30,48 @@ def get_expiry_dates():
     if sym not in allowed:
         return jsonify({"expiry_list": []})
 
-    csv_url = ("https://public.fyers.in/sym_details/BSE_FO.csv"
-               if sym in {"SENSEX", "BANKEX"}
-               else "https://public.fyers.in/sym_details/NSE_FO.csv")
-
-    resp = requests.get(csv_url)
-    if resp.status_code != 200:
-        return jsonify({"error": f"Could not fetch CSV from {csv_url}"}), 500
-
-    unique = set()
-    for row in csv.reader(StringIO(resp.text)):
-        if len(row) < 2:
-            continue
-        desc = row[1].strip()
-        if desc.startswith(sym + " "):
-            parts = desc.split()
-            if len(parts) >= 4:
-                y, m, d = parts[1:4]
-                try:
-                    dt = datetime.date(2000+int(y),
-                                       datetime.datetime.strptime(m, '%b').month,
-                                       int(d))
-                    unique.add(dt.strftime('%d-%b-%y').upper())
-                except ValueError:
-                    continue
-
-    expiry_list = sorted(unique,
-                         key=lambda s: datetime.datetime.strptime(s, "%d-%b-%y"))
-    return jsonify({"expiry_list": expiry_list})
+    name = "BSE_FO" if sym in {"SENSEX", "BANKEX"} else "NSE_FO"
+    try:
+        _calendar_file(name)
+        return jsonify({"expiry_list": expiry_calendar.labels(name, sym)})
+    except Exception:
+        return jsonify({"error": f"Could not fetch CSV from {SYM_DETAILS_URL.format(name)}"}), 500
 
 # ---------------------------------------------------------
 #  /othersymbolexpiry  — NON-index symbols
 # ---------------------------------------------------------
+EXPIRY_FILES = {
+    "NSE":  "NSE_FO",
+    "BSE":  "BSE_FO",
+    "MCX":  "MCX_COM",
+    "Crypto": "NSE_CD",
+    "NSE–Commodity": "NSE_COM"
+}
+
+def _calendar_file(name):
+    """Load *name* into the master and make sure its calendar is built"""
+    sym_file = symbol_master.file(name)
+    if not expiry_calendar.loaded(name):
+        expiry_calendar.rebuild(sym_file)
+    return sym_file
+
+def _warm_symbol_files(exchange, _symbols):
+    """Every symbol master file an exchange's tickers resolve to"""
+    names = PREFIX_FILES.get(exchange, ())
+    for name in names:
+        symbol_master.file(name)
+    return len(names)
+
+def _warm_expiry_calendars(exchange, _symbols):
+    """Calendars of the exchange's derivatives files (normally built on reload)"""
+    names = [n for n in PREFIX_FILES.get(exchange, ()) if n in CALENDAR_FILES.values()]
+    for name in names:
+        _calendar_file(name)
+    return len(names)
+
+market_warmup.step("symbol_master", _warm_symbol_files, order=10)
+market_warmup.step("expiry_calendars", _warm_expiry_calendars, order=20)
+
 @symbol_selector_bp.route('/othersymbolexpiry')
 def othersymbolexpiry():
     exchange = request.args.get('exchange', '').strip()
@@ -60,80 +79,139 @@ def othersymbolexpiry():
     if not exchange or not sym:
         return jsonify({"error": "Missing exchange and/or symbol parameter"}), 400
 
-    url_map = {
-        "NSE":  "https://public.fyers.in/sym_details/NSE_FO.csv",
-        "BSE":  "https://public.fyers.in/sym_details/BSE_FO.csv",
-        "MCX":  "https://public.fyers.in/sym_details/MCX_COM.csv",
-        "Crypto": "https://public.fyers.in/sym_details/NSE_CD.csv",
-        "NSE–Commodity": "https://public.fyers.in/sym_details/NSE_COM.csv"
-    }
-    csv_url = url_map.get(exchange)
-    if not csv_url:
+    name = EXPIRY_FILES.get(exchange)
+    if not name:
         return jsonify({"error": "Invalid exchange provided"}), 400
 
-    resp = requests.get(csv_url)
-    if resp.status_code != 200:
-        return jsonify({"error": f"Could not fetch CSV from {csv_url}"}), 500
-
-    unique = set()
-    for row in csv.reader(StringIO(resp.text)):
-        if len(row) < 2:  # need description column
-            continue
-        desc = row[1].strip()
-        if desc.startswith(sym + " "):
-            parts = desc.split()
-            if len(parts) >= 4:
-                y, m, d = parts[1:4]
-                try:
-                    dt = datetime.date(2000+int(y),
-                                       datetime.datetime.strptime(m, '%b').month,
-                                       int(d))
-                    unique.add(dt.strftime('%d-%b-%y').upper())
-                except ValueError:
-                    continue
-
-    expiry_list = sorted(unique,
-                         key=lambda s: datetime.datetime.strptime(s, "%d-%b-%y"))
-    return jsonify({"expiry_list": expiry_list})
+    try:
+        _calendar_file(name)
+        return jsonify({"expiry_list": expiry_calendar.labels(name, sym)})
+    except Exception:
+        return jsonify({"error": f"Could not fetch CSV from {SYM_DETAILS_URL.format(name)}"}), 500
+
+# ---------------------------------------------------------
+#  /expiry_calendar  — upcoming expiries of many underlyings at once
+# ---------------------------------------------------------
+@symbol_selector_bp.route('/expiry_calendar')
+def get_expiry_calendar():
+    """
+    ?exchange=NSE,BSE (default all)  &underlyings=SBIN,NIFTY (default all)
+    &next=N (upcoming expiries per underlying)  &kind=option|future
+    """
+    exchanges = [e.strip() for e in request.args.get('exchange', '').split(',') if e.strip()]
+    underlyings = [u.strip().upper() for u in request.args.get('underlyings', '').split(',') if u.strip()]
+    kind = request.args.get('kind', '').strip().lower() or None
+    try:
+        upcoming = int(request.args.get('next', 0)) or None
+    except ValueError:
+        return jsonify({"error": "next must be an integer"}), 400
+    if kind not in (None, 'option', 'future'):
+        return jsonify({"error": "kind must be 'option' or 'future'"}), 400
+    unknown = [e for e in exchanges if e not in CALENDAR_FILES]
+    if unknown:
+        return jsonify({"error": f"Invalid exchange provided: {', '.join(unknown)}"}), 400
+
+    names = [CALENDAR_FILES[e] for e in exchanges or CALENDAR_FILES]
+    errors = {}
+    for name in names:
+        try:
+            _calendar_file(name)
+        except Exception as e:
+            errors[name] = str(e)
+    if len(errors) == len(names):
+        return jsonify({"error": "Symbol master unavailable", "details": errors}), 503
+
+    # Days-to-expiry move at midnight, everything else with the calendar sequence
+    today = datetime.datetime.now(IST).date()
+    seq, modified = http_cache.sequence(CALENDAR_SEQ)
+    tag = http_cache.etag_for("expiry-calendar", seq, today.isoformat(),
+                              ",".join(names), ",".join(underlyings), upcoming or 0, kind or "")
+
+    def build():
+        calendars = expiry_calendar.query([n for n in names if n not in errors],
+                                          underlyings, upcoming, kind, today)
+        return {"as_of": today.isoformat(), "calendars": calendars,
+                **({"unavailable": errors} if errors else {})}
+
+    if errors:
+        return jsonify(build())
+    return http_cache.conditional_json(tag, build, last_modified=modified)
 
 # ---------------------------------------------------------
 #  Symbol-loader endpoints used by JS
 # ---------------------------------------------------------
 @symbol_selector_bp.route('/get_nse_symbols')
 def get_nse_symbols():
-    return _symbol_list('https://public.fyers.in/sym_details/NSE_FO.csv',
+    return _symbol_list('NSE_FO',
                         exclude={"NIFFTY", "NIFTYNXT50", "BANKNIFTY",
                                  "MIDCPNIFTY", "FINNIFTY"})
 
 @symbol_selector_bp.route('/get_bse_symbols')
 def get_bse_symbols():
-    return _symbol_list('https://public.fyers.in/sym_details/BSE_FO.csv',
-                        exclude={"SENSEX", "BANKEX"})
+    return _symbol_list('BSE_FO', exclude={"SENSEX", "BANKEX"})
 
 @symbol_selector_bp.route('/get_mcx_symbols')
 def get_mcx_symbols():
-    return _symbol_list('https://public.fyers.in/sym_details/MCX_COM.csv')
+    return _symbol_list('MCX_COM')
 
 @symbol_selector_bp.route('/get_crypto_symbols')
 def get_crypto_symbols():
-    return _symbol_list('https://public.fyers.in/sym_details/NSE_CD.csv')
+    return _symbol_list('NSE_CD')
 
 @symbol_selector_bp.route('/get_NSE_Commodity_symbols')
 def get_NSE_Commodity_symbols():
-    return _symbol_list('https://public.fyers.in/sym_details/NSE_COM.csv')
+    return _symbol_list('NSE_COM')
+
+@symbol_selector_bp.route('/symbol_master_status')
+def symbol_master_status():
+    return jsonify(symbol_master.status())
+
+# ---------------------------------------------------------
+#  /search_symbols  — ranked type-ahead over the symbol master
+# ---------------------------------------------------------
+SEARCH_FILES = {
+    "NSE": ("NSE_CM", "NSE_FO"),
+    "BSE": ("BSE_CM", "BSE_FO"),
+    "MCX": ("MCX_COM",),
+    "Crypto": ("NSE_CD",),
+    "NSE Commodity": ("NSE_COM",)
+}
+DEFAULT_SEARCH_EXCHANGES = ("NSE", "BSE", "MCX")
+SEARCH_LIMIT_MAX = 100
+
+@symbol_selector_bp.route('/search_symbols')
+def search_symbols():
+    query = request.args.get('q', '').strip()
+    exchange = request.args.get('exchange', '').strip()
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), SEARCH_LIMIT_MAX))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    if exchange and exchange not in SEARCH_FILES:
+        return jsonify({"error": "Invalid exchange provided"}), 400
+
+    exchanges = (exchange,) if exchange else DEFAULT_SEARCH_EXCHANGES
+    files, errors = [], {}
+    for name in (n for ex in exchanges for n in SEARCH_FILES[ex]):
+        try:
+            files.append(symbol_master.file(name))
+        except Exception as e:
+            errors[name] = str(e)
+    if not files:
+        return jsonify({"error": "Symbol master unavailable", "details": errors}), 503
+
+    results = symbol_search.search(query, files, limit)
+    return jsonify({"query": query, "results": results, "count": len(results),
+                    **({"unavailable": errors} if errors else {})})
 
 # ---------------------------------------------------------
 #  Helper
 # ---------------------------------------------------------
-def _symbol_list(url, exclude=None):
-    exclude = exclude or set()
+def _symbol_list(name, exclude=None):
     try:
-        resp = requests.get(url); resp.raise_for_status()
-        symbols = sorted({row[13].strip() for row in
-                          csv.reader(StringIO(resp.text))
-                          if len(row) > 13 and row[13].strip()
-                          and row[13].strip() not in exclude})
-        return jsonify({"symbols": symbols})
+        return jsonify({"symbols": symbol_master.file(name).symbols(exclude or ())})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -144,14 +222,14 @@ def get_option_chain():
     if not symbol or not expiry:
         return jsonify({"error": "Missing symbol and/or expiry"}), 400
 
-    # retrieve access_token for FYERS (user_id=0)
-    row = BrokerSettings.query.filter_by(user_id=0, brokername='fyers').first()
-    if not row or not row.access_token:
+    # retrieve access_token for FYERS from the client registry (least-loaded account)
+    account = fyers_clients.pick()
+    if not account or not account.access_token:
         return jsonify({"error": "No FYERS token stored"}), 403
 
     url = "https://api.fyers.in/api/v3/options-chain"
     headers = {
-        "Authorization": f"Bearer {row.access_token}",
+        "Authorization": f"Bearer {account.access_token}",
         "Content-Type": "application/json"
     }
     payload = {
@@ -160,7 +238,7 @@ def get_option_chain():
         "strikeWidth": 100,      # adjust as needed
         "range": 10              # number of strikes above/below ATM
     }
-    resp = requests.post(url, json=payload, headers=headers, timeout=10)
+    resp = http_client.post(url, json=payload, headers=headers, timeout=10, idempotent=True)
     if resp.status_code != 200:
         return jsonify({"error": "FYERS API error", "details": resp.text}), 502
 
@@ -180,169 +258,176 @@ def lookup_symbol_and_lot_size():
         return jsonify({"error": "Missing type and/or symbol parameter"}), 400
     
     if selection_type == 'index':
-        return _lookup_index_symbol(symbol)
+        try:
+            result = _resolve_index(symbol)
+        except Exception as e:
+            return jsonify({"error": f"Failed to fetch lot size: {str(e)}"}), 500
     elif selection_type == 'exchange':
         if not exchange:
             return jsonify({"error": "Missing exchange parameter for exchange type"}), 400
-        return _lookup_exchange_symbol(exchange, symbol)
+        if exchange not in EXCHANGE_FILES:
+            return jsonify({"error": "Invalid exchange provided"}), 400
+        try:
+            result = _resolve_exchange(exchange, symbol)
+        except Exception as e:
+            return jsonify({"error": f"Failed to lookup symbol: {str(e)}"}), 500
     else:
         return jsonify({"error": "Invalid type. Use 'index' or 'exchange'"}), 400
 
-def _lookup_index_symbol(symbol):
-    """Lookup index symbols like NIFTY 50, BANK NIFTY, etc."""
-    # Index symbol mapping - normalize input for matching
-    symbol_normalized = symbol.upper().replace(" ", "").replace("NIFTY", "NIFTY")
-    
-    index_symbols = {
-        "NIFTY": "NSE:NIFTY50-INDEX",  # Handle "NIFTY" from frontend
-        "NIFTY50": "NSE:NIFTY50-INDEX",
-        "NIFTYNEXT50": "NSE:NIFTYNXT50-INDEX",
-        "BANKNIFTY": "NSE:NIFTYBANK-INDEX", 
-        "FINNIFTY": "NSE:FINNIFTY-INDEX",
-        "MIDCPNIFTY": "NSE:NIFTYMIDCAP-INDEX",
-        "SENSEX": "BSE:SENSEX-INDEX",
-        "BANKEX": "BSE:BANKEX-INDEX"
-    }
-    
-    # First check direct mapping
-    if symbol_normalized in index_symbols:
-        symbol_code = index_symbols[symbol_normalized]
-        exchange_code = "BSE" if symbol_normalized in {"SENSEX", "BANKEX"} else "NSE"
-        csv_url = f"https://public.fyers.in/sym_details/{exchange_code}_FO.csv" if exchange_code == "NSE" else "https://public.fyers.in/sym_details/BSE_FO.csv"
-        
-        # Get lot size from derivatives CSV
+    if not result:
+        return jsonify({"found": False, "error": "Index symbol not found"})
+    return jsonify({"symbol_code": result["symbol_code"],
+                    "lot_size": str(result["lot_size"]),
+                    "found": True})
+
+# ---------------------------------------------------------
+#  /resolve_instruments  — batch lookup for multi-leg strategies
+# ---------------------------------------------------------
+RESOLVE_MAX_ITEMS = 500
+
+@symbol_selector_bp.route('/resolve_instruments', methods=['POST'])
+def resolve_instruments():
+    """
+    Body: {"items": ["NSE:NIFTY25AUG24000CE", "NIFTY",
+                     {"type": "exchange", "exchange": "NSE", "symbol": "SBIN"}, ...]}
+    Strings are full tickers, or index names when they carry no exchange
+    prefix.  Results come back in request order.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > RESOLVE_MAX_ITEMS:
+        return jsonify({"error": f"At most {RESOLVE_MAX_ITEMS} items per request"}), 400
+
+    results = []
+    for item in items:
         try:
-            resp = requests.get(csv_url)
-            resp.raise_for_status()
-            
-            # Look for the index symbol in derivatives to get lot size
-            symbol_lookup = symbol_normalized.replace("NIFTY", "NIFTY").replace("50", "")
-            if symbol_lookup == "NIFTY":
-                symbol_lookup = "NIFTY"
-            elif symbol_lookup == "BANKNIFTY":
-                symbol_lookup = "BANKNIFTY"
-            
-            for row in csv.reader(StringIO(resp.text)):
-                if len(row) >= 14 and symbol_lookup in row[13].strip().upper():
-                    lot_size = row[3] if len(row) > 3 else "1"  # Column 3 has lot size
-                    return jsonify({
-                        "symbol_code": symbol_code,
-                        "lot_size": lot_size,
-                        "found": True
-                    })
-                    
-            # Default lot size for indices
-            default_lots = {"NIFTY": "75", "NIFTY50": "75", "BANKNIFTY": "15", "FINNIFTY": "25", 
-                          "MIDCPNIFTY": "50", "SENSEX": "20", "BANKEX": "15"}
-            
-            return jsonify({
-                "symbol_code": symbol_code,
-                "lot_size": default_lots.get(symbol_normalized, "1"),
-                "found": True
-            })
-            
+            result = _resolve_item(item)
+        except ValueError as e:
+            result = {"found": False, "error": str(e)}
         except Exception as e:
-            return jsonify({"error": f"Failed to fetch lot size: {str(e)}"}), 500
-    
-    return jsonify({"found": False, "error": "Index symbol not found"})
-
-def _lookup_exchange_symbol(exchange, symbol):
-    """Lookup exchange symbols and get lot size"""
-    url_map = {
-        "NSE": "https://public.fyers.in/sym_details/NSE_CM.csv",
-        "BSE": "https://public.fyers.in/sym_details/BSE_CM.csv", 
-        "MCX": "https://public.fyers.in/sym_details/MCX_COM.csv",
-        "Crypto": "https://public.fyers.in/sym_details/NSE_CD.csv",
-        "NSE Commodity": "https://public.fyers.in/sym_details/NSE_COM.csv"
-    }
-    
-    csv_url = url_map.get(exchange)
-    if not csv_url:
-        return jsonify({"error": "Invalid exchange provided"}), 400
-    
+            result = {"found": False, "error": f"Symbol master unavailable: {e}"}
+        results.append({"input": item, **(result or {"found": False, "error": "Not found"})})
+    return jsonify({"results": results,
+                    "resolved": sum(1 for r in results if r.get("found"))})
+
+def _resolve_item(item):
+    if isinstance(item, str):
+        item = {"symbol": item}
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be a string or an object")
+    symbol = str(item.get('symbol', '')).upper().strip()
+    if not symbol:
+        raise ValueError("Missing symbol")
+    selection_type = item.get('type') or ('symbol' if ':' in symbol else 'index')
+
+    if selection_type == 'symbol':
+        inst = symbol_master.resolve(symbol)
+        return _found(symbol, inst) if inst else None
+    if selection_type == 'index':
+        return _resolve_index(symbol)
+    if selection_type == 'exchange':
+        exchange = str(item.get('exchange', '')).strip()
+        if exchange not in EXCHANGE_FILES:
+            raise ValueError("Invalid exchange provided")
+        return _resolve_exchange(exchange, symbol)
+    raise ValueError("Invalid type. Use 'symbol', 'index' or 'exchange'")
+
+def _found(symbol_code, inst=None, lot_size=None):
+    """Uniform resolver result; contract details come from the master when known"""
+    result = inst.spec() if inst else {}
+    result.update({"symbol_code": symbol_code, "found": True,
+                   "lot_size": lot_size or result.get("lot_size") or 1})
+    return result
+
+# Index name as typed in the UI → underlying column of the FO file
+INDEX_UNDERLYINGS = {
+    "NIFTY": "NIFTY", "NIFTY50": "NIFTY", "NIFTYNEXT50": "NIFTYNXT50",
+    "BANKNIFTY": "BANKNIFTY", "FINNIFTY": "FINNIFTY", "MIDCPNIFTY": "MIDCPNIFTY",
+    "SENSEX": "SENSEX", "BANKEX": "BANKEX"
+}
+
+INDEX_SYMBOLS = {
+    "NIFTY": "NSE:NIFTY50-INDEX",  # Handle "NIFTY" from frontend
+    "NIFTY50": "NSE:NIFTY50-INDEX",
+    "NIFTYNEXT50": "NSE:NIFTYNXT50-INDEX",
+    "BANKNIFTY": "NSE:NIFTYBANK-INDEX", 
+    "FINNIFTY": "NSE:FINNIFTY-INDEX",
+    "MIDCPNIFTY": "NSE:NIFTYMIDCAP-INDEX",
+    "SENSEX": "BSE:SENSEX-INDEX",
+    "BANKEX": "BSE:BANKEX-INDEX"
+}
+
+# Default lot size for indices
+DEFAULT_INDEX_LOTS = {"NIFTY": 75, "NIFTY50": 75, "BANKNIFTY": 15, "FINNIFTY": 25,
+                      "MIDCPNIFTY": 50, "SENSEX": 20, "BANKEX": 15}
+
+def _resolve_index(symbol):
+    """Index symbols like NIFTY 50, BANK NIFTY, etc. (None when unknown)"""
+    # Normalize input for matching
+    symbol_normalized = symbol.upper().replace(" ", "")
+    symbol_code = INDEX_SYMBOLS.get(symbol_normalized)
+    if not symbol_code:
+        return None
+
+    # Lot size from the derivatives master
+    name = "BSE_FO" if symbol_normalized in {"SENSEX", "BANKEX"} else "NSE_FO"
+    lot_size = symbol_master.file(name).lot_size(INDEX_UNDERLYINGS[symbol_normalized])
+    cash_file = "BSE_CM" if name == "BSE_FO" else "NSE_CM"
     try:
-        resp = requests.get(csv_url)
-        resp.raise_for_status()
-        
-        # Generate symbol codes based on exchange
-        symbol_code = ""
-        if exchange == "NSE":
-            symbol_code = f"NSE:{symbol}-EQ"
-        elif exchange == "BSE":
-            symbol_code = f"BSE:{symbol}-A"
-        elif exchange == "MCX":
-            # For MCX, find current month expiry
-            now = datetime.datetime.now()
-            month = now.strftime("%b").upper()
-            year = str(now.year)[-2:]
-            symbol_code = f"MCX:{symbol}{year}{month}FUT"
-        elif exchange == "Crypto":
-            # For NSE Currency derivatives, find current month expiry
-            now = datetime.datetime.now()
-            month = now.strftime("%b").upper()
-            year = str(now.year)[-2:]
-            symbol_code = f"NSE:{symbol}{year}{month}FUT"
-        elif exchange == "NSE Commodity":
-            # For NSE Commodity, find current month expiry
+        inst = symbol_master.file(cash_file).instrument(symbol_code)
+    except Exception:
+        inst = None                     # the index row only adds tick size
+    return _found(symbol_code, inst, lot_size or DEFAULT_INDEX_LOTS.get(symbol_normalized, 1))
+
+# Exchange as shown in the UI → its sym_details file
+EXCHANGE_FILES = {
+    "NSE": "NSE_CM",
+    "BSE": "BSE_CM", 
+    "MCX": "MCX_COM",
+    "Crypto": "NSE_CD",
+    "NSE Commodity": "NSE_COM"
+}
+
+def _resolve_exchange(exchange, symbol):
+    """Exchange symbols with their lot size"""
+    name = EXCHANGE_FILES[exchange]
+    inst = None
+
+    # Generate symbol codes based on exchange
+    if exchange == "NSE":
+        symbol_code = f"NSE:{symbol}-EQ"
+    elif exchange == "BSE":
+        symbol_code = f"BSE:{symbol}-A"
+    else:
+        # Futures exchanges: nearest live future of the underlying, else
+        # the current-month code
+        inst = _nearest_future(symbol_master.file(name), symbol)
+        if inst:
+            symbol_code = inst.symbol
+        else:
             now = datetime.datetime.now()
             month = now.strftime("%b").upper()
             year = str(now.year)[-2:]
-            symbol_code = f"NSE:{symbol}{year}{month}FUT"
-        else:
-            symbol_code = f"{exchange}:{symbol}"
-        
-        # For NSE and BSE equity derivatives, we need to look in their respective FO.csv files for lot size
-        if exchange == "NSE":
-            # Use NSE_FO.csv for NSE equity derivatives lot size
-            deriv_resp = requests.get("https://public.fyers.in/sym_details/NSE_FO.csv")
-            deriv_resp.raise_for_status()
-            
-            # Extract base symbol from the symbol (e.g., SBIN from SBIN-EQ)
-            base_symbol = symbol.split('-')[0] if '-' in symbol else symbol
-            
-            for row in csv.reader(StringIO(deriv_resp.text)):
-                if len(row) >= 14 and row[13].strip().upper() == base_symbol:
-                    # Column 3 (index 3) has lot size according to your example
-                    lot_size = row[3] if len(row) > 3 and row[3].strip() else "1"
-                    return jsonify({
-                        "symbol_code": symbol_code,
-                        "lot_size": lot_size,
-                        "found": True
-                    })
-        elif exchange == "BSE":
-            # Use BSE_FO.csv for BSE equity derivatives lot size
-            deriv_resp = requests.get("https://public.fyers.in/sym_details/BSE_FO.csv")
-            deriv_resp.raise_for_status()
-            
-            # Extract base symbol from the symbol (e.g., HDFCBANK from HDFCBANK-A)
-            base_symbol = symbol.split('-')[0] if '-' in symbol else symbol
-            
-            for row in csv.reader(StringIO(deriv_resp.text)):
-                if len(row) >= 14 and row[13].strip().upper() == base_symbol:
-                    # Column 3 (index 3) has lot size
-                    lot_size = row[3] if len(row) > 3 and row[3].strip() else "1"
-                    return jsonify({
-                        "symbol_code": symbol_code,
-                        "lot_size": lot_size,
-                        "found": True
-                    })
-        
-        # For other exchanges (MCX, Crypto, NSE Commodity), find lot size from their respective CSV files
-        for row in csv.reader(StringIO(resp.text)):
-            if len(row) >= 14 and row[13].strip().upper() == symbol:
-                lot_size = row[3] if len(row) > 3 and row[3].strip() else "1"  # Column 3 has lot size
-                return jsonify({
-                    "symbol_code": symbol_code,
-                    "lot_size": lot_size,
-                    "found": True
-                })
-        
-        # Default lot size if not found
-        return jsonify({
-            "symbol_code": symbol_code,
-            "lot_size": "1",
-            "found": True
-        })
-        
-    except Exception as e:
-        return jsonify({"error": f"Failed to lookup symbol: {str(e)}"}), 500
+            prefix = "MCX" if exchange == "MCX" else "NSE"
+            symbol_code = f"{prefix}:{symbol}{year}{month}FUT"
+
+    # NSE and BSE equities take their lot size from the FO files
+    # (e.g. SBIN from SBIN-EQ); other exchanges from their own file
+    base_symbol = symbol.split('-')[0] if '-' in symbol else symbol
+    if exchange in ("NSE", "BSE"):
+        lot_size = symbol_master.file(f"{exchange}_FO").lot_size(base_symbol)
+        try:
+            inst = symbol_master.file(name).instrument(symbol_code)
+        except Exception:
+            inst = None
+    else:
+        lot_size = inst.lot_size if inst else symbol_master.file(name).lot_size(symbol)
+    return _found(symbol_code, inst, lot_size)
+
+def _nearest_future(sym_file, underlying):
+    now = datetime.datetime.now().timestamp()
+    futures = [sym_file.instruments[i] for i in sym_file.by_underlying.get(underlying, ())]
+    futures = [f for f in futures if f.kind == "future" and f.expiry_ts >= now]
+    return min(futures, key=lambda f: f.expiry_ts) if futures else None
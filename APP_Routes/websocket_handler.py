@@ -1,44 +1,73 @@
 """
 WebSocket handler for live option chain data
 """
-from fyers_apiv3 import fyersModel
-from fyers_apiv3.FyersWebsocket import data_ws
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, session, g, has_request_context
 import logging
 import json
+import os
 import threading
+import time
+import uuid
 from datetime import datetime
 import pytz
 from app import db
-from models import BrokerSettings
+from APP_Extensions import http_cache
+from APP_Extensions.fyers_clients import fyers_clients, AUTH_ERROR_CODES
+from APP_Extensions.market_data import (get_market_client, market_accounts, open_market_socket,
+                                         MARKET_DATA_PROVIDER)
+from APP_Extensions.symbol_master import symbol_master
+from APP_Extensions.market_scheduler import market_scheduler, exchange_of
+from APP_Extensions.market_warmup import market_warmup
+from APP_Extensions import chain_skeleton
+from APP_Extensions.quote_table import QuoteTable, QuoteView, TABLE_NAME
+from APP_Extensions.feed_channel import FeedServer, FeedClient, FeedUnavailable
+from APP_Extensions.subscription_book import SubscriptionBook
+from APP_Extensions.atm_window import atm_windows
+from APP_Extensions.quote_batcher import QuoteBatcher
+from APP_Extensions.chain_diff import chain_diffs
 
 websocket_bp = Blueprint('websocket', __name__)
 
-# Global WebSocket instance
+# Global WebSocket instances: one socket per account, each streaming a
+# shard of the subscriptions (fyers_ws is the first, kept for callers).
+# current_subscriptions is the union of what every browser session watches
+# (subscription_book); /live_market_data answers each session with its own.
+# Symbols of a closed exchange stay in current_subscriptions but are not
+# streamed until the market scheduler reports its warm-up.
 fyers_ws = None
+fyers_sockets = {}          # account id → FyersDataSocket
+socket_shards = {}          # account id → symbols it streams
 current_subscriptions = []
+paused_subscriptions = []
 live_market_data = {}
+_socket_lock = threading.RLock()
+subscription_book = SubscriptionBook()
+SESSION_SWEEP_SECONDS = 60
 
-def get_fyers_client():
-    """Get FYERS client with access token"""
-    try:
-        broker_row = BrokerSettings.query.filter_by(brokername='fyers').first()
-        if not broker_row or not broker_row.access_token:
-            return None, "No FYERS access token found"
-            
-        access_token = broker_row.access_token
-        client_id = broker_row.clientid
-        
-        fyers = fyersModel.FyersModel(
-            client_id=client_id, 
-            token=access_token, 
-            is_async=False, 
-            log_path=""
-        )
-        
-        return fyers, None
-    except Exception as e:
-        return None, str(e)
+# MARKET_FEED: "local" - this process owns the sockets (single worker);
+# "feed" - the feed process (feed.py), also publishing every tick into the
+# shared quote table; "shared" - a web worker reading that table and sending
+# subscription commands to the feed process
+FEED_MODE = os.environ.get("MARKET_FEED", "local").strip().lower()
+quote_table = None
+feed_client = None
+if FEED_MODE == "shared":
+    live_market_data = QuoteView()
+    feed_client = FeedClient()
+
+# Option chain polls (VOL/OI timer runs every 3s) inside this window reuse
+# the last upstream answer
+CHAIN_TTL_SECONDS = 2
+_chain_cache = http_cache.VersionedCache(ttl=CHAIN_TTL_SECONDS)
+# ?since=<chain_version> polls get only the cells that changed (chain_diffs)
+
+# fyers.quotes accepts at most this many symbols per call
+QUOTES_BATCH_SIZE = 50
+# fyers.optionchain strikecount limit (the 'ALL' choice)
+UPSTREAM_MAX_STRIKES = 100
+
+# /get_spot_price polls from every client share batched quotes calls
+quote_batcher = QuoteBatcher(lambda symbols: _quote_batch(symbols))
 
 @websocket_bp.route('/get_spot_price', methods=['GET'])
 def get_spot_price():
@@ -48,27 +77,50 @@ def get_spot_price():
         if not symbol:
             return jsonify({"error": "Symbol parameter required"}), 400
             
-        fyers, error = get_fyers_client()
-        if error:
-            return jsonify({"error": error}), 500
-            
-        # Get spot price
-        spot_data = fyers.quotes({"symbols": symbol})
-        
-        if spot_data.get('s') == 'ok' and spot_data.get('d'):
-            spot_price = spot_data['d'][0]['v'].get('lp', 0)
-            return jsonify({
-                "success": True,
-                "symbol": symbol,
-                "spot_price": spot_price,
-                "timestamp": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat()
-            })
+        # Streaming symbols are answered from the socket's last tick;
+        # the rest share batched upstream quotes with concurrent pollers
+        live = _live_quote(symbol)
+        if live:
+            spot_price, source = live['ltp'], "live"
         else:
-            return jsonify({"error": "Failed to get spot price"}), 500
+            quote = quote_batcher.get(symbol)
+            if not quote:
+                return jsonify({"error": "Failed to get spot price"}), 500
+            spot_price, source = quote.get('lp', 0), "quotes"
+        
+        return jsonify({
+            "success": True,
+            "symbol": symbol,
+            "spot_price": spot_price,
+            "source": source,
+            "timestamp": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat()
+        })
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _live_quote(symbol):
+    """Last tick of *symbol* if the feed streams it"""
+    if FEED_MODE != "shared" and symbol not in current_subscriptions:
+        return None
+    quote = live_market_data.get(symbol)
+    return quote if quote and quote.get('ltp') else None
+
+def _quote_batch(symbols):
+    fyers, error = get_market_client()
+    if error:
+        raise RuntimeError(error)
+    return _fetch_quotes(fyers, symbols)
+
+def _strike_count(param):
+    # Handle "ALL" option - FYERS API supports up to 100 strikes
+    if param.upper() == 'ALL':
+        return UPSTREAM_MAX_STRIKES
+    try:
+        return int(param)
+    except ValueError:
+        return 15
+
 @websocket_bp.route('/ws_get_option_chain', methods=['GET'])
 def get_option_chain():
     """Get option chain data with WebSocket subscription using proper Fyers API v3"""
@@ -76,15 +128,11 @@ def get_option_chain():
         symbol = request.args.get('symbol', '')
         strike_count_param = request.args.get('strike_count', '15')
         expiry_timestamp = request.args.get('expiry_timestamp', '')
+        # 'upstream' = fyers optionchain (has OI), 'local' = ladder from the
+        # symbol master priced by batched quotes / the socket
+        source = request.args.get('source', 'upstream').strip().lower()
         
-        # Handle "ALL" option - FYERS API supports up to 100 strikes
-        if strike_count_param.upper() == 'ALL':
-            strike_count = 100
-        else:
-            try:
-                strike_count = int(strike_count_param)
-            except ValueError:
-                strike_count = 15
+        strike_count = _strike_count(strike_count_param)
         
         print(f"OPTION CHAIN REQUEST: symbol='{symbol}', strike_count={strike_count}, expiry='{expiry_timestamp}'")
         
@@ -92,18 +140,53 @@ def get_option_chain():
             print("ERROR: No symbol provided")
             return jsonify({"error": "Symbol parameter required"}), 400
         
-        # Get access token from database
-        broker_row = BrokerSettings.query.filter_by(brokername='fyers').first()
-        if not broker_row or not broker_row.access_token:
-            return jsonify({"error": "No FYERS access token found"}), 500
-            
-        access_token = broker_row.access_token
-        client_id = broker_row.clientid
+        if source not in ('upstream', 'local'):
+            return jsonify({"error": "source must be 'upstream' or 'local'"}), 400
+        
+        # Underlyings users open are warmed before the next session
+        market_warmup.watch(symbol)
+        
+        cache_key = (symbol, strike_count, expiry_timestamp, source)
+        if expiry_timestamp:
+            # Between the close and the open the last answer stays current
+            cached = _chain_cache.fresh(cache_key, market_scheduler.frozen(exchange_of(symbol)))
+            if cached:
+                # Another session's answer: this session still needs the strikes streamed
+                strike_list, _, atm_strike, upstream_expiry = cached.data
+                _stream_chain(cache_key, upstream_expiry, strike_list, atm_strike, as_of=cached.checked)
+                return _chain_answer(cached, cache_key)
+        
+        # Shared client from the registry (no DB access per poll)
+        fyers, error = get_market_client()
+        if error:
+            return jsonify({"error": error}), 500
         
         print(f"OPTION CHAIN: symbol={symbol}, strikes={strike_count}, expiry={expiry_timestamp}")
         
-        # Initialize FYERS model
-        fyers = fyersModel.FyersModel(client_id=client_id, token=access_token, is_async=False, log_path="")
+        # Get expiry data if no expiry provided - listed expiries come from
+        # the symbol master, upstream only for symbols it does not cover
+        if not expiry_timestamp:
+            expiries = _local_expiries(symbol)
+            if expiries:
+                expiry_data = [{"date": e.upstream_date, "expiry": str(e.timestamp)} for e in expiries]
+            else:
+                data = {"symbol": symbol, "strikecount": 1, "timestamp": ""}
+                response = fyers.optionchain(data=data)
+                if response.get('s') != 'ok':
+                    return jsonify({"error": f"Failed to get expiry data: {response.get('message', 'Unknown error')}"}), 500
+                expiry_data = [{"date": exp["date"], "expiry": exp["expiry"]}
+                               for exp in response.get('data', {}).get('expiryData', [])]
+            quotes = _fetch_quotes(fyers, [symbol])
+            return jsonify({
+                "success": True,
+                "expiry_data": expiry_data,
+                "strikes": [],
+                "spot_price": quotes.get(symbol, {}).get('lp', 0),
+                "message": "Select expiry to load option chain"
+            })
+        
+        if source == 'local':
+            return _local_option_chain(fyers, symbol, expiry_timestamp, strike_count, cache_key)
         
         # Get spot price
         spot_data = fyers.quotes({"symbols": symbol})
@@ -111,31 +194,23 @@ def get_option_chain():
         if spot_data.get('s') == 'ok' and spot_data.get('d'):
             spot_price = spot_data['d'][0]['v'].get('lp', 0)
         
-        # Get expiry data if no expiry provided
-        if not expiry_timestamp:
-            data = {"symbol": symbol, "strikecount": 1, "timestamp": ""}
-            response = fyers.optionchain(data=data)
-            
-            if response.get('s') == 'ok':
-                expiry_data = response.get('data', {}).get('expiryData', [])
-                return jsonify({
-                    "success": True,
-                    "expiry_data": [{"date": exp["date"], "expiry": exp["expiry"]} for exp in expiry_data],
-                    "strikes": [],
-                    "spot_price": spot_price,
-                    "message": "Select expiry to load option chain"
-                })
-            else:
-                return jsonify({"error": f"Failed to get expiry data: {response.get('message', 'Unknown error')}"}), 500
-        
         # Convert date format to timestamp if needed
         converted_timestamp = expiry_timestamp
         
-        # If expiry_timestamp looks like a date (contains letters), convert it
+        # If expiry_timestamp looks like a date (contains letters), convert it -
+        # from the symbol master when it lists the expiry, upstream otherwise
         if expiry_timestamp and any(c.isalpha() for c in expiry_timestamp):
             print(f"CONVERTING DATE FORMAT: {expiry_timestamp}")
-            
+            local = _local_expiry(symbol, expiry_timestamp)
+            if local:
+                converted_timestamp = str(local.timestamp)
+                print(f"FOUND MATCHING TIMESTAMP (symbol master): {local.upstream_date} -> {converted_timestamp}")
+            else:
+                converted_timestamp = None
+        
+        if converted_timestamp is None:
             # First get all expiry data to find the matching timestamp
+            converted_timestamp = expiry_timestamp
             data_for_expiry = {"symbol": symbol, "strikecount": 1, "timestamp": ""}
             expiry_response = fyers.optionchain(data=data_for_expiry)
             
@@ -144,7 +219,6 @@ def get_option_chain():
                 
                 # Convert "28-AUG-25" to "28-08-2025" format to match
                 try:
-                    from datetime import datetime
                     # Parse "28-AUG-25" format
                     date_obj = datetime.strptime(expiry_timestamp, "%d-%b-%y")
                     # Format as "28-08-2025"
@@ -198,64 +272,7 @@ def get_option_chain():
         # Calculate ATM strike
         atm_strike = min(options_list, key=lambda x: abs(x['strike_price'] - spot_price))['strike_price']
         
-        # Group by strike price
-        strikes = {}
-        symbols_to_subscribe = []
-        for option in options_list:
-            strike = option.get('strike_price', 0)
-            if strike <= 0:
-                continue
-                
-            if strike not in strikes:
-                strikes[strike] = {
-                    'strike': strike,
-                    'ce_ltp': 0,
-                    'pe_ltp': 0,
-                    'ce_symbol': '',
-                    'pe_symbol': '',
-                    'ce_oi': 0,
-                    'pe_oi': 0,
-                    'ce_volume': 0,
-                    'pe_volume': 0,
-                    'ce_oich': 0,
-                    'pe_oich': 0,
-                    'ce_bid': 0,
-                    'pe_bid': 0,
-                    'ce_ask': 0,
-                    'pe_ask': 0,
-                    'ce_bid_qty': 0,
-                    'pe_bid_qty': 0,
-                    'ce_ask_qty': 0,
-                    'pe_ask_qty': 0,
-                    'is_atm': strike == atm_strike
-                }
-                
-            if option.get('option_type') == 'CE':
-                strikes[strike]['ce_ltp'] = option.get('ltp', 0)
-                strikes[strike]['ce_symbol'] = option.get('symbol', '')
-                strikes[strike]['ce_oi'] = option.get('oi', 0)
-                strikes[strike]['ce_volume'] = option.get('volume', 0)
-                strikes[strike]['ce_oich'] = option.get('oich', 0)
-                strikes[strike]['ce_bid'] = option.get('bid', 0)
-                strikes[strike]['ce_ask'] = option.get('ask', 0)
-                strikes[strike]['ce_bid_qty'] = option.get('bid_qty', 0)
-                strikes[strike]['ce_ask_qty'] = option.get('ask_qty', 0)
-                if option.get('symbol'):
-                    symbols_to_subscribe.append(option.get('symbol'))
-            elif option.get('option_type') == 'PE':
-                strikes[strike]['pe_ltp'] = option.get('ltp', 0)
-                strikes[strike]['pe_symbol'] = option.get('symbol', '')
-                strikes[strike]['pe_oi'] = option.get('oi', 0)
-                strikes[strike]['pe_volume'] = option.get('volume', 0)
-                strikes[strike]['pe_oich'] = option.get('oich', 0)
-                strikes[strike]['pe_bid'] = option.get('bid', 0)
-                strikes[strike]['pe_ask'] = option.get('ask', 0)
-                strikes[strike]['pe_bid_qty'] = option.get('bid_qty', 0)
-                strikes[strike]['pe_ask_qty'] = option.get('ask_qty', 0)
-                if option.get('symbol'):
-                    symbols_to_subscribe.append(option.get('symbol'))
-        
-        strike_list = sorted(strikes.values(), key=lambda x: x['strike'])
+        strike_list, symbols_to_subscribe = _chain_rows(options_list, atm_strike)
         
         # Print final processed strikes data
         print(f"\n=== PROCESSED STRIKES DATA ===")
@@ -264,140 +281,549 @@ def get_option_chain():
         print(f"Symbols to subscribe: {len(symbols_to_subscribe)}")
         print(f"==============================\n")
         
-        # Start WebSocket subscription
-        start_websocket_subscription(symbols_to_subscribe)
+        # Start WebSocket subscription; spot ticks recentre the strike window
+        window_version = _stream_chain(cache_key, converted_timestamp, strike_list, atm_strike)
         
-        return jsonify({
+        # Sequence only advances when strikes/spot differ from the last fetch;
+        # the timestamp is the time this version of the data was first seen
+        entry = _chain_cache.store(
+            cache_key, (strike_list, spot_price, atm_strike, converted_timestamp),
+            lambda modified: {
+                "success": True,
+                "strikes": strike_list,
+                "total_strikes": len(strike_list),
+                "spot_price": spot_price,
+                "atm_strike": atm_strike,
+                "ws_subscribed": symbols_to_subscribe,
+                "window_version": window_version,
+                "chain_version": chain_diffs.record(cache_key, strike_list),
+                "timestamp": datetime.fromtimestamp(modified, pytz.timezone('Asia/Kolkata')).isoformat()
+            })
+        return _chain_answer(entry, cache_key)
+        
+    except Exception as e:
+        print(f"OPTION CHAIN ERROR: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def _chain_answer(entry, cache_key):
+    """
+    The cached chain, or with ?since=<chain_version> only what changed since
+    (&fields=ce_oi,pe_oi,... limits the compared row fields)
+    """
+    since = request.args.get('since')
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+    changes = chain_diffs.diff(cache_key, since, fields) if since is not None else None
+    if changes is None:
+        return _chain_cache.response(entry, "chain", *cache_key)
+    _, spot_price, atm_strike, _ = entry.data
+    return jsonify({"success": True, "since": since, **changes,
+                    "spot_price": spot_price, "atm_strike": atm_strike})
+
+def _chain_rows(options_list, atm_strike):
+    """Upstream optionsChain entries → (rows by strike, option symbols)"""
+    # Group by strike price
+    strikes = {}
+    symbols_to_subscribe = []
+    for option in options_list:
+        strike = option.get('strike_price', 0)
+        if strike <= 0:
+            continue
+            
+        if strike not in strikes:
+            strikes[strike] = chain_skeleton.empty_row(strike, strike == atm_strike)
+            
+        if option.get('option_type') == 'CE':
+            strikes[strike]['ce_ltp'] = option.get('ltp', 0)
+            strikes[strike]['ce_symbol'] = option.get('symbol', '')
+            strikes[strike]['ce_oi'] = option.get('oi', 0)
+            strikes[strike]['ce_volume'] = option.get('volume', 0)
+            strikes[strike]['ce_oich'] = option.get('oich', 0)
+            strikes[strike]['ce_bid'] = option.get('bid', 0)
+            strikes[strike]['ce_ask'] = option.get('ask', 0)
+            strikes[strike]['ce_bid_qty'] = option.get('bid_qty', 0)
+            strikes[strike]['ce_ask_qty'] = option.get('ask_qty', 0)
+            if option.get('symbol'):
+                symbols_to_subscribe.append(option.get('symbol'))
+        elif option.get('option_type') == 'PE':
+            strikes[strike]['pe_ltp'] = option.get('ltp', 0)
+            strikes[strike]['pe_symbol'] = option.get('symbol', '')
+            strikes[strike]['pe_oi'] = option.get('oi', 0)
+            strikes[strike]['pe_volume'] = option.get('volume', 0)
+            strikes[strike]['pe_oich'] = option.get('oich', 0)
+            strikes[strike]['pe_bid'] = option.get('bid', 0)
+            strikes[strike]['pe_ask'] = option.get('ask', 0)
+            strikes[strike]['pe_bid_qty'] = option.get('bid_qty', 0)
+            strikes[strike]['pe_ask_qty'] = option.get('ask_qty', 0)
+            if option.get('symbol'):
+                symbols_to_subscribe.append(option.get('symbol'))
+    
+    strike_list = sorted(strikes.values(), key=lambda x: x['strike'])
+    return strike_list, symbols_to_subscribe
+
+def _row_symbols(strike_list):
+    return [row[f'{side}_symbol'] for row in strike_list for side in ('ce', 'pe') if row.get(f'{side}_symbol')]
+
+def _local_expiries(symbol):
+    """Listed option expiries from the symbol master ([] if it cannot tell)"""
+    try:
+        return chain_skeleton.option_expiries(symbol_master, symbol)
+    except Exception as e:
+        print(f"SYMBOL MASTER expiry lookup failed for {symbol}: {e}")
+        return []
+
+def _local_expiry(symbol, expiry):
+    try:
+        return chain_skeleton.resolve_expiry(symbol_master, symbol, expiry)
+    except Exception as e:
+        print(f"SYMBOL MASTER expiry lookup failed for {symbol}: {e}")
+        return None
+
+def _fetch_quotes(fyers, symbols):
+    """{symbol: quote values} via fyers.quotes, QUOTES_BATCH_SIZE symbols per call"""
+    quotes = {}
+    for i in range(0, len(symbols), QUOTES_BATCH_SIZE):
+        batch = symbols[i:i + QUOTES_BATCH_SIZE]
+        response = fyers.quotes({"symbols": ",".join(batch)})
+        if response.get('s') != 'ok':
+            print(f"QUOTES ERROR: {response.get('message', 'Unknown error')}")
+            continue
+        for item in response.get('d') or []:
+            if item.get('s') == 'ok' and item.get('n'):
+                quotes[item['n']] = item.get('v', {})
+    return quotes
+
+def _price_rows(fyers, strike_list):
+    """Fill ladder rows: streaming symbols from the socket, the rest in batched quotes"""
+    symbols = _row_symbols(strike_list)
+    quotes = _fetch_quotes(fyers, [s for s in symbols if s not in live_market_data])
+    for row in strike_list:
+        for side in ('ce', 'pe'):
+            sym = row[f'{side}_symbol']
+            live = live_market_data.get(sym)
+            if live:
+                row.update({f'{side}_ltp': live.get('ltp', 0), f'{side}_volume': live.get('volume', 0),
+                            f'{side}_bid': live.get('bid', 0), f'{side}_ask': live.get('ask', 0)})
+            elif sym in quotes:
+                q = quotes[sym]
+                row.update({f'{side}_ltp': q.get('lp', 0), f'{side}_volume': q.get('volume', 0),
+                            f'{side}_bid': q.get('bid', 0), f'{side}_ask': q.get('ask', 0)})
+    return len(quotes)
+
+def _local_option_chain(fyers, symbol, expiry, strike_count, cache_key):
+    """Option chain laid out from the symbol master; prices from the socket or quotes"""
+    resolved = _local_expiry(symbol, expiry)
+    if not resolved:
+        return jsonify({"error": f"Expiry {expiry} not listed for {symbol} in the symbol master"}), 404
+    
+    spot = live_market_data.get(symbol, {}).get('ltp') or _fetch_quotes(fyers, [symbol]).get(symbol, {}).get('lp', 0)
+    skeleton = chain_skeleton.build_skeleton(symbol_master, symbol, resolved, strike_count, spot)
+    if not skeleton:
+        return jsonify({"error": "No option data found"}), 500
+    
+    symbols_to_subscribe = skeleton.symbols
+    strike_list = skeleton.rows()
+    quoted = _price_rows(fyers, strike_list)
+    
+    print(f"LOCAL OPTION CHAIN: {skeleton.underlying} {resolved.upstream_date}, "
+          f"{len(strike_list)} strikes, {quoted} quoted")
+    atm_strike = skeleton.atm_strike
+    window_version = _stream_chain(cache_key, None, strike_list, atm_strike)
+    
+    entry = _chain_cache.store(
+        cache_key, (strike_list, spot, atm_strike, None),
+        lambda modified: {
             "success": True,
             "strikes": strike_list,
             "total_strikes": len(strike_list),
-            "spot_price": spot_price,
+            "spot_price": spot,
             "atm_strike": atm_strike,
+            "expiry_timestamp": resolved.timestamp,
+            "source": "local",
             "ws_subscribed": symbols_to_subscribe,
-            "timestamp": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat()
+            "window_version": window_version,
+            "chain_version": chain_diffs.record(cache_key, strike_list),
+            "timestamp": datetime.fromtimestamp(modified, pytz.timezone('Asia/Kolkata')).isoformat()
         })
+    return _chain_answer(entry, cache_key)
+
+def _shard(symbols, accounts):
+    """Deal *symbols* round-robin over *accounts* → {account id: symbols}"""
+    shards = {a.id: [] for a in accounts}
+    for i, sym in enumerate(symbols):
+        shards[accounts[i % len(accounts)].id].append(sym)
+    return {account_id: syms for account_id, syms in shards.items() if syms}
+
+def _on_message(message):
+    """Handle WebSocket messages"""
+    try:
+        # Process incoming tick data
+        print(f"WebSocket message: {message}")
         
+        # Store live data in global variable for frontend polling
+        if message and 'symbol' in message:
+            quote = live_market_data[message['symbol']] = {
+                'ltp': message.get('ltp', 0),
+                'volume': message.get('vol_traded_today', 0),
+                'oi': message.get('tot_buy_qty', 0),
+                'change': message.get('ch', 0),
+                'bid': message.get('bid_price', 0),
+                'ask': message.get('ask_price', 0),
+                'timestamp': datetime.now().isoformat()
+            }
+            if quote_table is not None:
+                quote_table.publish(message['symbol'], quote)
+            atm_windows.on_tick(message['symbol'], quote['ltp'])
     except Exception as e:
-        print(f"OPTION CHAIN ERROR: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        print(f"WebSocket message error: {str(e)}")
+
+def _open_socket(account, symbols):
+    """One FyersDataSocket streaming *symbols* on *account*'s token"""
+    label = f"{account.broker_user_id}"
+
+    def on_error(error):
+        print(f"WebSocket [{label}] error: {str(error)}")
+        # A refused token moves this shard to the remaining accounts
+        if isinstance(error, dict) and error.get('code') in AUTH_ERROR_CODES:
+            fyers_clients.reject(account, error.get('message', ''))
 
-def start_websocket_subscription(symbols):
-    """Start WebSocket subscription for given symbols"""
-    global fyers_ws, current_subscriptions
+    def on_close(*_):
+        print(f"WebSocket [{label}] connection closed")
+
+    socket = open_market_socket(account, _on_message, on_error, on_close)
+    socket.subscribe(symbols=symbols)
+    socket.keep_running()
+    print(f"WebSocket [{label}] connected and subscribed to {len(symbols)} symbols")
+    return socket
+
+def _close_sockets():
+    for socket in fyers_sockets.values():
+        try:
+            socket.close_connection()
+        except Exception:
+            pass
+    fyers_sockets.clear()
+    socket_shards.clear()
+
+def _subscribe(symbols):
+    """Start WebSocket subscriptions for given symbols, spread over every usable account"""
+    global fyers_ws, current_subscriptions, paused_subscriptions
     
+    with _socket_lock:
+        try:
+            # Close existing connections if any
+            _close_sockets()
+            fyers_ws = None
+            
+            # Only exchanges in (or warming up for) a session are streamed
+            current_subscriptions = list(symbols)
+            streamed = market_scheduler.active_symbols(current_subscriptions)
+            live = set(streamed)
+            paused_subscriptions = [s for s in current_subscriptions if s not in live]
+            if paused_subscriptions:
+                print(f"WebSocket: {len(paused_subscriptions)} symbols paused until their market warms up")
+            if not streamed:
+                return
+            
+            accounts = market_accounts()
+            if not accounts:
+                print("No valid FYERS access token found for WebSocket")
+                return
+            
+            by_id = {a.id: a for a in accounts}
+            for account_id, shard in _shard(streamed, accounts).items():
+                try:
+                    fyers_sockets[account_id] = _open_socket(by_id[account_id], shard)
+                    socket_shards[account_id] = shard
+                except Exception as e:
+                    print(f"WebSocket start error ({by_id[account_id].broker_user_id}): {str(e)}")
+            
+            fyers_ws = next(iter(fyers_sockets.values()), None)
+        except Exception as e:
+            print(f"WebSocket start error: {str(e)}")
+
+def _session_id():
+    """Id of the browser session asking (the server itself outside a request)"""
+    if not has_request_context():
+        return "server"
+    if "feed_session" not in session:
+        session["feed_session"] = uuid.uuid4().hex
+    return session["feed_session"]
+
+def start_websocket_subscription(symbols, view="chain"):
+    """Stream *symbols* for this session's *view* - here, or through the feed process"""
     try:
-        # Close existing connection if any
-        if fyers_ws:
-            try:
-                fyers_ws.close_connection()
-            except:
-                pass
-        
-        broker_row = BrokerSettings.query.filter_by(brokername='fyers').first()
-        if not broker_row or not broker_row.access_token:
-            print("No FYERS access token found for WebSocket")
+        _feed("subscribe", _session_id(), view, list(symbols))
+    except Exception as e:
+        print(f"WebSocket start error: {str(e)}")
+
+def _forget_quotes(symbols):
+    for symbol in symbols:
+        live_market_data.pop(symbol, None)
+        if quote_table is not None:
+            quote_table.discard(symbol)
+
+def _sync_upstream(removed=()):
+    """Stream the union of every session's symbols, (un)subscribing only what changed"""
+    global current_subscriptions, paused_subscriptions
+    
+    wanted = subscription_book.union()
+    with _socket_lock:
+        _forget_quotes(removed)
+        if not wanted:
+            _subscribe([])
+            _clear_live_data()
+            return
+        if not fyers_sockets:
+            _subscribe(wanted)
             return
-            
-        access_token = broker_row.access_token
-        client_id = broker_row.clientid
         
-        def on_message(message):
-            """Handle WebSocket messages"""
-            try:
-                # Process incoming tick data
-                print(f"WebSocket message: {message}")
-                
-                # Store live data in global variable for frontend polling
-                global live_market_data
-                if message and 'symbol' in message:
-                    live_market_data[message['symbol']] = {
-                        'ltp': message.get('ltp', 0),
-                        'volume': message.get('vol_traded_today', 0),
-                        'oi': message.get('tot_buy_qty', 0),
-                        'change': message.get('ch', 0),
-                        'bid': message.get('bid_price', 0),
-                        'ask': message.get('ask_price', 0),
-                        'timestamp': datetime.now().isoformat()
-                    }
-            except Exception as e:
-                print(f"WebSocket message error: {str(e)}")
-
-        def on_error(error):
-            print(f"WebSocket error: {str(error)}")
-
-        def on_close():
-            print("WebSocket connection closed")
-
-        def on_open():
-            print("WebSocket connection opened")
-            try:
-                fyers_ws.subscribe(symbols=symbols)
-                fyers_ws.keep_alive()
-                print(f"Subscribed to {len(symbols)} symbols")
-            except Exception as e:
-                print(f"Subscription error: {str(e)}")
-
-        # Initialize WebSocket
-        fyers_ws = data_ws.FyersDataSocket(
-            access_token=f"{client_id}:{access_token}",
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close
-        )
-
-        # Connect WebSocket and subscribe
-        fyers_ws.connect()
+        streamed = market_scheduler.active_symbols(wanted)
+        keep = set(streamed)
+        for account_id, shard in list(socket_shards.items()):
+            gone = [s for s in shard if s not in keep]
+            if gone:
+                fyers_sockets[account_id].unsubscribe(symbols=gone)
+                socket_shards[account_id] = [s for s in shard if s in keep]
         
-        # Subscribe to symbols after connection
-        try:
-            fyers_ws.subscribe(symbols=symbols)
-            fyers_ws.keep_running()
-            print(f"WebSocket connected and subscribed to {len(symbols)} symbols")
-            current_subscriptions = symbols
-        except Exception as e:
-            print(f"Subscription error: {str(e)}")
+        # New symbols go to the least loaded sockets
+        have = {s for shard in socket_shards.values() for s in shard}
+        batches = {}
+        for symbol in streamed:
+            if symbol in have:
+                continue
+            account_id = min(fyers_sockets, key=lambda a: len(socket_shards.get(a, ())))
+            socket_shards.setdefault(account_id, []).append(symbol)
+            batches.setdefault(account_id, []).append(symbol)
+        for account_id, batch in batches.items():
+            fyers_sockets[account_id].subscribe(symbols=batch)
         
+        current_subscriptions = wanted
+        paused_subscriptions = [s for s in wanted if s not in keep]
+
+def _set_view(session_id, view, symbols, window=None):
+    """
+    Replace what one view of a session watches; upstream follows the union.
+    *window* ({key, upstream_expiry, rows, atm, as_of}) binds the view to the
+    ATM window of a chain so it follows its recentring.
+    """
+    added, removed = subscription_book.set(session_id, view, symbols)
+    # Also retried while nothing streams that could (e.g. no token at the last try)
+    if added or removed or (not fyers_sockets and len(paused_subscriptions) < len(current_subscriptions)):
+        print(f"WebSocket: session {session_id[:8]} {view} +{len(added)} -{len(removed)}, "
+              f"upstream {len(subscription_book.union())} symbols")
+        _sync_upstream(removed)
+    mine = subscription_book.symbols(session_id)
+    paused = set(paused_subscriptions)
+    result = {"symbols": mine, "paused": [s for s in mine if s in paused],
+              "upstream": len(current_subscriptions)}
+    if window:
+        key = tuple(window["key"])
+        result["window_version"] = atm_windows.track(
+            key, key[0], window["upstream_expiry"], window["rows"], window["atm"], window["as_of"],
+            session=session_id, app=current_app._get_current_object())
+    return result
+
+def _stream_chain(cache_key, upstream_expiry, strike_list, atm_strike, as_of=None):
+    """Stream a chain's strikes and its underlying (whose ticks recentre it) → window version"""
+    window = {"key": cache_key, "upstream_expiry": upstream_expiry, "rows": strike_list,
+              "atm": atm_strike, "as_of": as_of or time.time()}
+    try:
+        return _feed("subscribe", _session_id(), "chain",
+                     [cache_key[0]] + _row_symbols(strike_list), window).get("window_version")
     except Exception as e:
         print(f"WebSocket start error: {str(e)}")
+        return None
+
+def _window_ladder(window, spot):
+    """Rows of *window*'s chain recentred on *spot* → (rows, ATM strike)"""
+    symbol, strike_count, expiry, source = window.key
+    fyers, error = get_market_client()
+    if error:
+        raise RuntimeError(error)
+    if source == 'local':
+        resolved = _local_expiry(symbol, expiry)
+        skeleton = resolved and chain_skeleton.build_skeleton(symbol_master, symbol, resolved, strike_count, spot)
+        if not skeleton:
+            return [], None
+        rows = skeleton.rows()
+        _price_rows(fyers, rows)
+        return rows, skeleton.atm_strike
+    upstream_expiry = window.upstream_expiry
+    if not upstream_expiry:
+        # Registered before any upstream fetch named the expiry timestamp
+        if expiry.isdigit():
+            upstream_expiry = expiry
+        else:
+            local = _local_expiry(symbol, expiry)
+            if not local:
+                raise RuntimeError(f"no expiry timestamp known for {symbol} {expiry}")
+            upstream_expiry = str(local.timestamp)
+        window.upstream_expiry = upstream_expiry
+    # Upstream centres on its own spot: ask wider and cut the window around ours
+    strikecount = max(strike_count, min(strike_count * 2, UPSTREAM_MAX_STRIKES))
+    response = fyers.optionchain(data={"symbol": symbol, "strikecount": strikecount,
+                                       "timestamp": upstream_expiry})
+    if response.get('s') != 'ok':
+        raise RuntimeError(response.get('message', 'Unknown error'))
+    options_list = [o for o in response.get('data', {}).get('optionsChain', []) if o.get('strike_price', 0) > 0]
+    if not options_list:
+        return [], None
+    atm_strike = min(options_list, key=lambda x: abs(x['strike_price'] - spot))['strike_price']
+    rows = _chain_rows(options_list, atm_strike)[0]
+    i = next(i for i, row in enumerate(rows) if row['strike'] == atm_strike)
+    return rows[max(0, i - strike_count):i + strike_count + 1], atm_strike
+
+def _on_window_shift(window, added, removed):
+    """Subscribe the strikes that entered a recentred window, drop those that left"""
+    entered, left = _row_symbols(added), set(_row_symbols(removed))
+    for session_id in list(window.sessions):
+        current = subscription_book.view(session_id, "chain")
+        if not current:
+            atm_windows.unbind(session_id)
+            continue
+        _set_view(session_id, "chain", [s for s in current if s not in left] + entered)
+
+atm_windows.ladder = _window_ladder
+atm_windows.on_shift(_on_window_shift)
+
+_last_sweep = 0.0
+
+def _session_symbols(session_id):
+    """Symbols a polling session watches; also retires sessions that went away"""
+    global _last_sweep
+    
+    subscription_book.touch(session_id)
+    now = time.time()
+    if now - _last_sweep > SESSION_SWEEP_SECONDS:
+        _last_sweep = now
+        _, removed = subscription_book.expire(now)
+        if removed:
+            print(f"WebSocket: idle sessions expired, dropping {len(removed)} symbols")
+            _sync_upstream(removed)
+    return subscription_book.symbols(session_id)
+
+def _reshard(account):
+    """Reconnect everything when an account streaming a shard changes token or goes down"""
+    if account.id not in fyers_sockets or not current_subscriptions:
+        return
+    print(f"WebSocket: account {account.broker_user_id} changed, redistributing "
+          f"{len(current_subscriptions)} symbols")
+    _subscribe(list(current_subscriptions))
+
+fyers_clients.on_token_change(_reshard)
+fyers_clients.on_account_down(_reshard)
+
+def _on_market_phase(exchange, phase):
+    """Unsubscribe an exchange when it closes, resubscribe it at warm-up"""
+    with _socket_lock:
+        wanted = [s for s in current_subscriptions if exchange_of(s) == exchange]
+        streaming = any(exchange_of(s) == exchange for shard in socket_shards.values() for s in shard)
+        if not wanted or streaming == (phase != "closed"):
+            return
+        print(f"WebSocket: {exchange} {phase}, {'resuming' if phase != 'closed' else 'pausing'} "
+              f"{len(wanted)} symbols")
+        _subscribe(list(current_subscriptions))
+
+market_scheduler.on_change(_on_market_phase)
+
+def _clear_live_data():
+    live_market_data.clear()
+    if quote_table is not None:
+        quote_table.clear()
+
+def _update_subscriptions(session_id, new_symbols, view="chain"):
+    """Replace one view of a session → (payload, status)"""
+    if not fyers_sockets and not current_subscriptions:
+        return {"error": "No active WebSocket connection"}, 400
+    
+    with _socket_lock:
+        result = _set_view(session_id, view, new_symbols)
+    if not new_symbols:
+        return {
+            "success": True, 
+            "message": "Cleared all subscriptions",
+            "upstream": result["upstream"]
+        }, 200
+    return {
+        "success": True,
+        "message": f"Updated subscriptions to {len(new_symbols)} symbols",
+        **result
+    }, 200
+
+def _stop_websocket(session_id):
+    """Drop every view of a session; the sockets close once nobody watches → (payload, status)"""
+    _, removed = subscription_book.drop(session_id)
+    atm_windows.unbind(session_id)
+    with _socket_lock:
+        _sync_upstream(removed)
+        if fyers_sockets:
+            return {"success": True,
+                    "message": f"Stopped; {len(current_subscriptions)} symbols still streamed for other sessions"}, 200
+    if removed:
+        return {"success": True, "message": "WebSocket stopped"}, 200
+    return {"success": True, "message": "No active WebSocket connection"}, 200
+
+def _websocket_status(session_id):
+    mine = subscription_book.symbols(session_id)
+    paused = set(paused_subscriptions)
+    return {
+        "connected": bool(fyers_sockets),
+        "provider": MARKET_DATA_PROVIDER,
+        "subscriptions": len(mine),
+        "symbols": mine,
+        "paused": [s for s in mine if s in paused],
+        "market_sessions": {ex: market_scheduler.phase(ex)
+                            for ex in {exchange_of(s) for s in mine} if ex},
+        "upstream": {"symbols": len(current_subscriptions), "paused": len(paused_subscriptions),
+                     **subscription_book.status()},
+        "connections": {str(account_id): len(shard) for account_id, shard in socket_shards.items()},
+        "atm_windows": atm_windows.status(),
+        "quotes": quote_batcher.status(),
+        "chain_diffs": chain_diffs.status(),
+        "accounts": fyers_clients.load(),
+        "feed": {"mode": FEED_MODE,
+                 "table_symbols": len(quote_table.index()) if quote_table is not None else None}
+    }
+
+# Commands the feed process serves to web workers (MARKET_FEED=shared)
+FEED_COMMANDS = {
+    "subscribe": _set_view,
+    "update": _update_subscriptions,
+    "stop": _stop_websocket,
+    "status": _websocket_status,
+    "symbols": _session_symbols,
+    "window": atm_windows.changes,
+}
+
+def _feed(command, *args):
+    """Run a feed command in this process, or in the feed process when workers share one"""
+    if FEED_MODE == "shared":
+        return feed_client.call(command, *args)
+    return FEED_COMMANDS[command](*args)
+
+def serve_feed():
+    """Run this process as the market feed: own the sockets, publish the quote table"""
+    global quote_table
+    quote_table = QuoteTable.create()
+    FeedServer(FEED_COMMANDS, app=current_app._get_current_object()).start()
+    print(f"MARKET FEED: quote table '{TABLE_NAME}' with {quote_table.slots} slots")
+    try:
+        while True:
+            quote_table.heartbeat()
+            time.sleep(1)
+    finally:
+        _close_sockets()
+        quote_table.close()
 
 @websocket_bp.route('/update_subscriptions', methods=['POST'])
 def update_subscriptions():
     """Update WebSocket subscriptions with new symbols"""
-    global fyers_ws, current_subscriptions, market_data_cache
-    
     try:
         data = request.get_json()
-        new_symbols = data.get('symbols', [])
-        
-        if not fyers_ws:
-            return jsonify({"error": "No active WebSocket connection"}), 400
-            
-        # Clear cache for clean data
-        market_data_cache.clear()
-        
-        # Unsubscribe from old symbols if any
-        if current_subscriptions:
-            print(f"Unsubscribing from {len(current_subscriptions)} old symbols")
-            fyers_ws.unsubscribe(symbols=current_subscriptions)
-            
-        # Subscribe to new symbols
-        if new_symbols:
-            print(f"Subscribing to {len(new_symbols)} new symbols")
-            fyers_ws.subscribe(symbols=new_symbols)
-            current_subscriptions = new_symbols
-            
-            return jsonify({
-                "success": True, 
-                "message": f"Updated subscriptions to {len(new_symbols)} symbols",
-                "symbols": new_symbols
-            })
-        else:
-            current_subscriptions = []
-            return jsonify({
-                "success": True, 
-                "message": "Cleared all subscriptions"
-            })
-            
+        payload, status = _feed("update", _session_id(), data.get('symbols', []), data.get('view', 'chain'))
+        return jsonify(payload), status
+    except FeedUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"Subscription update error: {str(e)}")
         return jsonify({"error": f"Failed to update subscriptions: {str(e)}"}), 500
@@ -405,41 +831,75 @@ def update_subscriptions():
 @websocket_bp.route('/stop_websocket', methods=['POST'])
 def stop_websocket():
     """Stop WebSocket subscription"""
-    global fyers_ws, current_subscriptions, market_data_cache
-    
     try:
-        if fyers_ws:
-            fyers_ws.unsubscribe()
-            fyers_ws.close_connection()
-            fyers_ws = None
-            current_subscriptions = []
-            market_data_cache.clear()
-            return jsonify({"success": True, "message": "WebSocket stopped"})
-        else:
-            return jsonify({"success": True, "message": "No active WebSocket connection"})
-            
+        payload, status = _feed("stop", _session_id())
+        return jsonify(payload), status
+    except FeedUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @websocket_bp.route('/websocket_status', methods=['GET'])
 def websocket_status():
     """Get WebSocket connection status"""
-    global fyers_ws, current_subscriptions
-    
-    return jsonify({
-        "connected": fyers_ws is not None,
-        "subscriptions": len(current_subscriptions),
-        "symbols": current_subscriptions
-    })
+    if FEED_MODE != "shared":
+        return jsonify(_websocket_status(_session_id()))
+    table = live_market_data.table
+    feed = {"mode": FEED_MODE, "table_attached": table is not None,
+            "feed_alive": bool(table and table.writer_alive())}
+    try:
+        return jsonify({**_feed("status", _session_id()), "feed": feed, "quotes": quote_batcher.status(),
+                        "chain_diffs": chain_diffs.status()})
+    except FeedUnavailable as e:
+        return jsonify({"connected": False, "error": str(e), "feed": feed}), 503
+
+def _subscribed():
+    """Symbols being streamed (as far as this worker can see)"""
+    return list(live_market_data) if FEED_MODE == "shared" else current_subscriptions
+
+@websocket_bp.after_request
+def _market_session_headers(response):
+    """Tell pollers whether the market behind their symbols is open (and when to come back)"""
+    symbol = request.args.get('symbol', '')
+    symbols = [symbol] if symbol else g.get('feed_symbols')
+    return market_scheduler.annotate(response, symbols if symbols is not None else _subscribed())
 
 @websocket_bp.route('/live_market_data', methods=['GET'])
 def get_live_market_data():
-    """Get live market data for frontend polling"""
-    global live_market_data
-    
+    """Get live market data for frontend polling (this session's symbols only)"""
+    try:
+        symbols = g.feed_symbols = _feed("symbols", _session_id())
+    except FeedUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    if FEED_MODE == "shared":
+        data = live_market_data.snapshot(symbols)
+    else:
+        data = {s: q for s in symbols if (q := live_market_data.get(s)) is not None}
     return jsonify({
         "success": True,
-        "data": live_market_data,
-        "count": len(live_market_data),
+        "data": data,
+        "count": len(data),
         "timestamp": datetime.now().isoformat()
-    })
\ No newline at end of file
+    })
+
+def _chain_key():
+    """Cache / window key of the chain named by the request args (as /ws_get_option_chain builds it)"""
+    return (request.args.get('symbol', ''), _strike_count(request.args.get('strike_count', '15')),
+            request.args.get('expiry_timestamp', ''), request.args.get('source', 'upstream').strip().lower())
+
+@websocket_bp.route('/option_chain_window', methods=['GET'])
+def get_option_chain_window():
+    """
+    Rows that entered / strikes that left the chain's ATM window since
+    ?since=<window_version>; a repeat poll while the window stays put is a 304
+    """
+    key, since = _chain_key(), request.args.get('since', 0, type=int)
+    try:
+        changes = _feed("window", key, since, 0.0)
+    except FeedUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    if changes is None:
+        return jsonify({"error": "Option chain not loaded - request /ws_get_option_chain first"}), 404
+    return http_cache.conditional_json(
+        http_cache.etag_for("chain-window", *key, since, changes["version"]),
+        lambda: {"success": True, **changes})
@@ -0,0 +1,29 @@
+"""
+Market feed process for multi-worker deployments
+Owns the broker WebSockets and publishes every tick into the shared quote
+table; web workers started with MARKET_FEED=shared read quotes from that
+table and send subscription changes here over the feed channel.  The
+once-per-deployment services (symbol master refresh, chain sampler, token
+refresher, market warm-up) run here and not in the workers:
+
+    python feed.py &
+    MARKET_FEED=shared gunicorn --workers 4 --bind 0.0.0.0:5000 main:app
+"""
+import os
+import signal
+import sys
+
+os.environ["MARKET_FEED"] = "feed"
+
+from app import app  # noqa: E402
+from APP_Extensions.startup import startup  # noqa: E402
+from APP_Routes.websocket_handler import serve_feed  # noqa: E402
+
+if __name__ == "__main__":
+    # Let a plain kill close the sockets and unlink the quote table
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # The feed runs the services the workers leave to it; it never serves a
+    # request, so lazy mode's first-request start happens here
+    startup.first_request()
+    with app.app_context():
+        serve_feed()
@@ -1,8 +1,36 @@
 from datetime import datetime, timedelta
 from app import db
+from sqlalchemy.dialects import postgresql, sqlite
 import pytz
 
 
+def access_token_expiry(created_at):
+    """
+    Access token expiry for a token created at *created_at* (naive UTC):
+    8 hours from creation OR the next 8 AM IST, whichever is earlier
+    """
+    if not created_at:
+        return None
+    ist_tz = pytz.timezone('Asia/Kolkata')
+    token_created_ist = created_at.replace(tzinfo=pytz.utc).astimezone(ist_tz)
+    
+    eight_hours_later = token_created_ist + timedelta(hours=8)
+    
+    # Find next 8 AM IST after token creation
+    if token_created_ist.hour < 8:
+        # If created before 8 AM, expires at 8 AM same day
+        next_8am = token_created_ist.replace(hour=8, minute=0, second=0, microsecond=0)
+    else:
+        # If created after 8 AM, expires at 8 AM next day
+        next_8am = (token_created_ist + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    
+    # Expiry is whichever comes first: 8 hours OR next 8 AM
+    return min(eight_hours_later, next_8am)
+
+
+REFRESH_TOKEN_VALID_DAYS = 10
+
+
 class BrokerSettings(db.Model):
     """
     Stores per–broker credentials for every user.
@@ -43,37 +71,24 @@ class BrokerSettings(db.Model):
     def __repr__(self) -> str:
         return f"<BrokerSettings {self.brokername}:{self.broker_user_id}>"
     
+    def access_token_expires_at(self):
+        """Expiry instant (IST) of the access token, None when it has none"""
+        return access_token_expiry(self.access_token_created_at)
+    
     def is_access_token_expired(self):
         """Check if access token is expired (8 hours from creation OR at 8 AM IST, whichever is earlier)"""
         if not self.access_token_created_at:
             return True
         
         ist_tz = pytz.timezone('Asia/Kolkata')
-        token_created_ist = self.access_token_created_at.replace(tzinfo=pytz.utc).astimezone(ist_tz)
-        current_time_ist = datetime.now(ist_tz)
-        
-        # Calculate expiry as minimum of: 8 hours from creation OR next 8 AM IST
-        eight_hours_later = token_created_ist + timedelta(hours=8)
-        
-        # Find next 8 AM IST after token creation
-        if token_created_ist.hour < 8:
-            # If created before 8 AM, expires at 8 AM same day
-            next_8am = token_created_ist.replace(hour=8, minute=0, second=0, microsecond=0)
-        else:
-            # If created after 8 AM, expires at 8 AM next day
-            next_8am = (token_created_ist + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
-        
-        # Expiry is whichever comes first: 8 hours OR next 8 AM
-        expiry_time = min(eight_hours_later, next_8am)
-        
-        return current_time_ist > expiry_time
+        return datetime.now(ist_tz) > self.access_token_expires_at()
     
     def is_refresh_token_expired(self):
         """Check if refresh token is expired (valid for 10 days)"""
         if not self.refresh_token_created_at or not self.refresh_token:
             return True
         
-        expiry_time = self.refresh_token_created_at + timedelta(days=10)
+        expiry_time = self.refresh_token_created_at + timedelta(days=REFRESH_TOKEN_VALID_DAYS)
         return datetime.utcnow() > expiry_time
     
     def access_token_expires_in_minutes(self):
@@ -82,22 +97,8 @@ class BrokerSettings(db.Model):
             return 0
         
         ist_tz = pytz.timezone('Asia/Kolkata')
-        token_created_ist = self.access_token_created_at.replace(tzinfo=pytz.utc).astimezone(ist_tz)
         current_time_ist = datetime.now(ist_tz)
-        
-        # Calculate expiry as minimum of: 8 hours from creation OR next 8 AM IST
-        eight_hours_later = token_created_ist + timedelta(hours=8)
-        
-        # Find next 8 AM IST after token creation
-        if token_created_ist.hour < 8:
-            # If created before 8 AM, expires at 8 AM same day
-            next_8am = token_created_ist.replace(hour=8, minute=0, second=0, microsecond=0)
-        else:
-            # If created after 8 AM, expires at 8 AM next day
-            next_8am = (token_created_ist + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
-        
-        # Expiry is whichever comes first: 8 hours OR next 8 AM
-        expiry_time = min(eight_hours_later, next_8am)
+        expiry_time = self.access_token_expires_at()
         
         time_diff = expiry_time - current_time_ist
         return max(0, int(time_diff.total_seconds() / 60))
@@ -107,7 +108,7 @@ class BrokerSettings(db.Model):
         if not self.refresh_token_created_at or not self.refresh_token:
             return 0
         
-        expiry_time = self.refresh_token_created_at + timedelta(days=10)
+        expiry_time = self.refresh_token_created_at + timedelta(days=REFRESH_TOKEN_VALID_DAYS)
         time_diff = expiry_time - datetime.utcnow()
         return max(0, int(time_diff.total_seconds() / (24 * 3600)))
     
@@ -193,4 +194,77 @@ class MarketTime(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class MarketHoliday(db.Model):
+    """
+    Exchange holidays and special sessions (e.g. muhurat trading), keyed by
+    the MarketTime.exchange_code they apply to.  A 'holiday' row closes the
+    exchange for the day; a 'special' row replaces the day's hours with
+    open_time-close_time (local), even on a weekend.
+    """
+    __tablename__ = "market_holidays"
+    __table_args__ = (db.UniqueConstraint("user_id", "exchange_code", "holiday_date",
+                                          name="uq_market_holiday_day"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+
+    exchange_code = db.Column(db.String(10), nullable=False)
+    holiday_date = db.Column(db.Date, nullable=False)
+    description = db.Column(db.String(200))
+
+    # 'holiday' or 'special'
+    session_type = db.Column(db.String(20), nullable=False, default="holiday")
+    # Local HH:MM hours of a special session
+    open_time = db.Column(db.String(5))
+    close_time = db.Column(db.String(5))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<MarketHoliday {self.exchange_code} {self.holiday_date} {self.session_type}>"
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'exchange_code': self.exchange_code,
+            'date': self.holiday_date.isoformat() if self.holiday_date else None,
+            'description': self.description,
+            'session_type': self.session_type,
+            'open_time': self.open_time,
+            'close_time': self.close_time,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class DataVersion(db.Model):
+    """
+    Write sequence of one data set (see http_cache.shared), kept in the
+    database so every worker process sees the same number
+    """
+    __tablename__ = "data_versions"
+
+    name       = db.Column(db.String(50), primary_key=True)
+    seq        = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.Float, nullable=False, default=0.0)
+
+    @classmethod
+    def load(cls, name):
+        """(seq, updated_at) of *name*, None before its first write"""
+        with db.engine.connect() as conn:
+            row = conn.execute(db.select(cls.seq, cls.updated_at).where(cls.name == name)).first()
+        return tuple(row) if row else None
+
+    @classmethod
+    def advance(cls, name, now):
+        """Count one write to *name* → its new (seq, updated_at), in one upsert"""
+        insert = postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert
+        upsert = (insert(cls).values(name=name, seq=1, updated_at=now)
+                  .on_conflict_do_update(index_elements=[cls.name],
+                                         set_={"seq": cls.seq + 1, "updated_at": now})
+                  .returning(cls.seq, cls.updated_at))
+        with db.engine.begin() as conn:
+            seq, updated_at = conn.execute(upsert).one()
+        return seq, float(updated_at)
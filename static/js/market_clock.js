@@ -809,7 +809,8 @@ class MarketClock {
             // Add guards for undefined values
             const nextEventText = market.next_event === 'opening' ? 'Opens' : 
                                   market.next_event === 'closing' ? 'Closes' : 
-                                  market.next_event === 'weekend' ? 'Weekend' : 'Closed';
+                                  market.next_event === 'weekend' ? 'Weekend' :
+                                  market.next_event === 'holiday' ? 'Holiday' : 'Closed';
             
             const nextEventTime = market.next_event_ist || 'N/A';
             const nextEventClass = market.next_event === 'opening' ? 'success' : 
@@ -267,6 +267,7 @@ class MicroChartManager {
         this.batchSize = 10;
         this.refreshInterval = 300000; // 5 minutes
         this.refreshTimer = null;
+        this.pausedUntil = 0;          // set by WebSocketHandler while the market is closed
     }
 
     addChart(symbol, containerId, options = {}) {
@@ -296,6 +297,8 @@ class MicroChartManager {
     }
 
     async refreshAllCharts() {
+        // Closed market: the last session's candles will not change
+        if (Date.now() < this.pausedUntil) return;
         await this.loadAllCharts();
     }
 
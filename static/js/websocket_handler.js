@@ -4,6 +4,9 @@
  * CACHE BUSTER: Updated live streaming implementation
  */
 
+// Row fields the VOL/OI timer refreshes (the socket streams the prices)
+const VOLUME_OI_FIELDS = ['ce_volume', 'ce_oi', 'ce_oich', 'pe_volume', 'pe_oi', 'pe_oich'];
+
 class WebSocketHandler {
     constructor() {
         this.isConnected = false;
@@ -16,6 +19,17 @@ class WebSocketHandler {
         this.atmElement = null;
         this.optionChainTable = null;
         this.microchartManager = null;
+        // Set from the X-Market-Session / X-Poll-After response headers:
+        // timers keep ticking but skip their fetch until this instant
+        this.marketSession = null;
+        this.pollPausedUntil = 0;
+        // Polled recentring of the ATM strike window (rows added/removed)
+        this.windowInterval = null;
+        this.windowVersion = 0;
+        this.nextRowIndex = 0;
+        // Content version of the chain the table shows: VOL/OI polls ask
+        // the server only for the cells that changed since
+        this.chainVersion = null;
         
         this.init();
     }
@@ -62,6 +76,8 @@ class WebSocketHandler {
             // Store the new values first
             this.currentSymbol = symbol;
             this.currentExpiry = expiry;
+            // A new symbol may trade on a market that is open
+            this.pollPausedUntil = 0;
             
             console.log(`Starting live data for ${symbol}, expiry: ${expiry}`);
             
@@ -102,12 +118,34 @@ class WebSocketHandler {
         this.updateSpotPrice();
     }
     
+    noteMarketSession(response) {
+        // Server says whether the market is open; while closed it names the
+        // number of seconds until polling is worth resuming
+        const session = response.headers.get('X-Market-Session');
+        if (!session) return;
+        
+        const pollAfter = parseInt(response.headers.get('X-Poll-After') || '0', 10);
+        if (session !== this.marketSession) {
+            console.log(`Market session: ${session}${pollAfter ? ` (next poll in ${pollAfter}s)` : ''}`);
+        }
+        this.marketSession = session;
+        this.pollPausedUntil = session === 'closed' && pollAfter > 0 ? Date.now() + pollAfter * 1000 : 0;
+        if (this.microchartManager) {
+            this.microchartManager.pausedUntil = this.pollPausedUntil;
+        }
+    }
+    
+    marketIdle() {
+        return Date.now() < this.pollPausedUntil;
+    }
+    
     async updateSpotPrice() {
-        if (!this.currentSymbol) return;
+        if (!this.currentSymbol || this.marketIdle()) return;
         
         try {
             // Use symbol as-is since it should already be in correct format from symbol lookup
             const response = await fetch(`/get_spot_price?symbol=${encodeURIComponent(this.currentSymbol)}`);
+            this.noteMarketSession(response);
             const data = await response.json();
             
             if (data.success) {
@@ -137,19 +175,27 @@ class WebSocketHandler {
     }
     
     async updateVolumeOIData() {
-        if (!this.currentSymbol || !this.currentExpiry) return;
+        if (!this.currentSymbol || !this.currentExpiry || this.marketIdle()) return;
         
         try {
-            const strikeCountSelect = document.getElementById('strikeCountSelect');
-            const strikeCount = strikeCountSelect ? strikeCountSelect.value : '15';
-            
-            const url = `/ws_get_option_chain?symbol=${encodeURIComponent(this.currentSymbol)}&expiry_timestamp=${encodeURIComponent(this.currentExpiry)}&strike_count=${strikeCount}`;
+            let url = `/ws_get_option_chain?${this.chainQuery()}`;
+            if (this.chainVersion) {
+                url += `&since=${encodeURIComponent(this.chainVersion)}&fields=${VOLUME_OI_FIELDS.join(',')}`;
+            }
             const response = await fetch(url);
+            this.noteMarketSession(response);
             const data = await response.json();
+            if (!data.success) return;
             
-            if (data.success && data.strikes) {
-                this.updateVolumeOIColumns(data.strikes);
-                console.log('📊 VOL/OI data updated via timer');
+            if (data.since === undefined || data.reset) {
+                // Whole chain: first poll, or the server no longer knows our version
+                this.updateVolumeOIColumns(data.strikes || []);
+                this.chainVersion = data.version || data.chain_version || null;
+            } else if (data.version !== this.chainVersion) {
+                // Only the cells that changed; rows entering the window come whole
+                this.updateVolumeOIColumns(data.changed.concat(data.added));
+                this.chainVersion = data.version;
+                console.log(`📊 VOL/OI: ${data.changed.length} strikes changed`);
             }
         } catch (error) {
             console.error('Error updating VOL/OI data:', error);
@@ -160,14 +206,16 @@ class WebSocketHandler {
         const tableBody = document.querySelector('#optionChainTable tbody');
         if (!tableBody) return;
         
-        const rows = tableBody.querySelectorAll('tr');
+        if (!strikes.length) return;
         
+        const byStrike = new Map();
+        tableBody.querySelectorAll('tr[data-strike]').forEach(row => {
+            byStrike.set(parseFloat(row.dataset.strike), row);
+        });
+        
+        // Rows may be partial (a diff): fields that are absent did not change
         strikes.forEach(strike => {
-            // Find the row for this strike price
-            const matchingRow = Array.from(rows).find(row => {
-                return row.dataset.strike && parseFloat(row.dataset.strike) === strike.strike;
-            });
-            
+            const matchingRow = byStrike.get(strike.strike);
             if (matchingRow) {
                 // Update only VOL/OI/Change in OI columns (not LTP)
                 this.updateCellValue(matchingRow, '.ce-volume', strike.ce_volume);
@@ -182,7 +230,7 @@ class WebSocketHandler {
     
     updateCellValueWithColor(row, selector, value) {
         const cell = row.querySelector(selector);
-        if (cell) {
+        if (cell && value !== undefined) {
             cell.textContent = value || 0;
             
             // Apply color based on value (positive = green, negative = red)
@@ -404,6 +452,8 @@ class WebSocketHandler {
             if (data.success) {
                 this.updateOptionChainTable(data.strikes);
                 this.updateATMDisplay(data.spot_price);
+                this.followATMWindow(data.window_version);
+                this.chainVersion = data.chain_version || null;
                 this.hideOptionChainLoading();
                 console.log(`Option chain loaded: ${data.strikes.length} strikes for ${this.currentSymbol}`);
             } else {
@@ -429,6 +479,7 @@ class WebSocketHandler {
             const row = this.createOptionChainRow(strike);
             tableBody.appendChild(row);
         });
+        this.nextRowIndex = strikes.length;
         
         // Load microcharts for all option symbols
         this.loadMicroCharts(strikes);
@@ -530,13 +581,13 @@ class WebSocketHandler {
         }
     }
     
-    createOptionChainRow(strike) {
+    createOptionChainRow(strike, index = null) {
         const row = document.createElement('tr');
         row.dataset.strike = strike.strike;
         
-        // Get row index for button tracking
+        // Get row index for button tracking (rows added by a recentre pass a fresh one)
         const tableBody = document.querySelector('#optionChainTable tbody');
-        const rowIndex = tableBody ? tableBody.children.length : 0;
+        const rowIndex = index !== null ? index : (tableBody ? tableBody.children.length : 0);
         
         // Remove ATM highlighting for clean professional appearance
         // if (strike.is_atm) {
@@ -683,6 +734,98 @@ class WebSocketHandler {
         await this.microchartManager.loadAllCharts();
     }
     
+    chainQuery() {
+        const strikeCountSelect = document.getElementById('strikeCountSelect');
+        const strikeCount = strikeCountSelect ? strikeCountSelect.value : '15';
+        return `symbol=${encodeURIComponent(this.currentSymbol)}&expiry_timestamp=${encodeURIComponent(this.currentExpiry)}&strike_count=${strikeCount}`;
+    }
+    
+    followATMWindow(version) {
+        // The server recentres the strike window as spot moves; every 2 seconds
+        // ask for the rows that entered and the strikes that left since our version
+        this.closeATMWindow();
+        if (!version) return;
+        
+        this.windowVersion = version;
+        this.windowInterval = setInterval(() => {
+            this.pollATMWindow();
+        }, 2000);
+    }
+    
+    async pollATMWindow() {
+        if (this.marketIdle()) return;
+        
+        try {
+            const response = await fetch(`/option_chain_window?${this.chainQuery()}&since=${this.windowVersion}`);
+            if (response.status === 404) {
+                // The server no longer tracks this chain
+                this.closeATMWindow();
+                return;
+            }
+            const data = await response.json();
+            if (data.success && data.version !== this.windowVersion) {
+                this.applyWindowChange(data);
+            }
+        } catch (error) {
+            console.error('Error polling ATM window:', error);
+        }
+    }
+    
+    closeATMWindow() {
+        if (this.windowInterval) {
+            clearInterval(this.windowInterval);
+            this.windowInterval = null;
+        }
+    }
+    
+    applyWindowChange(change) {
+        const tableBody = document.querySelector('#optionChainTable tbody');
+        if (!tableBody || change.version <= this.windowVersion) return;
+        
+        const byStrike = new Map();
+        tableBody.querySelectorAll('tr[data-strike]').forEach(row => {
+            byStrike.set(parseFloat(row.dataset.strike), row);
+        });
+        
+        // A reset carries the whole window: drop whatever is not in it
+        let removed = change.removed || [];
+        if (change.reset) {
+            const keep = new Set(change.added.map(strike => strike.strike));
+            removed = Array.from(byStrike.keys()).filter(strike => !keep.has(strike));
+        }
+        
+        removed.forEach(strike => {
+            const row = byStrike.get(strike);
+            if (!row) return;
+            row.querySelectorAll('.ce-ltp, .pe-ltp').forEach(cell => {
+                const symbol = cell.getAttribute('data-symbol');
+                if (symbol && this.microchartManager) this.microchartManager.removeChart(symbol);
+            });
+            row.remove();
+            byStrike.delete(strike);
+        });
+        
+        const entered = (change.added || []).filter(strike => !byStrike.has(strike.strike));
+        entered.forEach(strike => {
+            const row = this.createOptionChainRow(strike, this.nextRowIndex++);
+            const next = Array.from(tableBody.querySelectorAll('tr[data-strike]'))
+                .find(other => parseFloat(other.dataset.strike) > strike.strike);
+            tableBody.insertBefore(row, next || null);
+            
+            if (this.microchartManager) {
+                ['ce', 'pe'].forEach(side => {
+                    const symbol = strike[`${side}_symbol`];
+                    if (symbol) {
+                        this.microchartManager.addChart(symbol, `${side}-chart-${strike.strike}`).loadData();
+                    }
+                });
+            }
+        });
+        
+        this.windowVersion = change.version;
+        console.log(`ATM window recentred on ${change.atm_strike}: +${entered.length} -${removed.length} strikes`);
+    }
+    
     async refreshOptionChain() {
         if (this.currentSymbol && this.currentExpiry) {
             await this.startOptionChainUpdates();
@@ -757,6 +900,8 @@ class WebSocketHandler {
             this.realTimeInterval = null;
         }
         
+        this.closeATMWindow();
+        
         // Stop WebSocket connection
         fetch('/stop_websocket', { method: 'POST' })
             .then(response => response.json())
@@ -789,11 +934,13 @@ class WebSocketHandler {
     }
     
     async checkForRealTimeUpdates() {
-        // Allow updates regardless of current symbol
+        // Allow updates regardless of current symbol (but not while the market is shut)
+        if (this.marketIdle()) return;
         
         try {
             // Get all live market data from WebSocket bridge
             const response = await fetch('/live_market_data');
+            this.noteMarketSession(response);
             const result = await response.json();
             
             if (result.success && result.data) {
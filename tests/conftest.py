@@ -0,0 +1,32 @@
+import os, sys
+
+# Tests import the APP_Extensions / APP_Routes packages from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def flask_app(tmp_path_factory):
+    """The real app on a scratch SQLite file, with no background services."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp_path_factory.mktemp('db') / 'app.db'}")
+    os.environ.setdefault("APP_LAZY_INIT", "1")
+    os.environ.setdefault("MARKET_FEED", "shared")      # requests start no owned services
+    os.environ.setdefault("TOKEN_AUTO_REFRESH", "0")
+    os.environ.setdefault("MARKET_DATA_PROVIDER", "simulator")
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def db_session(flask_app):
+    """An app context over emptied tables."""
+    from app import db
+    with flask_app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        yield db.session
+        db.session.rollback()
@@ -0,0 +1,77 @@
+from APP_Extensions import atm_window
+from APP_Extensions.atm_window import AtmWindow, AtmWindows
+
+KEY = ("NIFTY", "1756375200", 5)
+
+
+def _rows(*strikes):
+    return [{"strike": k, "ce_ltp": 1.0, "pe_ltp": 1.0} for k in strikes]
+
+
+def _window():
+    window = AtmWindow(KEY, "NSE:NIFTY50-INDEX", "1756375200")
+    assert window.apply(_rows(100, 110, 120), 110, as_of=1.0) is None
+    return window
+
+
+def test_first_apply_and_bounds():
+    window = _window()
+    assert window.version == 1 and window.step == 10
+    assert (window.lower, window.upper) == (104.0, 116.0)      # half a step plus hysteresis
+    assert window.apply(_rows(100, 110, 120), 110, as_of=2.0) is None
+    assert window.version == 1
+
+
+def test_since_folds_changes():
+    window = _window()
+    change, entered, left = window.apply(_rows(110, 120, 130), 120, as_of=2.0)
+    assert (change.version, change.added, change.removed) == (2, [130.0], [100.0])
+    assert [r["strike"] for r in entered] == [130] and [r["strike"] for r in left] == [100]
+    window.apply(_rows(100, 110, 120), 110, as_of=3.0)          # back again
+    window.apply(_rows(90, 100, 110), 100, as_of=4.0)
+
+    folded = window.since(1)
+    assert folded["version"] == 4 and folded["atm_strike"] == 100
+    assert [r["strike"] for r in folded["added"]] == [90]
+    assert folded["removed"] == [120.0]                         # 130 came and went
+    one_behind = window.since(3)
+    assert [r["strike"] for r in one_behind["added"]] == [90] and one_behind["removed"] == [120.0]
+    assert window.since(4)["added"] == [] and window.since(4)["removed"] == []
+
+
+def test_since_resets_when_the_log_is_gone(monkeypatch):
+    monkeypatch.setattr(atm_window, "MAX_CHANGES", 2)
+    window = AtmWindow(KEY, "NSE:NIFTY50-INDEX", None)
+    window.apply(_rows(100, 110, 120), 110, as_of=1.0)
+    for i, atm in enumerate((120, 130, 140), start=2):
+        window.apply(_rows(atm - 10, atm, atm + 10), atm, as_of=i)
+    assert window.since(3).get("reset") is None
+    reset = window.since(1)
+    assert reset["reset"] and [r["strike"] for r in reset["added"]] == [130, 140, 150]
+
+
+def test_track_recentres_on_ticks_and_keeps_the_expiry():
+    windows = AtmWindows()
+    asked = []
+
+    def ladder(window, spot):
+        asked.append((window.upstream_expiry, spot))
+        return _rows(110, 120, 130), 120
+
+    shifted = []
+    windows.ladder = ladder
+    windows.on_shift(lambda window, added, removed: shifted.append(
+        ([r["strike"] for r in added], [r["strike"] for r in removed])))
+    windows.track(KEY, "NSE:NIFTY50-INDEX", None, _rows(100, 110, 120), 110, 1.0, session="s1")
+    windows.track(KEY, "NSE:NIFTY50-INDEX", "1756375200", _rows(100, 110, 120), 110, 2.0)
+
+    windows.on_tick("NSE:NIFTY50-INDEX", 115.0)                 # inside the bounds
+    assert windows.recentre(KEY, 115.0) is None and asked == []
+    change = windows.recentre(KEY, 117.0)
+    assert change.added == [130.0] and asked == [("1756375200", 117.0)]
+    assert shifted == [([130], [100])]
+    assert windows.changes(KEY, since=1)["removed"] == [100.0]
+
+    # An answer fetched before the recentre does not move the window back
+    assert windows.track(KEY, "NSE:NIFTY50-INDEX", None, _rows(100, 110, 120), 110, 0.5) == 2
+    assert windows.changes(("BANKNIFTY",), since=0) is None
@@ -0,0 +1,55 @@
+from APP_Extensions.chain_diff import ChainDiffs, chain_version
+
+KEY = ("NIFTY", "1756375200", 3)
+
+
+def _rows(ce_ltp=10.0, strikes=(24000, 24100, 24200)):
+    return [{"strike": k, "ce_ltp": ce_ltp, "pe_ltp": 5.0, "ce_oi": 100} for k in strikes]
+
+
+def test_version_is_a_content_digest():
+    assert chain_version(_rows()) == chain_version(_rows())
+    assert chain_version(_rows()) != chain_version(_rows(ce_ltp=11.0))
+    assert ChainDiffs().record(KEY, _rows()) == chain_version(_rows())
+
+
+def test_diff_since_a_known_version():
+    diffs = ChainDiffs()
+    old = diffs.record(KEY, _rows())
+    rows = _rows(ce_ltp=12.0, strikes=(24100, 24200, 24300))
+    rows[0]["ce_oi"] = 150
+    new = diffs.record(KEY, rows)
+
+    diff = diffs.diff(KEY, old)
+    assert diff["version"] == new
+    assert diff["changed"] == [{"strike": 24100, "ce_ltp": 12.0, "ce_oi": 150},
+                               {"strike": 24200, "ce_ltp": 12.0}]
+    assert [r["strike"] for r in diff["added"]] == [24300] and diff["removed"] == [24000]
+
+    only_oi = diffs.diff(KEY, old, fields=["ce_oi", "not_a_field"])
+    assert only_oi["changed"] == [{"strike": 24100, "ce_oi": 150}]
+
+    assert diffs.diff(KEY, new) == {"version": new, "changed": [], "added": [], "removed": []}
+    assert diffs.status()["partial"] == 2 and diffs.status()["unchanged"] == 1
+
+
+def test_unknown_or_expired_version_resets():
+    diffs = ChainDiffs(max_snapshots=2)
+    first = diffs.record(KEY, _rows(1.0))
+    diffs.record(KEY, _rows(2.0))
+    latest = diffs.record(KEY, _rows(3.0))
+    reset = diffs.diff(KEY, first)
+    assert reset["reset"] and reset["version"] == latest
+    assert [r["ce_ltp"] for r in reset["strikes"]] == [3.0, 3.0, 3.0]
+    assert diffs.diff(KEY, "bogus")["reset"]
+    assert diffs.diff(("BANKNIFTY",), first) is None
+    assert diffs.status() == {"chains": 1, "snapshots": 2, "full": 2, "partial": 0, "unchanged": 0}
+
+
+def test_returning_to_earlier_data_is_the_latest_version():
+    diffs = ChainDiffs()
+    a = diffs.record(KEY, _rows(1.0))
+    b = diffs.record(KEY, _rows(2.0))
+    assert diffs.record(KEY, _rows(1.0)) == a
+    diff = diffs.diff(KEY, b)
+    assert diff["version"] == a and diff["changed"][0] == {"strike": 24000, "ce_ltp": 1.0}
@@ -0,0 +1,105 @@
+import datetime
+
+import pytest
+
+from APP_Extensions.chain_skeleton import (Expiry, build_skeleton, fo_underlying,
+                                           option_expiries, resolve_expiry)
+from APP_Extensions.symbol_master import IST, SymbolMaster
+
+EXPIRED = datetime.date(2025, 8, 28)
+TODAY = datetime.datetime.now(IST).date()
+NEAR, FAR = TODAY + datetime.timedelta(days=7), TODAY + datetime.timedelta(days=35)
+STRIKES = (24000, 24050, 24100, 24150, 24200)
+
+
+def _close(day: datetime.date) -> int:
+    return int(IST.localize(datetime.datetime.combine(day, datetime.time(15, 30))).timestamp())
+
+
+def _option(underlying, day, strike, side):
+    """One sym_details row for an option contract"""
+    ticker = f"NSE:{underlying}{day:%y%m%d}{strike}{side}"
+    desc = f"{underlying} {day:%y} {day:%b} {day:%d} {strike} {side}"
+    return (f"1011{day:%y%m%d}{strike}{len(side)},{desc},14,75,0.05,,0915-1530|1815-1915:,"
+            f"{day},{_close(day)},{ticker},11,11,{strike},{underlying},26000,{strike}.0,{side},"
+            f"101000000026000,None,0,0.0")
+
+
+def _sym_details():
+    rows = [_option(u, day, k, side) for u, days in (("NIFTY", (EXPIRED, NEAR, FAR)),
+                                                      ("BANKNIFTY", (NEAR,)))
+            for day in days for k in STRIKES for side in ("CE", "PE")]
+    return "\n".join(reversed(rows)) + "\n"            # the file is not in strike order
+
+
+@pytest.fixture
+def master():
+    text = _sym_details()
+    return SymbolMaster(fetch=lambda name, validators: (text if name == "NSE_FO" else "", {}),
+                        cache_dir=None)
+
+
+@pytest.mark.parametrize("symbol, expected", [
+    ("NSE:NIFTY50-INDEX", ("NSE_FO", "NIFTY")),
+    ("nse:niftybank-index", ("NSE_FO", "BANKNIFTY")),
+    ("NSE:NIFTYMIDCAP-INDEX", ("NSE_FO", "MIDCPNIFTY")),
+    ("BSE:SENSEX-INDEX", ("BSE_FO", "SENSEX")),
+    ("NSE:SBIN-EQ", ("NSE_FO", "SBIN")),
+    ("BSE:TCS-A", ("BSE_FO", "TCS")),
+    ("NSE:NIFTY25AUGFUT", ("NSE_FO", "NIFTY")),
+    ("MCX:CRUDEOIL25AUGFUT", ("MCX_COM", "CRUDEOIL")),
+    ("NSE:M&M25AUGFUT", ("NSE_FO", "M&M")),
+    ("MCX:GOLDM", ("MCX_COM", "GOLDM")),
+    ("LSE:VOD", None),
+    ("NSE:", None),
+    ("SBIN", None),
+])
+def test_fo_underlying(symbol, expected):
+    assert fo_underlying(symbol) == expected
+
+
+def test_option_expiries_nearest_first(master):
+    assert [e.day for e in option_expiries(master, "NSE:NIFTY50-INDEX")] == [EXPIRED, NEAR, FAR]
+    assert [e.day for e in option_expiries(master, "NSE:NIFTYBANK-INDEX")] == [NEAR]
+    assert option_expiries(master, "NSE:SBIN-EQ") == []
+
+
+def test_resolve_expiry(master):
+    resolve = lambda expiry: resolve_expiry(master, "NSE:NIFTY50-INDEX", expiry)
+    assert resolve("") == Expiry(NEAR, _close(NEAR))            # nearest not yet expired
+    assert resolve("28-AUG-25") == Expiry(EXPIRED, _close(EXPIRED))
+    assert resolve(str(_close(FAR))).day == FAR
+    midnight = IST.localize(datetime.datetime.combine(FAR, datetime.time(0))).timestamp()
+    assert resolve(str(int(midnight))).day == FAR               # same day, other instant
+    assert resolve("29-AUG-25") is None
+    assert resolve("next week") is None
+    assert resolve_expiry(master, "NSE:SBIN-EQ", "") is None
+
+
+def test_skeleton_centres_on_the_nearest_strike(master):
+    expiry = resolve_expiry(master, "NSE:NIFTY50-INDEX", "")
+    build = lambda spot, count=1: build_skeleton(master, "NSE:NIFTY50-INDEX", expiry, count, spot)
+
+    skeleton = build(24110)
+    assert skeleton.atm_strike == 24100 and list(skeleton.legs) == [24050, 24100, 24150]
+    assert build(24075).atm_strike == 24050                     # exactly between: lower strike
+    assert build(24075.01).atm_strike == 24100
+    assert build(1).atm_strike == 24000 and list(build(1).legs) == [24000, 24050]
+    assert build(99999).atm_strike == 24200
+    assert build(0).atm_strike == 24100                         # no spot: middle of the ladder
+    assert list(build(24110, 10).legs) == list(STRIKES)
+
+
+def test_skeleton_rows(master):
+    expiry = resolve_expiry(master, "NSE:NIFTY50-INDEX", "")
+    skeleton = build_skeleton(master, "NSE:NIFTY50-INDEX", expiry, 1, 24110)
+    rows = skeleton.rows()
+    assert [(r["strike"], r["is_atm"]) for r in rows] == [(24050, False), (24100, True), (24150, False)]
+    assert rows[1]["ce_symbol"] == f"NSE:NIFTY{NEAR:%y%m%d}24100CE"
+    assert rows[1]["pe_symbol"] == f"NSE:NIFTY{NEAR:%y%m%d}24100PE"
+    assert rows[1]["ce_ltp"] == rows[1]["pe_oi"] == 0
+    assert len(skeleton.symbols) == 6
+
+    other = Expiry(datetime.date(2030, 1, 1), 0)
+    assert build_skeleton(master, "NSE:NIFTY50-INDEX", other, 1, 24110) is None
+    assert build_skeleton(master, "LSE:VOD", expiry, 1, 24110) is None
@@ -0,0 +1,56 @@
+from APP_Extensions.chain_store import ChainSnapshotStore, FIELDS
+
+
+def _options(ltp: float, strikes=(24000, 24100)):
+    rows = []
+    for strike in strikes:
+        rows.append({"strike_price": strike, "option_type": "CE", "ltp": ltp, "oi": 100})
+        rows.append({"strike_price": strike, "option_type": "PE", "ltp": ltp + 1})
+    rows.append({"strike_price": 0, "option_type": "", "ltp": 24050})      # the underlying row
+    return rows
+
+
+def _store():
+    store = ChainSnapshotStore(max_samples=3)
+    store.record("NIFTY", "1756375200", 100, _options(10), spot=24050)
+    store.record("NIFTY", "1756375200", 200, _options(20), spot=24060)
+    store.record("NIFTY", "1756375200", 300, _options(30, strikes=(24100,)), spot=24070)
+    return store
+
+
+def test_as_of_picks_last_sample_at_or_before():
+    store = _store()
+    assert store.as_of("NIFTY", "1756375200", 99) is None
+    assert store.as_of("NIFTY", "1756375200", 100)["sample_time"] == 100
+    chain = store.as_of("NIFTY", "1756375200", 299)
+    assert chain["sample_time"] == 200 and chain["spot_price"] == 24060
+    assert chain["fields"] == list(FIELDS)
+    assert [row["strike"] for row in chain["strikes"]] == [24000, 24100]
+    assert chain["strikes"][0]["ce_ltp"] == 20 and chain["strikes"][0]["pe_ltp"] == 21
+    assert chain["strikes"][0]["pe_oi"] is None                 # not sent → null
+    assert store.as_of("NIFTY", "1756375200", 10 ** 10)["sample_time"] == 300
+    assert store.as_of("BANKNIFTY", "1756375200", 300) is None
+
+
+def test_out_of_order_samples_are_ignored():
+    store = _store()
+    assert store.record("NIFTY", "1756375200", 250, _options(99)) == 2
+    assert store.as_of("NIFTY", "1756375200", 260)["sample_time"] == 200
+
+
+def test_max_samples_and_clear():
+    store = _store()
+    store.record("NIFTY", "1756375200", 400, _options(40))
+    assert store.as_of("NIFTY", "1756375200", 150) is None      # sample 100 rolled off
+    store.clear(before=300)
+    assert store.keys()[0]["first"] == 300 and store.keys()[0]["samples"] == 2
+    store.clear()
+    assert store.keys() == []
+
+
+def test_strike_series_skips_samples_without_the_strike():
+    series = _store().strike_series("NIFTY", "1756375200", 24000.0, start=150)
+    assert series["times"] == [200]
+    assert series["series"]["ce_ltp"] == [20]
+    full = _store().strike_series("NIFTY", "1756375200", 24100.0)
+    assert full["times"] == [100, 200, 300] and full["spot_price"] == [24050, 24060, 24070]
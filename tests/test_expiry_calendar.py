@@ -0,0 +1,42 @@
+import datetime
+
+from APP_Extensions.expiry_calendar import ExpiryCalendar
+from APP_Extensions.symbol_master import SymbolFile, parse_sym_details, IST
+
+
+def _ts(day):
+    return int(IST.localize(datetime.datetime.combine(day, datetime.time(15, 30))).timestamp())
+
+
+def _row(ticker, desc, underlying, day, strike="", opt="XX"):
+    row = [""] * 17
+    row[0], row[1], row[3], row[4] = "1", desc, "50", "0.05"
+    row[8], row[9], row[13], row[15], row[16] = str(_ts(day)), ticker, underlying, strike, opt
+    return ",".join(row)
+
+
+def _calendar(name, rows):
+    calendar = ExpiryCalendar()
+    calendar.rebuild(SymbolFile(name, parse_sym_details(name, "\n".join(rows)), 0))
+    return calendar
+
+
+def test_labels_include_futures_only_underlyings():
+    aug, sep = datetime.date(2025, 8, 19), datetime.date(2025, 9, 19)
+    calendar = _calendar("MCX_COM", [
+        _row("MCX:CRUDEOIL25AUGFUT", "CRUDEOIL 25 Aug 19 FUT", "CRUDEOIL", aug),
+        _row("MCX:CRUDEOIL25SEPFUT", "CRUDEOIL 25 Sep 19 FUT", "CRUDEOIL", sep),
+    ])
+    assert calendar.labels("MCX_COM", "CRUDEOIL") == ["19-AUG-25", "19-SEP-25"]
+    assert calendar.labels("MCX_COM", "CRUDEOIL", "option") == []
+
+
+def test_labels_union_options_and_futures():
+    weekly, monthly = datetime.date(2025, 8, 21), datetime.date(2025, 8, 28)
+    calendar = _calendar("NSE_FO", [
+        _row("NSE:NIFTY2582124000CE", "NIFTY 25 Aug 21 24000 CE", "NIFTY", weekly, "24000", "CE"),
+        _row("NSE:NIFTY25AUG24000CE", "NIFTY 25 Aug 28 24000 CE", "NIFTY", monthly, "24000", "CE"),
+        _row("NSE:NIFTY25AUGFUT", "NIFTY 25 Aug 28 FUT", "NIFTY", monthly),
+    ])
+    assert calendar.labels("NSE_FO", "NIFTY") == ["21-AUG-25", "28-AUG-25"]
+    assert calendar.labels("NSE_FO", "NIFTY", "future") == ["28-AUG-25"]
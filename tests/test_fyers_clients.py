@@ -0,0 +1,128 @@
+import pytest
+
+from APP_Extensions import fyers_clients as fc
+from APP_Extensions.fyers_clients import Account, ClientRegistry
+
+
+class FakeClient:
+    def __init__(self, account):
+        self.account_id = account.id
+        self.token = account.access_token
+        self.header = f"{account.clientid}:{account.access_token}"
+
+
+def _account(account_id, token="tok", clientid="APP-100"):
+    return Account(account_id, "fyers", f"U{account_id}", clientid, token, None, None)
+
+
+@pytest.fixture
+def accounts(monkeypatch):
+    monkeypatch.setattr(fc, "token_expiry", lambda account: None)
+    return {1: _account(1, "a1"), 2: _account(2, "b1")}
+
+
+@pytest.fixture
+def registry(accounts):
+    built = []
+
+    def factory(account):
+        built.append(account.id)
+        return FakeClient(account)
+
+    registry = ClientRegistry(loader=lambda: list(accounts.values()), factory=factory)
+    registry.built = built
+    registry.accounts()
+    return registry
+
+
+def test_one_client_per_account(registry):
+    first, error = registry.get(1)
+    assert error is None and registry.get(1)[0] is first
+    assert registry.get()[0] is first                       # first account with a token
+    assert registry.built == [1]
+
+
+def test_token_change_keeps_the_client(registry, accounts):
+    client, _ = registry.get(1)
+    seen = []
+    registry.on_token_change(seen.append)
+
+    registry.set_token(1, "a2")
+    assert registry.get(1)[0] is client and client.token == "a2"
+    assert client.header == "APP-100:a2" and seen[-1].access_token == "a2"
+
+    accounts[1] = _account(1, "a3")                         # written by another worker
+    registry.invalidate()
+    assert registry.get(1)[0] is client and client.token == "a3"
+    assert [a.access_token for a in seen] == ["a2", "a3"]
+    assert registry.built == [1]
+
+
+def test_new_app_or_deleted_account_drops_the_client(registry, accounts):
+    client, _ = registry.get(1)
+    accounts[1] = _account(1, "a1", clientid="APP-200")
+    registry.invalidate()
+    assert registry.get(1)[0] is not client
+
+    del accounts[1]
+    registry.invalidate()
+    assert registry.get(1) == (None, "No FYERS access token found")
+
+
+def test_rate_budget_windows():
+    budget = fc.RateBudget(limits=((1.0, 2), (60.0, 4)))
+    assert budget.remaining(100.0) == 1.0
+    budget.record(100.0)
+    assert budget.remaining(100.5) == 0.5
+    budget.record(100.6)
+    assert budget.remaining(100.7) == 0.0                   # 1s window full
+    assert budget.remaining(101.7) == 0.5                   # ... 60s window half used
+    assert budget.used(101.7) == {"1s": 0, "60s": 2} and budget.backlog(101.7) == 2
+    assert budget.backlog(161.0) == 0
+
+    budget.exhaust(200.0, seconds=5)
+    assert budget.remaining(204.0) == 0.0 and budget.remaining(205.0) == 1.0
+
+
+def test_pick_avoids_exhausted_and_rejected_accounts(registry):
+    registry.throttled(_account(1, "a1"), seconds=60)
+    assert {registry.pick().id for _ in range(5)} == {2}
+
+    registry.reject(_account(2, "b1"))
+    assert [a.id for a in registry.usable()] == [1]
+    assert registry.pick().id == 1                          # over budget but the only one left
+    assert registry.pick(exclude=[1]) is None
+
+
+def test_pick_weights_by_remaining_budget(registry, monkeypatch):
+    for _ in range(150):                                    # account 1 used 3/4 of its minute
+        registry.budget(1).record(fc.time.time() - 30)
+    seen = []
+    monkeypatch.setattr(fc.random, "choices", lambda population, weights: seen.append(weights) or population)
+    registry.pick()
+    assert seen == [[0.25, 1.0]]
+
+
+def test_balanced_client_fails_over(registry, monkeypatch):
+    replies = {1: {"code": -16, "message": "token expired"}, 2: {"code": 200, "s": "ok"}}
+    down = []
+    registry.on_account_down(down.append)
+    for account_id in (1, 2):
+        client = registry.client(_account(account_id))
+        client.quotes = lambda data, account_id=account_id: replies[account_id]
+    monkeypatch.setattr(fc.random, "choices", lambda population, weights: population)
+
+    client, error = registry.balanced()
+    assert error is None
+    assert client.quotes({"symbols": "NSE:SBIN-EQ"}) == {"code": 200, "s": "ok"}
+    assert [a.id for a in down] == [1]
+    assert [a.id for a in registry.usable()] == [2]
+
+
+def test_balanced_client_returns_last_error_when_every_account_fails(registry):
+    for account_id in (1, 2):
+        registry.client(_account(account_id)).quotes = lambda data: {"code": 429, "s": "error"}
+    client, _ = registry.balanced()
+    assert client.quotes({}) == {"code": 429, "s": "error"}
+    assert registry.budget(1).remaining(fc.time.time()) == 0.0
+    assert registry.budget(2).remaining(fc.time.time()) == 0.0
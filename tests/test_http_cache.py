@@ -0,0 +1,155 @@
+import pytest
+from flask import Flask
+
+from APP_Extensions import http_cache
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(http_cache, "_sequences", {})
+    monkeypatch.setattr(http_cache, "_listeners", {})
+    monkeypatch.setattr(http_cache, "_shared", {})
+    monkeypatch.setattr(http_cache, "_store", {})
+    monkeypatch.setattr(http_cache, "_global", set())
+    return Flask(__name__)
+
+
+def _poll(app, respond, headers=None):
+    with app.test_request_context(headers=headers or {}):
+        return respond()
+
+
+def test_conditional_json_answers_304_for_current_tag(app):
+    built = []
+    tag = http_cache.etag_for("things", 3)
+
+    def respond():
+        return http_cache.conditional_json(tag, lambda: built.append(1) or {"n": 3}, last_modified=1e9)
+
+    first = _poll(app, respond)
+    assert first.status_code == 200 and first.get_json() == {"n": 3}
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = _poll(app, respond, {"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert built == [1]
+
+    other = _poll(app, respond, {"If-None-Match": '"some-other-tag"'})
+    assert other.status_code == 200
+
+
+def test_if_modified_since_is_used_without_if_none_match(app):
+    respond = lambda: http_cache.conditional_json("t", lambda: {}, last_modified=1e9)
+    last_modified = _poll(app, respond).headers["Last-Modified"]
+    assert _poll(app, respond, {"If-Modified-Since": last_modified}).status_code == 304
+
+
+def test_versioned_cache_only_renders_changed_data(app):
+    cache = http_cache.VersionedCache(ttl=60)
+    renders = []
+    render = lambda data: lambda modified: renders.append(data) or {"data": data}
+
+    with app.app_context():
+        entry = cache.store("k", [1], render([1]))
+        assert cache.store("k", [1], render([1])) is entry and entry.seq == 1
+        assert cache.store("k", [2], render([2])).seq == 2
+    assert renders == [[1], [2]]
+    assert cache.fresh("k") is entry and cache.fresh("missing") is None
+
+    with app.test_request_context():
+        tag = cache.response(entry, "k").headers["ETag"]
+    with app.test_request_context(headers={"If-None-Match": tag}):
+        assert cache.response(entry, "k").status_code == 304
+
+
+def test_versioned_cache_evicts_least_recently_checked(app):
+    cache = http_cache.VersionedCache(ttl=60, max_keys=2)
+    with app.app_context():
+        for key in ("a", "b", "c"):
+            cache.store(key, key, lambda modified: {})
+    assert cache.fresh("a") is None
+    assert cache.fresh("b") and cache.fresh("c")
+
+
+def test_local_sequence_and_listeners(app):
+    seen = []
+    http_cache.on_bump("local", seen.append)
+    assert http_cache.sequence("local")[0] == 0
+    assert http_cache.bump("local") == 1 and http_cache.bump("local") == 2
+    assert seen == [1, 2]
+
+
+def test_shared_sequence_follows_other_workers(app, monkeypatch):
+    table = {}
+
+    def advance(name, now):
+        table[name] = (table.get(name, (0, 0))[0] + 1, now)
+        return table[name]
+
+    http_cache.share_through(table.get, advance)
+    name = http_cache.shared("rows")
+
+    with app.app_context():
+        assert http_cache.bump(name) == 1
+        table[name] = (5, 123.0)                # written by another worker
+        assert http_cache.sequence(name)[0] == 1        # synced moments ago
+        monkeypatch.setattr(http_cache, "SHARED_RECHECK_SECONDS", 0)
+        assert http_cache.sequence(name) == (5, 123.0)
+        assert http_cache.bump(name) == 6
+
+    # Outside an app context the process-local copy is used
+    assert http_cache.bump(name) == 7
+    assert table[name][0] == 6
+
+
+def test_shared_sequence_falls_back_when_the_store_fails(app):
+    def broken(*args):
+        raise RuntimeError("no table")
+
+    http_cache.share_through(broken, broken)
+    name = http_cache.shared("rows")
+    with app.app_context():
+        assert http_cache.bump(name) == 1
+        assert http_cache.sequence(name)[0] == 1
+
+
+def _process(monkeypatch, nonce, load, advance):
+    """Fresh module state, as a newly started worker has it"""
+    for name, value in (("_sequences", {}), ("_shared", {}), ("_global", set()), ("_store", {}),
+                        ("_NONCE", nonce)):
+        monkeypatch.setattr(http_cache, name, value)
+    http_cache.share_through(load, advance)
+    return http_cache.shared("rows")
+
+
+def test_shared_tags_match_across_processes(app, monkeypatch):
+    table = {}
+
+    def advance(name, now):
+        table[name] = (table.get(name, (0, 0))[0] + 1, now)
+        return table[name]
+
+    monkeypatch.setattr(http_cache, "SHARED_RECHECK_SECONDS", 0)
+    with app.app_context():
+        name = _process(monkeypatch, "worker-a", table.get, advance)
+        unwritten_a = http_cache.shared_etag([name], "rows", 7)
+        http_cache.bump(name)
+        tag_a = http_cache.shared_etag([name], "rows", 7)
+        assert http_cache.etag_for("rows", 7).startswith("worker-a")
+
+        name = _process(monkeypatch, "worker-b", table.get, advance)
+        assert http_cache.shared_etag([name], "rows", 7) == tag_a
+        assert tag_a != unwritten_a == "db-0-rows-7"
+
+    with app.test_request_context(headers={"If-None-Match": f'"{tag_a}"'}):
+        assert http_cache.conditional_json(tag_a, lambda: {}).status_code == 304
+
+
+def test_shared_tags_keep_the_nonce_while_the_store_is_down(app, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("no table")
+
+    with app.app_context():
+        name = _process(monkeypatch, "worker-a", broken, broken)
+        http_cache.bump(name)
+        assert http_cache.shared_etag([name], "rows") == "worker-a-1-rows"
@@ -0,0 +1,118 @@
+import http.server, socketserver, threading, time
+
+import pytest
+import requests
+
+from APP_Extensions import http_client as hc
+from APP_Extensions.http_client import HttpClient
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits: dict = {}
+    replies: dict = {}                  # path → list of statuses, last one repeats
+
+    def log_message(self, *args):
+        pass
+
+    def _answer(self, body=b"ok"):
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/slow":
+            self.send_response(200)
+            self.send_header("Content-Length", str(8 * 1024))
+            self.end_headers()
+            try:
+                for _ in range(8):
+                    self.wfile.write(b"x" * 1024)
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass                    # the client gave up
+            return
+        statuses = self.replies.get(self.path, [200])
+        status = statuses[min(self.hits[self.path], len(statuses)) - 1]
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._answer()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(hc, "BACKOFF_BASE_SECONDS", 0.001)
+    _Handler.hits, _Handler.replies = {}, {}
+    srv = _Server(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", _Handler
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_get_retries_retryable_statuses(server):
+    base, handler = server
+    handler.replies["/flaky"] = [503, 429, 200]
+    client = HttpClient(max_retries=2)
+    assert client.get(base + "/flaky").status_code == 200
+    assert handler.hits["/flaky"] == 3
+    stats = client.status()["hosts"][base[len("http://"):]]
+    assert stats["retries"] == 2 and stats["requests"] == 3 and stats["last_status"] == 200
+
+
+def test_retries_are_bounded_and_the_last_response_returned(server):
+    base, handler = server
+    handler.replies["/down"] = [502]
+    assert HttpClient(max_retries=1).get(base + "/down").status_code == 502
+    assert handler.hits["/down"] == 2
+    handler.replies["/missing"] = [404]
+    assert HttpClient(max_retries=3).get(base + "/missing").status_code == 404
+    assert handler.hits["/missing"] == 1
+
+
+def test_post_is_only_retried_when_marked_idempotent(server):
+    base, handler = server
+    handler.replies["/order"] = [503, 200]
+    client = HttpClient(max_retries=2)
+    assert client.post(base + "/order", json={}).status_code == 503
+    assert handler.hits["/order"] == 1
+
+    handler.replies["/quotes"] = [503, 200]
+    assert client.post(base + "/quotes", json={}, idempotent=True).status_code == 200
+    assert handler.hits["/quotes"] == 2
+
+
+def test_refused_connections_are_retried_even_for_post(monkeypatch):
+    client = HttpClient(max_retries=2)
+    monkeypatch.setattr(hc, "BACKOFF_BASE_SECONDS", 0.001)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post("http://127.0.0.1:1/order", json={})
+    assert client.status()["hosts"]["127.0.0.1:1"]["retries"] == 2
+
+
+def test_download_deadline(server):
+    base, _ = server
+    client = HttpClient()
+    assert client.download(base + "/file").content == b"ok"
+    with pytest.raises(hc.DownloadTooSlow):
+        client.download(base + "/slow", deadline=0.3, chunk_size=1024)
+
+
+def test_backoff_honours_retry_after_up_to_the_cap():
+    response = requests.Response()
+    response.headers["Retry-After"] = "2"
+    assert HttpClient._backoff(0, response) == 2.0
+    response.headers["Retry-After"] = "600"
+    assert HttpClient._backoff(0, response) == hc.BACKOFF_CAP_SECONDS
+    assert 0 <= HttpClient._backoff(10) <= hc.BACKOFF_CAP_SECONDS
@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from APP_Extensions.indicators import IndicatorSet, parse_spec
+
+
+def _candles(n=60, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high, low = close + rng.uniform(0, 1, n), close - rng.uniform(0, 1, n)
+    return [[1_700_000_000 + 60 * i, c, h, l, c, 1000 + i] for i, (c, h, l) in enumerate(zip(close, high, low))]
+
+
+@pytest.mark.parametrize("spec", [
+    "rsi:-3", "bb:0", "supertrend:0", "ema:0", "atr:2.5", "ema:inf", "ema:nan",
+    "bb:20:0", "supertrend:10:-1", "ema:1:2", "vwap:3", "macd:12", "ema:x",
+])
+def test_parse_spec_rejects_bad_parameters(spec):
+    with pytest.raises(ValueError):
+        parse_spec(spec)
+
+
+def test_parse_spec_keys():
+    keys = [ind.key for ind in parse_spec("ema:20,rsi:14,bb:20:2.5,vwap,supertrend")]
+    assert keys == ["ema_20", "rsi_14", "bb_20_2.5", "vwap", "supertrend_10_3"]
+
+
+def test_smallest_accepted_periods_evaluate():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = IndicatorSet(parse_spec("ema:1,rsi:1,atr:1,bb:1:0.5,supertrend:1:0.5")).update(_candles())
+    for series in out.values():
+        for values in (series.values() if isinstance(series, dict) else [series]):
+            assert len(values) == 60
+
+
+def test_incremental_update_matches_full_recompute():
+    candles = _candles(80)
+    spec = "ema:10,rsi:14,atr:14,bb:20:2,vwap,supertrend:10:3"
+    incremental = IndicatorSet(parse_spec(spec))
+    incremental.update(candles[:60])
+    stepped = incremental.update(candles[:80])
+    full = IndicatorSet(parse_spec(spec)).update(candles[:80])
+    assert stepped == full
+
+
+def test_repeated_indicator_is_computed_once():
+    assert [ind.key for ind in parse_spec("ema:20,rsi:14,ema:20,ema:20.0")] == ["ema_20", "rsi_14"]
+    candles = _candles(80)
+    indicators = IndicatorSet(parse_spec("ema:20,ema:20"))
+    indicators.update(candles[:60])
+    out = indicators.update(candles)
+    assert list(out) == ["ema_20"] and len(out["ema_20"]) == 80
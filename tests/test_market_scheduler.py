@@ -0,0 +1,107 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+import pytz
+from flask import Response
+
+from APP_Extensions import market_scheduler as ms
+from APP_Extensions.market_holidays import HolidayCalendar
+from APP_Extensions.market_scheduler import MarketScheduler
+from APP_Extensions.market_sessions import MarketFacts, SessionEngine, _hm
+
+
+def _facts(market_id=1, code="NSE", tz="Asia/Kolkata", open_="09:15", close="15:30", premarket=None):
+    return MarketFacts(market_id, code, "India", code, tz, frozenset({1, 2, 3, 4, 5}),
+                       open_, close, _hm(open_), _hm(close), _hm(premarket), None,
+                       None, None, True, True, False)
+
+
+def _at(*args, tz="Asia/Kolkata") -> float:
+    """2025-08-25 is a Monday"""
+    return pytz.timezone(tz).localize(datetime.datetime(2025, 8, *args)).timestamp()
+
+
+def _scheduler(*facts):
+    holidays = HolidayCalendar("test-holidays", loader=lambda: [])
+    engine = SessionEngine("test-markets", holidays, loader=lambda: list(facts))
+    return MarketScheduler(engine_factory=lambda: engine, enabled=True)
+
+
+WARMUP, GRACE = ms.WARMUP_LEAD_SECONDS, ms.GRACE_SECONDS
+
+
+def test_phase_through_a_trading_day():
+    scheduler = _scheduler(_facts())
+    phase = lambda now: scheduler.phase("nse", now)
+    assert phase(_at(25, 9, 15) - WARMUP - 1) == "closed"
+    assert phase(_at(25, 9, 15) - WARMUP) == "warmup"
+    assert phase(_at(25, 9, 15)) == "open"
+    assert phase(_at(25, 15, 30) + GRACE - 1) == "open"               # grace after the close
+    assert phase(_at(25, 15, 30) + GRACE) == "closed"
+    assert phase(_at(30, 10, 0)) == "closed"                          # Saturday
+
+    assert scheduler.phase("LSE", _at(25, 10, 0)) is None             # not scheduled
+    assert MarketScheduler(scheduler._engine_factory, enabled=False).phase("NSE", _at(25, 10, 0)) is None
+
+
+def test_warmup_leads_the_premarket():
+    scheduler = _scheduler(_facts(premarket="09:00"))
+    assert scheduler.phase("NSE", _at(25, 9, 0) - WARMUP - 1) == "closed"
+    assert scheduler.phase("NSE", _at(25, 9, 0) - WARMUP) == "warmup"
+    assert scheduler.phase("NSE", _at(25, 9, 10)) == "warmup"         # pre-open, not trading
+    assert scheduler.phase("NSE", _at(25, 9, 15)) == "open"
+
+
+def test_frozen_between_sessions():
+    scheduler = _scheduler(_facts())
+    monday_end, tuesday_open = _at(25, 15, 30) + GRACE, _at(26, 9, 15)
+    assert scheduler.frozen("NSE", _at(25, 20, 0)) == (monday_end, tuesday_open)
+    assert scheduler.frozen("NSE", _at(26, 9, 12)) == (monday_end, tuesday_open)   # warm-up
+    assert scheduler.frozen("NSE", _at(26, 10, 0)) is None
+    assert scheduler.frozen("NSE", _at(26, 15, 32)) is None                        # grace
+
+
+def test_frozen_before_the_first_session_of_the_window():
+    scheduler = _scheduler(_facts())
+    monday_morning = _at(25, 8, 0)
+    # The window starts on Saturday: nothing traded between its start and the open
+    since, until = scheduler.frozen("NSE", monday_morning)
+    first_day = scheduler.engine.timelines(monday_morning)[0].days[0]
+    assert since == first_day.start and first_day.date.isoweekday() == 6
+    assert until == _at(25, 9, 15)
+
+
+def test_next_change():
+    scheduler = _scheduler(_facts(), _facts(2, "LSE", "Europe/London", "08:00", "16:30"))
+    assert scheduler.next_change(_at(25, 8, 0)) == _at(25, 9, 15) - WARMUP
+    assert scheduler.next_change(_at(25, 9, 12)) == _at(25, 9, 15)
+    # London warms up (05:30 there) before the NSE closes, then closes after it
+    assert scheduler.next_change(_at(25, 10, 0)) == _at(25, 8, 0, tz="Europe/London") - WARMUP
+    assert scheduler.next_change(_at(25, 12, 30)) == _at(25, 15, 30) + GRACE
+    assert scheduler.next_change(_at(25, 16, 0)) == _at(25, 16, 30, tz="Europe/London") + GRACE
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(ms, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_annotate_tells_a_closed_market_when_to_poll(clock):
+    scheduler = _scheduler(_facts(), _facts(2, "LSE", "Europe/London", "08:00", "16:30"))
+    headers = lambda *symbols: dict(scheduler.annotate(Response(), symbols).headers)
+
+    clock.now = _at(25, 23, 0)                      # both shut for the night
+    got = headers("NSE:SBIN-EQ", "LSE:VOD")
+    assert got["X-Market-Session"] == "closed" and got["X-Poll-After"] == str(ms.CLIENT_BACKOFF_MAX_SECONDS)
+
+    clock.now = _at(26, 9, 15) - WARMUP - 120       # two minutes before the NSE warm-up
+    assert headers("NSE:SBIN-EQ")["X-Poll-After"] == "120"
+
+    clock.now = _at(26, 10, 0)                      # NSE open, London still shut
+    got = headers("NSE:SBIN-EQ", "LSE:VOD")
+    assert got["X-Market-Session"] == "open" and "X-Poll-After" not in got
+
+    assert "X-Market-Session" not in headers("NASDAQ:AAPL", "SBIN")
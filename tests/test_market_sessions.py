@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+import pytz
+
+from APP_Extensions.market_holidays import HolidayCalendar, HolidayEntry, parse_entry
+from APP_Extensions.market_sessions import MarketFacts, MarketTimeline, SessionEngine, _hm
+
+
+def _facts(market_id=1, code="NSE", tz="Asia/Kolkata", open_="09:15", close="15:30",
+           lunch=(None, None)):
+    return MarketFacts(market_id, code, "India", code, tz, frozenset({1, 2, 3, 4, 5}),
+                       open_, close, _hm(open_), _hm(close), None, None,
+                       _hm(lunch[0]), _hm(lunch[1]), True, True, False)
+
+
+def _at(tz: str, *args) -> float:
+    return pytz.timezone(tz).localize(datetime.datetime(*args)).timestamp()
+
+
+def _engine(facts, entries=()):
+    holidays = HolidayCalendar("test-holidays", loader=lambda: list(entries))
+    return SessionEngine("test-markets", holidays, loader=lambda: list(facts))
+
+
+def test_status_through_a_trading_day():
+    engine = _engine([_facts(lunch=("12:00", "13:00"))])
+    status = lambda *hm: engine.current_status(_at("Asia/Kolkata", 2025, 8, 25, *hm))[0]
+    assert (status(8, 0)["status"], status(8, 0)["next_event"]) == ("pre_market", "opening")
+    assert status(10, 0)["status"] == "open" and status(10, 0)["local_time"] == "10:00"
+    assert status(12, 30)["status"] == "lunch_break"
+    assert (status(16, 0)["status"], status(16, 0)["next_event"]) == ("closed", "closed_day")
+    saturday = engine.current_status(_at("Asia/Kolkata", 2025, 8, 30, 10, 0))[0]
+    assert saturday["next_event"] == "closed_weekend" and not saturday["is_trading_day"]
+
+
+def test_next_transition_and_upcoming_sessions():
+    engine = _engine([_facts()])
+    friday_close = _at("Asia/Kolkata", 2025, 8, 29, 15, 30)
+    assert engine.next_transition(friday_close - 60) == friday_close
+    sessions = engine.timeline(2, friday_close + 60)["markets"][0]["sessions"]
+    assert [s["date"] for s in sessions] == ["2025-09-01", "2025-09-02"]
+    assert sessions[0]["open"] == "2025-09-01T03:45:00+00:00"
+
+
+def test_window_rolls_over_and_reloads_rows():
+    facts = [_facts()]
+    engine = _engine(facts)
+    monday = _at("Asia/Kolkata", 2025, 8, 25, 10, 0)
+    engine.timelines(monday)
+    version = engine.version
+    engine.timelines(monday + 30)
+    assert engine.version == version                        # nothing changed
+
+    later = monday + 20 * 86400                             # past the precomputed window
+    assert engine.current_status(later)[0]["local_date"] == "2025-09-14"
+    assert engine.version == version + 1
+
+    facts.append(_facts(2, "LSE", "Europe/London", "08:00", "16:30"))
+    assert len(engine.current_status(later + 120)) == 2     # re-read after RECHECK_SECONDS
+
+
+def test_dst_switch_inside_a_day():
+    day = MarketTimeline(_facts(tz="America/New_York", open_="09:30", close="16:00"),
+                         datetime.date(2025, 3, 9), 2).days[0]
+    assert (day.offset, day.offset_after) == (-5 * 3600, -4 * 3600)
+    switch = _at("America/New_York", 2025, 3, 9, 3, 0)
+    assert switch <= day.offset_change < switch + 60          # found to the minute
+    assert day.local_offset(day.offset_change - 1) == -5 * 3600
+    assert day.end - day.start == 23 * 3600
+
+
+def test_holidays_and_special_sessions():
+    entries = [
+        HolidayEntry("NSE", datetime.date(2025, 8, 27), "holiday", "Ganesh Chaturthi", None, None),
+        HolidayEntry("NSE", datetime.date(2025, 8, 31), "special", "Muhurat trading",
+                     _hm("18:00"), _hm("19:00")),
+    ]
+    engine = _engine([_facts()], entries)
+
+    holiday = engine.current_status(_at("Asia/Kolkata", 2025, 8, 27, 10, 0))[0]
+    assert holiday["next_event"] == "closed_holiday" and holiday["session_note"] == "Ganesh Chaturthi"
+    assert engine.has_session("nse", _at("Asia/Kolkata", 2025, 8, 27, 10, 0)) is False
+
+    sunday = _at("Asia/Kolkata", 2025, 8, 31, 18, 30)
+    assert engine.current_status(sunday)[0]["status"] == "open"
+    assert engine.has_session("NSE", sunday) is True
+    assert engine.has_session("NYSE", sunday) is None
+
+    sessions = _engine([_facts()], entries).timeline(3, _at("Asia/Kolkata", 2025, 8, 26, 16, 0))["markets"][0]["sessions"]
+    assert [s["date"] for s in sessions] == ["2025-08-28", "2025-08-29", "2025-08-31"]
+
+
+def test_parse_entry_validation():
+    entry = parse_entry({"exchange": " nse ", "date": "2025-10-21", "session_type": "Special",
+                         "open_time": "18:00", "close_time": "19:00"})
+    assert entry["exchange_code"] == "NSE" and entry["holiday_date"] == datetime.date(2025, 10, 21)
+    assert parse_entry({"exchange_code": "NSE", "date": "2025-10-02",
+                        "open_time": "09:00"})["open_time"] is None
+    for bad in ({"date": "2025-10-02"},
+                {"exchange_code": "NSE", "date": "02-10-2025"},
+                {"exchange_code": "NSE", "date": "2025-10-02", "session_type": "half"},
+                {"exchange_code": "NSE", "date": "2025-10-02", "session_type": "special",
+                 "open_time": "19:00", "close_time": "18:00"}):
+        with pytest.raises(ValueError):
+            parse_entry(bad)
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from APP_Extensions.quote_batcher import QuoteBatcher
+
+
+def _gather(batcher, symbols):
+    """get() every symbol from its own thread → {index: quote or error}"""
+    results = {}
+    start = threading.Barrier(len(symbols))
+
+    def ask(i, symbol):
+        start.wait()
+        try:
+            results[i] = batcher.get(symbol)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=ask, args=(i, s)) for i, s in enumerate(symbols)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [results[i] for i in range(len(symbols))]
+
+
+def test_concurrent_requests_share_one_fetch():
+    calls = []
+
+    def fetch(symbols):
+        calls.append(sorted(symbols))
+        return {s: {"ltp": len(s)} for s in symbols if s != "NSE:GONE-EQ"}
+
+    batcher = QuoteBatcher(fetch, window=0.2)
+    symbols = ["NSE:SBIN-EQ", "NSE:TCS-EQ", "NSE:SBIN-EQ", "NSE:GONE-EQ"] * 3
+    results = _gather(batcher, symbols)
+
+    assert calls == [["NSE:GONE-EQ", "NSE:SBIN-EQ", "NSE:TCS-EQ"]]
+    assert results[0] == {"ltp": 11} and results[1] == {"ltp": 10} and results[3] is None
+    status = batcher.status()
+    assert status["requests"] == 12 and status["batches"] == 1 and status["symbols_fetched"] == 3
+    assert status["joined"] == 9
+
+
+def test_recent_answers_are_reused_until_max_age():
+    calls = []
+    batcher = QuoteBatcher(lambda symbols: calls.append(symbols) or {s: {"ltp": 1} for s in symbols},
+                           window=0, max_age=60)
+    assert batcher.get("NSE:SBIN-EQ") == {"ltp": 1}
+    assert batcher.get("NSE:SBIN-EQ") == {"ltp": 1}
+    assert len(calls) == 1 and batcher.status()["reused"] == 1
+
+    batcher.max_age = 0
+    batcher.get("NSE:SBIN-EQ")
+    assert len(calls) == 2
+
+
+def test_fetch_error_reaches_every_waiter_and_is_not_cached():
+    failing = [True]
+
+    def fetch(symbols):
+        if failing[0]:
+            raise ConnectionError("upstream down")
+        return {s: {"ltp": 2} for s in symbols}
+
+    batcher = QuoteBatcher(fetch, window=0.2)
+    results = _gather(batcher, ["NSE:SBIN-EQ", "NSE:SBIN-EQ", "NSE:TCS-EQ"])
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+    failing[0] = False
+    assert batcher.get("NSE:SBIN-EQ") == {"ltp": 2}
+    with pytest.raises(KeyError):
+        QuoteBatcher(lambda symbols: {}["x"], window=0).get("NSE:SBIN-EQ")
@@ -0,0 +1,99 @@
+import itertools, os, threading
+
+import pytest
+
+from APP_Extensions import quote_table
+from APP_Extensions.quote_table import QuoteTable, QuoteView, SEQ, _slot_offset
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    # Writer and readers share this process's resource tracker here
+    monkeypatch.setattr(quote_table.resource_tracker, "unregister", lambda name, rtype: None)
+    table = QuoteTable.create(f"test_quotes_{os.getpid()}_{next(_names)}", slots=4)
+    yield table
+    table.close()
+
+
+def _quote(n: float) -> dict:
+    return {"ltp": n, "volume": n, "oi": n, "change": n, "bid": n, "ask": n}
+
+
+def test_worker_reads_what_the_feed_publishes(table):
+    table.publish("NSE:SBIN-EQ", {"ltp": 801.5, "volume": 12.0, "bid": 801.4}, ts=1756000000)
+    reader = QuoteTable.attach(table._shm.name)
+    try:
+        quote = reader.read("NSE:SBIN-EQ")
+        assert quote["ltp"] == 801.5 and quote["volume"] == 12 and quote["oi"] == 0
+        assert reader.read("NSE:TCS-EQ") is None
+
+        generation = reader.generation
+        table.publish("NSE:SBIN-EQ", {"ltp": 802.0})      # same slot: no index rebuild
+        assert reader.generation == generation and reader.read("NSE:SBIN-EQ")["ltp"] == 802.0
+        table.publish("NSE:TCS-EQ", {"ltp": 3100.0})
+        assert reader.generation == generation + 1
+        assert set(reader.snapshot()) == {"NSE:SBIN-EQ", "NSE:TCS-EQ"}
+    finally:
+        reader.close()
+
+
+def test_least_recently_updated_slot_is_recycled(table):
+    for i in range(4):
+        table.publish(f"S{i}", _quote(i), ts=100 + i)
+    table.publish("S0", _quote(0), ts=200)
+    table.publish("S4", _quote(4), ts=201)
+    assert set(table.index()) == {"S0", "S2", "S3", "S4"}
+    table.discard("S2")
+    assert table.read("S2") is None and len(table.index()) == 3
+
+
+def test_reader_gives_up_on_a_slot_being_written(table, monkeypatch):
+    table.publish("S0", _quote(1))
+    monkeypatch.setattr(quote_table, "READ_RETRIES", 3)
+    off = _slot_offset(table.index()["S0"])
+    seq = SEQ.unpack_from(table._buf, off)[0]
+    SEQ.pack_into(table._buf, off, seq + 1)               # writer stopped mid-record
+    assert table.read("S0") is None
+    SEQ.pack_into(table._buf, off, seq + 2)
+    assert table.read("S0")["ltp"] == 1
+
+
+def test_concurrent_reads_never_see_a_torn_record(table):
+    reader = QuoteTable.attach(table._shm.name)
+    table.publish("S0", _quote(0))
+    done = threading.Event()
+
+    def write():
+        for n in range(1, 20000):
+            table.publish("S0", _quote(n))
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        while not done.is_set():
+            quote = reader.read("S0")
+            if quote is not None:
+                assert quote["ltp"] == quote["bid"] == quote["ask"] == quote["volume"]
+    finally:
+        writer.join()
+        reader.close()
+
+
+def test_view_attaches_late_and_drops_a_dead_feed(table, monkeypatch):
+    view = QuoteView(f"test_quotes_missing_{os.getpid()}")
+    assert len(view) == 0 and view.snapshot() == {}
+
+    view = QuoteView(table._shm.name)
+    table.publish("S0", _quote(5))
+    table.heartbeat()
+    assert view["S0"]["ltp"] == 5 and list(view) == ["S0"]
+    with pytest.raises(KeyError):
+        view["S1"]
+
+    attached = view.table
+    monkeypatch.setattr(quote_table, "STALE_SECONDS", 0.0)   # heartbeat too old
+    view._retry_at = 0.0
+    assert view.table is not attached and view["S0"]["ltp"] == 5
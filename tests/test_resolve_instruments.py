@@ -0,0 +1,78 @@
+import pytest
+
+from APP_Extensions.symbol_master import SymbolMaster
+
+NSE_CM = """\
+10100000003045,STATE BANK OF INDIA,0,1,0.05,INE062A01020,0915-1530|1815-1915:,2025-08-26,,NSE:SBIN-EQ,10,10,3045,SBIN,3045,-1.0,XX,10100000003045,None,0,0.0
+101000000026000,NIFTY 50,10,1,0.05,,0915-1530|1815-1915:,2025-08-26,,NSE:NIFTY50-INDEX,10,10,26000,NIFTY,26000,-1.0,XX,101000000026000,None,0,0.0
+"""
+NSE_FO = """\
+101125082835000,NIFTY 25 Aug FUT,11,75,0.1,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUGFUT,11,11,35000,NIFTY,26000,-1.0,XX,101000000026000,None,0,0.0
+101125082843210,NIFTY 25 Aug 28 24000 CE,14,75,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUG24000CE,11,11,43210,NIFTY,26000,24000.0,CE,101000000026000,None,0,0.0
+101125082851000,SBIN 25 Aug FUT,11,750,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:SBIN25AUGFUT,11,11,51000,SBIN,3045,-1.0,XX,10100000003045,None,0,0.0
+"""
+
+
+@pytest.fixture
+def client(flask_app, monkeypatch):
+    from APP_Routes import symbol_selector
+    fetched = []
+
+    def fetch(name, validators):
+        fetched.append(name)
+        if name == "MCX_COM":
+            raise ConnectionError("server down")
+        return {"NSE_CM": NSE_CM, "NSE_FO": NSE_FO}.get(name, ""), {}
+
+    monkeypatch.setattr(symbol_selector, "symbol_master", SymbolMaster(fetch=fetch, cache_dir=None))
+    client = flask_app.test_client()
+    client.fetched = fetched
+    return client
+
+
+def _resolve(client, items):
+    resp = client.post("/resolve_instruments", json={"items": items})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_batch_comes_back_in_request_order(client):
+    body = _resolve(client, ["NSE:NIFTY25AUG24000CE", "NIFTY",
+                             {"type": "exchange", "exchange": "NSE", "symbol": "sbin"},
+                             "NSE:NOPE-EQ"])
+    option, index, equity, unknown = body["results"]
+    assert body["resolved"] == 3
+
+    assert option["input"] == "NSE:NIFTY25AUG24000CE" and option["found"]
+    assert (option["kind"], option["strike"], option["expiry"]) == ("option", 24000.0, "28-AUG-25")
+
+    assert index["symbol_code"] == "NSE:NIFTY50-INDEX" and index["lot_size"] == 75
+    assert index["kind"] == "cash"                       # details from the NSE_CM row
+
+    assert equity["symbol_code"] == "NSE:SBIN-EQ" and equity["lot_size"] == 750
+
+    assert unknown == {"input": "NSE:NOPE-EQ", "found": False, "error": "Not found"}
+
+
+def test_bad_items_fail_alone(client):
+    body = _resolve(client, ["NSE:SBIN-EQ", "NOT AN INDEX", {"symbol": ""}, 42,
+                             {"type": "exchange", "exchange": "LSE", "symbol": "VOD"},
+                             {"type": "strategy", "symbol": "X"}, "MCX:GOLD25AUGFUT"])
+    assert body["resolved"] == 1 and body["results"][0]["symbol_code"] == "NSE:SBIN-EQ"
+    assert [r.get("error") for r in body["results"][1:]] == [
+        "Not found", "Missing symbol", "Each item must be a string or an object",
+        "Invalid exchange provided", "Invalid type. Use 'symbol', 'index' or 'exchange'",
+        "Symbol master unavailable: server down"]
+
+
+def test_failed_file_is_not_refetched_within_a_batch(client):
+    body = _resolve(client, ["MCX:GOLD25AUGFUT", "MCX:SILVER25AUGFUT"])
+    assert body["resolved"] == 0
+    assert client.fetched.count("MCX_COM") == 1
+
+
+def test_rejects_bad_batches(client):
+    assert client.post("/resolve_instruments", json={"items": []}).status_code == 400
+    assert client.post("/resolve_instruments", json={"items": "NSE:SBIN-EQ"}).status_code == 400
+    too_many = ["NSE:SBIN-EQ"] * 501
+    assert client.post("/resolve_instruments", json={"items": too_many}).status_code == 400
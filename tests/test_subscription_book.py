@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from APP_Extensions import subscription_book as sb
+from APP_Extensions.subscription_book import SubscriptionBook
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(sb, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def book(clock):
+    return SubscriptionBook(idle_seconds=600)
+
+
+def test_shared_symbol_stays_until_the_last_session_leaves(book):
+    assert book.set("a", "chain", ["NIFTY-CE", "NIFTY-PE"]) == (["NIFTY-CE", "NIFTY-PE"], [])
+    assert book.set("b", "watch", ["NIFTY-PE", "SBIN"]) == (["SBIN"], [])
+    assert book.status()["shared_symbols"] == 1
+
+    assert book.drop("a") == ([], ["NIFTY-CE"])
+    assert book.union() == ["NIFTY-PE", "SBIN"]
+    assert book.drop("b") == ([], ["NIFTY-PE", "SBIN"])
+    assert book.union() == [] and book.status()["sessions"] == 0
+
+
+def test_replacing_a_view_changes_only_the_difference(book):
+    book.set("a", "chain", ["X", "Y"])
+    book.set("a", "watch", ["Y"])
+    version = book.version
+
+    assert book.set("a", "chain", ["Y", "Z"]) == (["Z"], ["X"])
+    assert book.view("a", "chain") == ["Y", "Z"]
+    assert book.symbols("a") == ["Y", "Z"]
+    assert book.version == version + 1
+
+    assert book.set("a", "chain", ["Y", "Z", "Z", ""]) == ([], [])    # same set
+    assert book.version == version + 1
+
+    assert book.set("a", "chain", []) == ([], ["Z"])                   # Y still watched
+    assert book.view("a", "chain") == [] and book.union() == ["Y"]
+
+
+def test_idle_sessions_expire(book, clock):
+    book.set("a", "chain", ["X", "Y"])
+    book.set("b", "chain", ["Y"])
+
+    clock.now += 500
+    book.touch("b")
+    clock.now += 200                                    # a idle 700s, b 200s
+    assert book.expire() == ([], ["X"])
+    assert book.union() == ["Y"] and book.symbols("a") == []
+
+    assert book.expire(clock.now + 601) == ([], ["Y"])
+    assert book.status()["sessions"] == 0
+
+
+def test_touch_does_not_revive_a_dropped_session(book, clock):
+    book.set("a", "chain", ["X"])
+    book.drop("a")
+    book.touch("a")
+    assert book.expire(clock.now + 10_000) == ([], [])
@@ -0,0 +1,66 @@
+import pytest
+
+from APP_Extensions.symbol_master import SymbolFile, parse_sym_details
+from APP_Extensions.symbol_search import SymbolSearch
+
+# sym_details rows as published (fytoken, description, ..., expiry, ticker, ..., underlying, ..., strike, type)
+NSE_CM = """\
+10100000003045,STATE BANK OF INDIA,0,1,0.05,INE062A01020,0915-1530|1815-1915:,2025-08-26,,NSE:SBIN-EQ,10,10,3045,SBIN,3045,-1.0,XX,10100000003045,None,0,0.0
+10100000017971,SBI CARDS & PAY SER LTD,0,1,0.05,INE018E01016,0915-1530|1815-1915:,2025-08-26,,NSE:SBICARD-EQ,10,10,17971,SBICARD,17971,-1.0,XX,10100000017971,None,0,0.0
+10100000002885,RELIANCE INDUSTRIES LTD,0,1,0.1,INE002A01018,0915-1530|1815-1915:,2025-08-26,,NSE:RELIANCE-EQ,10,10,2885,RELIANCE,2885,-1.0,XX,10100000002885,None,0,0.0
+101000000026000,NIFTY 50,10,1,0.05,,0915-1530|1815-1915:,2025-08-26,,NSE:NIFTY50-INDEX,10,10,26000,NIFTY,26000,-1.0,XX,101000000026000,None,0,0.0
+"""
+NSE_FO = """\
+101125082835000,NIFTY 25 Aug FUT,11,75,0.1,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUGFUT,11,11,35000,NIFTY,26000,-1.0,XX,101000000026000,None,0,0.0
+101125082843211,NIFTY 25 Aug 28 24100 CE,14,75,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUG24100CE,11,11,43211,NIFTY,26000,24100.0,CE,101000000026000,None,0,0.0
+101125082843210,NIFTY 25 Aug 28 24000 CE,14,75,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUG24000CE,11,11,43210,NIFTY,26000,24000.0,CE,101000000026000,None,0,0.0
+101125082843212,NIFTY 25 Aug 28 24000 PE,14,75,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:NIFTY25AUG24000PE,11,11,43212,NIFTY,26000,24000.0,PE,101000000026000,None,0,0.0
+101125082851000,SBIN 25 Aug FUT,11,750,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:SBIN25AUGFUT,11,11,51000,SBIN,3045,-1.0,XX,10100000003045,None,0,0.0
+101125082851001,SBIN 25 Aug 28 800 CE,14,750,0.05,,0915-1530|1815-1915:,2025-08-26,1756375200,NSE:SBIN25AUG800CE,11,11,51001,SBIN,3045,800.0,CE,10100000003045,None,0,0.0
+"""
+
+
+@pytest.fixture
+def files():
+    return [SymbolFile(name, parse_sym_details(name, text), 0.0)
+            for name, text in (("NSE_CM", NSE_CM), ("NSE_FO", NSE_FO))]
+
+
+def _search(files, query, limit=20):
+    return [r["symbol"] for r in SymbolSearch().search(query, files, limit)]
+
+
+def test_cash_before_future_before_option(files):
+    assert _search(files, "sbin") == ["NSE:SBIN-EQ", "NSE:SBIN25AUGFUT", "NSE:SBIN25AUG800CE"]
+
+
+def test_underlying_name_ranks_its_cash_row_first(files):
+    # "NIFTY" names the index row although its ticker is NIFTY50-INDEX
+    assert _search(files, "NIFTY") == [
+        "NSE:NIFTY50-INDEX", "NSE:NIFTY25AUGFUT",
+        "NSE:NIFTY25AUG24000CE", "NSE:NIFTY25AUG24000PE", "NSE:NIFTY25AUG24100CE"]
+
+
+def test_shorter_prefix_match_first_and_limit(files):
+    assert _search(files, "SBI") == ["NSE:SBIN-EQ", "NSE:SBICARD-EQ",
+                                     "NSE:SBIN25AUGFUT", "NSE:SBIN25AUG800CE"]
+    # The cheaper tiers fill the limit, so derivatives are not scanned
+    assert _search(files, "SBI", limit=2) == ["NSE:SBIN-EQ", "NSE:SBICARD-EQ"]
+
+
+def test_description_words_and_typos(files):
+    assert _search(files, "bank") == ["NSE:SBIN-EQ"]
+    assert _search(files, "relaince") == ["NSE:RELIANCE-EQ"]
+    assert _search(files, "zzzz") == []
+
+
+def test_multi_word_query_narrows_to_the_contract(files):
+    assert _search(files, "NIFTY 28 AUG 24000 CE") == ["NSE:NIFTY25AUG24000CE"]
+    assert _search(files, "nifty 24000") == ["NSE:NIFTY25AUG24000CE", "NSE:NIFTY25AUG24000PE"]
+    assert _search(files, "STATE BANK") == ["NSE:SBIN-EQ"]
+
+
+def test_results_carry_contract_details(files):
+    (spec,) = SymbolSearch().search("NIFTY 24100", files)
+    assert spec["kind"] == "option" and spec["expiry"] == "28-AUG-25"
+    assert (spec["strike"], spec["option_type"], spec["lot_size"]) == (24100.0, "CE", 75)
@@ -0,0 +1,55 @@
+import pytest
+
+from APP_Extensions import symbol_snapshot
+from APP_Extensions.symbol_master import Instrument
+
+
+def _instruments():
+    return [
+        Instrument("NSE:NIFTY25AUG24000CE", "NIFTY 25 Aug 28 24000 CE", "NIFTY", 75, 0.05,
+                   1756375200, 24000.0, "CE", "101125082843210", "NSE_FO"),
+        Instrument("NSE:NIFTY25AUG24000PE", "NIFTY 25 Aug 28 24000 PE", "NIFTY", 75, 0.05,
+                   1756375200, 24000.0, "PE", "101125082843211", "NSE_FO"),
+        Instrument("NSE:NIFTY25AUGFUT", "NIFTY 25 Aug FUT", "NIFTY", 75, 0.1,
+                   1756375200, 0.0, "XX", "101125082835000", "NSE_FO"),
+        Instrument("NSE:SBIN-EQ", "STATE BANK OF INDIA", "SBIN", 1, 0.05,
+                   0, 0.0, "", "10100000003045", "NSE_FO"),
+    ]
+
+
+def test_round_trip(tmp_path):
+    path = symbol_snapshot.snapshot_path(str(tmp_path), "NSE_FO")
+    symbol_snapshot.write_snapshot(path, "NSE_FO", _instruments(), 1756300000.5)
+
+    loaded_at, instruments = symbol_snapshot.read_snapshot(path, Instrument)
+
+    assert loaded_at == 1756300000.5
+    assert instruments == _instruments()
+    assert all(type(inst) is Instrument for inst in instruments)
+
+
+def test_round_trip_empty(tmp_path):
+    path = symbol_snapshot.snapshot_path(str(tmp_path), "BSE_CM")
+    symbol_snapshot.write_snapshot(path, "BSE_CM", [], 1.0)
+    assert symbol_snapshot.read_snapshot(path, Instrument) == (1.0, [])
+
+
+def test_nul_is_stripped_from_text(tmp_path):
+    path = symbol_snapshot.snapshot_path(str(tmp_path), "NSE_CM")
+    inst = _instruments()[3]._replace(description="STATE\0BANK", exchange_file="NSE_CM")
+    symbol_snapshot.write_snapshot(path, "NSE_CM", [inst], 1.0)
+    _, (restored,) = symbol_snapshot.read_snapshot(path, Instrument)
+    assert restored.description == "STATEBANK"
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "NSE_FO.snap"
+    path.write_bytes(b"NOTASNAP" + bytes(64))
+    with pytest.raises(ValueError):
+        symbol_snapshot.read_snapshot(str(path), Instrument)
+
+
+def test_meta_round_trip(tmp_path):
+    assert symbol_snapshot.read_meta(str(tmp_path), "NSE_FO") == {}
+    symbol_snapshot.write_meta(str(tmp_path), "NSE_FO", {"etag": "abc", "checked_at": 5})
+    assert symbol_snapshot.read_meta(str(tmp_path), "NSE_FO") == {"etag": "abc", "checked_at": 5}
@@ -0,0 +1,108 @@
+import pytest
+
+from APP_Extensions import http_cache
+from APP_Extensions.token_board import BrokerFacts, TokenBoard, notifications_for
+
+T = 1_800_000_000.0                     # access token expiry
+R = T + 10 * 86400                      # refresh token expiry
+SEQ = "broker_settings"
+
+
+def _facts(access_expires=T, refresh_expires=R):
+    return BrokerFacts(1, "fyers", "U1", True, True, access_expires, refresh_expires)
+
+
+def _messages(now, facts=None):
+    return [n["message"] for n in notifications_for(facts or _facts(), now)]
+
+
+@pytest.fixture(autouse=True)
+def sequences(monkeypatch):
+    monkeypatch.setattr(http_cache, "_sequences", {})
+    monkeypatch.setattr(http_cache, "_listeners", {})
+    monkeypatch.setattr(http_cache, "_shared", {})
+    monkeypatch.setattr(http_cache, "_store", {})
+    monkeypatch.setattr(http_cache, "_global", set())
+
+
+@pytest.fixture
+def board():
+    facts = [_facts()]
+    board = TokenBoard(SEQ, loader=lambda: list(facts))
+    board.facts = facts
+    return board
+
+
+def test_access_token_countdown():
+    assert _messages(T - 7200) == []
+    assert _messages(T - 3660) == []
+    assert _messages(T - 3659) == ["fyers (U1) access token expires in 60 minutes"]
+    assert _messages(T - 61) == ["fyers (U1) access token expires in 1 minutes"]
+    assert _messages(T) == ["fyers (U1) access token expires in 0 minutes"]
+    assert _messages(T + 1) == ["fyers (U1) access token has expired"]
+
+
+def test_refresh_token_countdown():
+    later = _facts(access_expires=R + 86400)
+    assert _messages(R - 3 * 86400, later) == []
+    assert _messages(R - 3 * 86400 + 1, later) == ["fyers (U1) refresh token expires in 2 days"]
+    assert _messages(R, later) == ["fyers (U1) refresh token expires in 0 days"]
+    assert _messages(R + 1, later) == ["fyers (U1) refresh token has expired - need new access token"]
+    assert notifications_for(later, R + 1)[0]["action"] == "create_access"
+
+
+def test_next_transitions():
+    facts = _facts()
+    days = [R - k * 86400 for k in (3, 2, 1, 0)]
+    assert facts.transitions(T - 7200) == [T - 3660, T] + days
+    assert facts.transitions(T - 3030) == [T - 3000, T] + days      # next minute tick
+    assert facts.transitions(T - 3000) == [T - 3000, T] + days      # ... ticking right now
+    assert facts.transitions(T + 1) == days
+
+
+def test_notifications_change_right_after_each_transition(board):
+    now = T - 7200
+    board.current(now)
+    assert board.version == 1 and board.notifications == []
+    seen = [board.notifications]
+
+    while board.facts[0].transitions(now):
+        at = board.next_transition
+        board.current((now + at) / 2)                       # nothing changes in between
+        board.current(at)                                   # ... nor at the instant itself
+        assert board.version == len(seen)
+
+        now = at + 0.001
+        board.current(now)
+        assert board.version == len(seen) + 1
+        assert board.notifications == notifications_for(board.facts[0], now) != seen[-1]
+        seen.append(board.notifications)
+
+    assert [n["message"] for n in seen[-1]] == [
+        "fyers (U1) access token has expired",
+        "fyers (U1) refresh token has expired - need new access token"]
+    # warning + 60 minute ticks + expiry, then 3 warnings + expiry of the refresh token
+    assert len(seen) == 1 + 1 + 60 + 1 + 3 + 1
+
+
+def test_version_moves_only_when_notifications_change(board):
+    board.current(T - 3000)
+    version, digest = board.version, board.digest
+    assert board.notifications_payload()["version"] == digest
+
+    http_cache.bump(SEQ)                                    # rows written, same tokens
+    board.current(T - 3000)
+    assert (board.version, board.digest) == (version, digest)
+
+    board.facts[0] = _facts(access_expires=T + 86400)       # token refreshed
+    http_cache.bump(SEQ)
+    board.current(T - 3000)
+    assert board.version == version + 1 and board.digest != digest
+    assert board.notifications == []
+
+
+def test_digest_matches_across_workers(board):
+    other = TokenBoard(SEQ, loader=lambda: [_facts()])
+    board.current(T - 3000)
+    other.current(T - 3000)
+    assert other.digest == board.digest
@@ -0,0 +1,143 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from APP_Extensions import token_refresher as tr
+from APP_Extensions.fyers_clients import Account, ClientRegistry
+from APP_Extensions.token_refresher import TokenRefresher, refresh_due_at
+
+IST = tr.IST
+
+
+def _account(created_at, refresh_created_at=None, access="tok", refresh="ref"):
+    return Account(1, "fyers", "U1", "APP-100", access, refresh, created_at,
+                   refresh_created_at or datetime.utcnow() - timedelta(days=1))
+
+
+def _utc(ist_text):
+    """Naive UTC datetime for an IST wall-clock time"""
+    return IST.localize(datetime.fromisoformat(ist_text)).astimezone(tr.pytz.utc).replace(tzinfo=None)
+
+
+def _epoch(ist_text):
+    return IST.localize(datetime.fromisoformat(ist_text)).timestamp()
+
+
+def test_refresh_leads_an_eight_hour_expiry(flask_app):
+    due = refresh_due_at(_account(_utc("2026-10-19 10:00")))
+    assert due == _epoch("2026-10-19 18:00") - tr.REFRESH_LEAD_SECONDS
+
+
+def test_refresh_follows_the_eight_am_boundary(flask_app):
+    # Created at 02:00 the token dies at 08:00, not 10:00: refresh right after it
+    due = refresh_due_at(_account(_utc("2026-10-19 02:00")))
+    assert due == _epoch("2026-10-19 08:00") + tr.AFTER_BOUNDARY_SECONDS
+
+    # Created at 23:00 the 8 hours run out at 07:00, before the boundary
+    due = refresh_due_at(_account(_utc("2026-10-18 23:00")))
+    assert due == _epoch("2026-10-19 07:00") - tr.REFRESH_LEAD_SECONDS
+
+
+def test_nothing_to_refresh_without_a_usable_refresh_token(flask_app):
+    created = _utc("2026-10-19 10:00")
+    expired = datetime.utcnow() - tr.REFRESH_TOKEN_VALID - timedelta(minutes=1)
+    assert refresh_due_at(_account(created, refresh_created_at=expired)) is None
+    assert refresh_due_at(_account(created, refresh=None)) is None
+    assert refresh_due_at(_account(created, access=None)) is None
+
+
+def test_untracked_creation_time_is_due_now(flask_app):
+    before = time.time()
+    assert before <= refresh_due_at(_account(None)) <= time.time()
+
+
+@pytest.fixture
+def broker_row(db_session):
+    from models import BrokerSettings
+    row = BrokerSettings(brokername="fyers", broker_user_id="U1", clientid="APP-100",
+                         access_token="old", refresh_token="ref",
+                         access_token_created_at=datetime.utcnow() - timedelta(hours=9),
+                         refresh_token_created_at=datetime.utcnow() - timedelta(days=1))
+    db_session.add(row)
+    db_session.commit()
+    return row
+
+
+@pytest.fixture
+def refresher(broker_row, monkeypatch):
+    from APP_Routes import broker_settings
+    registry = ClientRegistry(factory=lambda account: None)
+    registry.accounts()
+    monkeypatch.setattr(broker_settings, "fyers_clients", registry)
+    monkeypatch.setattr(broker_settings.http_cache, "bump", lambda name: None)
+    return TokenRefresher(registry)
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    """The broker's refresh handler: answers from .tokens, raising any exception in it."""
+    from APP_Routes import broker_settings
+
+    class Broker:
+        tokens = ["new"]
+        calls = 0
+
+        def refresh(self, row):
+            self.calls += 1
+            token = self.tokens.pop(0)
+            if isinstance(token, Exception):
+                raise token
+            return token
+
+    broker = Broker()
+    monkeypatch.setitem(broker_settings.BROKER_HANDLERS, "fyers",
+                        {"token": None, "refresh": broker.refresh})
+    return broker
+
+
+def test_expired_token_is_refreshed(refresher, broker, broker_row, db_session):
+    now = time.time()
+    assert refresher.run_once(now) == tr.IDLE_RECHECK_SECONDS
+
+    assert broker.calls == 1
+    assert db_session.get(type(broker_row), broker_row.id).access_token == "new"
+    assert refresher.registry.account(broker_row.id).access_token == "new"
+    assert refresher.last_refresh == {broker_row.id: now}
+    assert refresher.schedule[broker_row.id] > now + tr.IDLE_RECHECK_SECONDS
+
+
+def test_failed_refresh_backs_off(refresher, broker, broker_row):
+    broker.tokens = [RuntimeError("broker down")] * len(tr.RETRY_SECONDS) + \
+                    [RuntimeError("still down"), "new"]
+    now = time.time()
+    for wait in tr.RETRY_SECONDS + (tr.RETRY_SECONDS[-1],):
+        assert refresher.run_once(now) == wait
+        assert refresher.schedule[broker_row.id] == now + wait
+        assert refresher.run_once(now + wait - 1) == 1          # not retried early
+        now += wait
+    assert broker.calls == len(tr.RETRY_SECONDS) + 1
+    assert refresher.last_errors == {broker_row.id: "still down"}
+
+    refresher.run_once(now)
+    assert broker.calls == len(tr.RETRY_SECONDS) + 2
+    assert refresher.last_errors == {} and refresher._retry_at == {}
+    assert refresher.last_refresh == {broker_row.id: now}
+
+
+def test_token_refreshed_elsewhere_is_adopted(refresher, broker, broker_row, db_session):
+    broker_row.access_token = "theirs"
+    broker_row.access_token_created_at = datetime.utcnow()
+    db_session.commit()                                     # registry still holds "old"
+
+    refresher.run_once()
+    assert broker.calls == 0
+    assert refresher.registry.account(broker_row.id).access_token == "theirs"
+
+
+def test_account_deleted_during_refresh(refresher, broker, broker_row, monkeypatch):
+    monkeypatch.setattr(refresher.registry, "account", lambda account_id=None: None)
+    now = time.time()
+    assert refresher.run_once(now) == tr.IDLE_RECHECK_SECONDS
+    assert broker.calls == 1
+    assert refresher.schedule[broker_row.id] == now + tr.IDLE_RECHECK_SECONDS